@@ -1,11 +1,17 @@
 from Tkinter import *
 import tkFileDialog
+import tkMessageBox
 
-from silences import *
-from clanfile import *
-from overlaps import *
+from silences import SilenceParser, SoundTrack, clan_sound_track
+from clandocument import ClanDocument
+from clanfile import ClanFileParser
+from soundfinder import export_label_track
+from lenadata import LenaData
+from overlaps import Overlaps, minutes_to_rows
 
 import os
+import sys
+from bisect import bisect_right
 
 class MainWindow:
 
@@ -26,6 +32,7 @@ class MainWindow:
 
         self.silence_export_file = None
         self.silence_parser = None
+        self.sound_track = None     # the parsed Label_Track.txt, see parse_silences()
 
         self.clan_file = None
         self.clan__export_file = None
@@ -38,6 +45,12 @@ class MainWindow:
                                         text = "Load Sound Regions",
                                         command = self.load_regions)
 
+        # makes the sound regions file from the .wav, instead of
+        # running Audacity's Sound Finder
+        self.find_sounds_button = Button(self.main_frame,
+                                         text="Find Sounds (wav)",
+                                         command=self.find_sounds)
+
         self.export_sound_button = Button(self.main_frame,
                                           text = "Export New Regions",
                                           command = self.export_regions)
@@ -58,10 +71,21 @@ class MainWindow:
                                        text="Load Lena",
                                        command=self.load_lena)
 
+        # ranks the loaded lena file again with the current
+        # # of regions / subregion length / step, without reloading it
+        self.rerank_lena_button = Button(self.main_frame,
+                                         text="Re-rank",
+                                         command=self.rerank_lena)
+
         self.export_overlaps_button = Button(self.main_frame,
                                              text="Export Overlaps",
                                              command=self.export_overlaps)
 
+        # one subregions file per metric, from a single pass over the clan file
+        self.export_all_metrics_button = Button(self.main_frame,
+                                                text="Export All Metrics",
+                                                command=self.export_overlaps_all_cha)
+
         self.clear_lena_button = Button(self.main_frame,
                                         text="Clear",
                                         command=self.clear_lena)
@@ -81,6 +105,13 @@ class MainWindow:
         self.minimum_sound_label = Label(self.main_frame, text="minimum sound interval\n(in milliseconds)")
         self.minimum_sound_missing = Label(self.main_frame, text="missing minimum sound interval", fg="red")
 
+        # slides through every minimum sound interval that gives a
+        # different set of silences, showing how many there are and
+        # how much silent time they add up to
+        self.minimum_sound_scale = Scale(self.main_frame, from_=0, to=0, orient=HORIZONTAL,
+                                         showvalue=0, length=160, command=self.minimum_sound_moved)
+        self.silence_summary_label = Label(self.main_frame, text="")
+
         # this is for selecting how many lena overlap regions to find
 
         self.top_n_region_entry = Entry(self.main_frame, width=10)
@@ -88,6 +119,22 @@ class MainWindow:
         self.top_n_region_label = Label(self.main_frame, text="# of regions")
         self.top_n_missing_label = Label(self.main_frame, text="enter n", fg="red")
 
+        # length of the subregions, and the distance between
+        # candidate subregions (in minutes, multiples of 5)
+        self.window_entry = Entry(self.main_frame, width=10)
+        self.window_entry.insert(0, "60")
+        self.window_label = Label(self.main_frame, text="subregion length\n(in minutes)")
+
+        self.stride_entry = Entry(self.main_frame, width=10)
+        self.stride_entry.insert(0, "5")
+        self.stride_label = Label(self.main_frame, text="subregion step\n(in minutes)")
+
+        # only rank subregions between these times of day (HH:MM, optional)
+        self.range_start_entry = Entry(self.main_frame, width=10)
+        self.range_start_label = Label(self.main_frame, text="from (HH:MM)")
+        self.range_end_entry = Entry(self.main_frame, width=10)
+        self.range_end_label = Label(self.main_frame, text="until (HH:MM)")
+
         # warning label if you try to export regions without
         # loading initial sound regions file
         self.sound_file_missing = Label(self.main_frame, text="load sound regions first", fg="red")
@@ -98,6 +145,7 @@ class MainWindow:
         # load all the buttons onto the GUI
         self.load_sound_button.grid(row=2, column=0)
         self.export_sound_button.grid(row=3, column=0)
+        self.find_sounds_button.grid(row=10, column=0)
         self.load_all_button.grid(row=2, column=1)
         self.load_all_cha_button.grid(row=3, column=1)
         self.load_clan_button.grid(row=4, column=1)
@@ -111,11 +159,25 @@ class MainWindow:
         # load minimum sound box to GUI
         self.minimum_sound_entry.grid(row=4, column=0)
         self.minimum_sound_label.grid(row=5, column=0, rowspan=2)
+        self.minimum_sound_scale.grid(row=8, column=0)
+        self.silence_summary_label.grid(row=9, column=0)
 
         # load # of region box onto the GUI
         self.top_n_region_entry.grid(row=5, column=2)
         self.top_n_region_label.grid(row=6, column=2)
 
+        # load subregion length/step boxes onto the GUI
+        self.window_entry.grid(row=8, column=2)
+        self.window_label.grid(row=9, column=2)
+        self.stride_entry.grid(row=10, column=2)
+        self.stride_label.grid(row=11, column=2)
+        self.rerank_lena_button.grid(row=12, column=2)
+        self.range_start_entry.grid(row=13, column=2)
+        self.range_start_label.grid(row=14, column=2)
+        self.range_end_entry.grid(row=15, column=2)
+        self.range_end_label.grid(row=16, column=2)
+        self.export_all_metrics_button.grid(row=17, column=2)
+
 
         # declare and load the box where parsed silences will be previewed
         self.silence_list_box = Listbox(self.main_frame, width=26, height=12)
@@ -180,13 +242,85 @@ class MainWindow:
         # construct the SilenceParser with the regions file and minimum sound.
         # this object extracts the sound regions (ignoring those shorter than minimum_sound
         # and calculates the silences in between them.
-        self.silence_parser = SilenceParser(self.sound_regions_file, minimum_sound)
+        self.parse_silences(minimum_sound)
+
+    def parse_silences(self, minimum_sound):
+        """
+        Builds self.silence_parser for the loaded regions file, and
+        loads the preview box with its silences. The regions file is
+        only read once (into self.sound_track), changing the minimum
+        sound interval afterwards doesn't read it again.
+        :param minimum_sound: minimum sound interval (milliseconds)
+        :return:
+        """
+        if self.sound_track is None or self.sound_track.path != self.sound_regions_file:
+            self.set_sound_track(SoundTrack(self.sound_regions_file), minimum_sound)
+
+        self.silence_parser = SilenceParser(self.sound_regions_file, minimum_sound, self.sound_track)
+        self.show_silence_summary(minimum_sound)
 
         # load the preview box with all the silences
         self.silence_list_box.delete(0, END)
         for index, item in enumerate(self.silence_parser.silences):
             self.silence_list_box.insert(index, str(item) + " [{}] ".format(index + 1))
 
+    def set_sound_track(self, sound_track, minimum_sound):
+        """
+        :param sound_track: the SoundTrack to take the silences from
+        :param minimum_sound: minimum sound interval (milliseconds)
+        :return:
+        """
+        self.sound_track = sound_track
+        self.sound_regions_file = sound_track.path
+        self.minimum_sound_scale.configure(to=len(sound_track.thresholds))
+        self.minimum_sound_scale.set(bisect_right(sound_track.thresholds, minimum_sound))
+
+    def minimum_sound_moved(self, value):
+        """
+        Called as the minimum sound slider moves. Position n of the
+        slider drops the sounds up to the n-th shortest sound length.
+        :param value: slider position
+        :return:
+        """
+        if self.sound_track is None:
+            return
+        position = int(value)
+        thresholds = self.sound_track.thresholds
+
+        # leave the entry alone if it already gives these silences
+        try:
+            minimum_sound = float(self.minimum_sound_entry.get())
+        except ValueError:
+            minimum_sound = None
+        if minimum_sound is None or bisect_right(thresholds, minimum_sound) != position:
+            minimum_sound = thresholds[position - 1] if position else 0
+            self.minimum_sound_entry.delete(0, END)
+            self.minimum_sound_entry.insert(0, repr(minimum_sound))
+
+        self.show_silence_summary(minimum_sound)
+
+    def show_silence_summary(self, minimum_sound):
+        count, total = self.sound_track.summary(minimum_sound)
+        self.silence_summary_label.configure(text="{} silences, {:.1f} s silent".format(count, total/1000))
+
+    def find_sounds(self, wav_path="", path=""):
+        """
+        Finds the sound regions in a .wav recording, writes them
+        out like Audacity's Label_Track.txt and loads them.
+        :param wav_path: the recording
+        :param path: the sound regions file to write
+        :return:
+        """
+        if wav_path == "":
+            wav_path = tkFileDialog.askopenfilename()
+        if path == "":
+            path = tkFileDialog.asksaveasfilename()
+        if not wav_path or not path:
+            return
+
+        export_label_track(wav_path, path)
+        self.load_regions(path=path)
+
     def export_regions(self):
 
         # check to make sure the initial regions have been loaded
@@ -204,30 +338,13 @@ class MainWindow:
 
         # run the silence parsing anew for each export_silence(),
         # so that the user doesn't have to reload the initial
-        # regions every time they need different result
+        # regions every time they need different result (the
+        # regions file itself isn't read again)
         minimum_sound = float(self.minimum_sound_entry.get())
-        self.silence_parser = SilenceParser(self.sound_regions_file, minimum_sound)
-
-        # update the silence preview box
-        self.silence_list_box.delete(0, END)
-        for index, item in enumerate(self.silence_parser.silences):
-            self.silence_list_box.insert(index, str(item) + " [{}] ".format(index + 1))
+        self.parse_silences(minimum_sound)
 
         # write out each region to a new file (silence_export_file)
-        with open(self.silence_export_file, "w") as export_file:
-
-            for index, entry in enumerate(self.silence_parser.sounds):
-
-                # handle the [End] region as a special case
-                if (index + 1) == len(self.silence_parser.sounds)\
-                    and entry[0] == entry[1]:
-
-                    export_file.write("{0:.6f}\t{1:.6f}\t[End]\n".format(entry[0]/1000,
-                                                                         entry[1]/1000))
-                else:
-                    export_file.write("{0:.6f}\t{1:.6f}\t{2}\n".format(entry[0]/1000,
-                                                                       entry[1]/1000,
-                                                                       index + 1))
+        self.silence_parser.export_sounds(self.silence_export_file)
 
     def export_regions_chain(self, path):
 
@@ -246,30 +363,13 @@ class MainWindow:
 
         # run the silence parsing anew for each export_silence(),
         # so that the user doesn't have to reload the initial
-        # regions every time they need different result
+        # regions every time they need different result (the
+        # regions file itself isn't read again)
         minimum_sound = float(self.minimum_sound_entry.get())
-        self.silence_parser = SilenceParser(self.sound_regions_file, minimum_sound)
-
-        # update the silence preview box
-        self.silence_list_box.delete(0, END)
-        for index, item in enumerate(self.silence_parser.silences):
-            self.silence_list_box.insert(index, str(item) + " [{}] ".format(index + 1))
+        self.parse_silences(minimum_sound)
 
         # write out each region to a new file (silence_export_file)
-        with open(self.silence_export_file, "w") as export_file:
-
-            for index, entry in enumerate(self.silence_parser.sounds):
-
-                # handle the [End] region as a special case
-                if (index + 1) == len(self.silence_parser.sounds)\
-                    and entry[0] == entry[1]:
-
-                    export_file.write("{0:.6f}\t{1:.6f}\t[End]\n".format(entry[0]/1000,
-                                                                         entry[1]/1000))
-                else:
-                    export_file.write("{0:.6f}\t{1:.6f}\t{2}\n".format(entry[0]/1000,
-                                                                       entry[1]/1000,
-                                                                       index + 1))
+        self.silence_parser.export_sounds(self.silence_export_file)
     def load_all(self):
         """
         This is an all-in-one function that asks for the initial
@@ -323,7 +423,11 @@ class MainWindow:
 
         lena_filename = self.file_prefix + "_lena5min.csv"
 
-        self.load_lena(path=os.path.join(self.all_prefix, lena_filename))
+        self.load_lena(path=os.path.join(self.all_prefix, lena_filename),
+                       media=ClanDocument.load(self.clan_file).media())
+        if self.overlaps is None:
+            # nothing was ranked, load_lena() said why
+            return
 
         subregions_filename = self.file_prefix + "_subregions.cex"
 
@@ -344,7 +448,7 @@ class MainWindow:
                          the rest will be loaded/generated automatically
 
         16_08_silences.txt
-        16_08_lena5min.csv
+        16_08_lena5min.csv    (optional, see clandensity.py)
         16_08_silences_added.cha
         16_08_subregions.cha
 
@@ -370,26 +474,45 @@ class MainWindow:
         labeled_track_filename = "Label_Track.txt"
         silences_filename = self.file_prefix + "_silences.txt"
 
-        # Call load_regions with the Label_Track file
-        self.load_regions(path=os.path.join(self.all_prefix, labeled_track_filename))
+        # no Label_Track yet, find the sounds in the recording itself,
+        # or failing that, take the silences from the transcript's *SIL: segments
+        labeled_track_path = os.path.join(self.all_prefix, labeled_track_filename)
+        wav_path = os.path.join(self.all_prefix, self.file_prefix + "_audio.wav")
+        if not os.path.isfile(labeled_track_path) and os.path.isfile(wav_path):
+            export_label_track(wav_path, labeled_track_path)
+
+        if os.path.isfile(labeled_track_path):
+            # Call load_regions with the Label_Track file
+            self.load_regions(path=labeled_track_path)
+        else:
+            self.set_sound_track(clan_sound_track(self.clan_file),
+                                 float(self.minimum_sound_entry.get()))
 
         self.export_regions_chain(os.path.join(self.all_prefix, silences_filename))
 
         silences_added_filename = self.file_prefix + "_silences_added.cha"
         silences_added_path = os.path.join(self.all_prefix, silences_added_filename)
 
-
-        self.export_clan_cha(path=silences_added_path)
-
-        self.clan_file = silences_added_path
-
         lena_filename = self.file_prefix + "_lena5min.csv"
+        lena_path = os.path.join(self.all_prefix, lena_filename)
 
-        self.load_lena(path=os.path.join(self.all_prefix, lena_filename))
+        # no 5 minute export, work the densities out from the transcript
+        if not os.path.isfile(lena_path):
+            lena_path = self.clan_file
+
+        self.load_lena(path=lena_path, media=ClanDocument.load(self.clan_file).media())
+        if self.overlaps is None:
+            # nothing was ranked, load_lena() said why
+            return
 
         subregions_filename = self.file_prefix + "_subregions.cha"
 
-        self.export_overlaps_cha(path=os.path.join(self.all_prefix, subregions_filename))
+        # silences and subregions are inserted in a single pass over
+        # the original CLAN file (see ClanFileParser.insert_silences_overlaps_cha)
+        self.export_silences_overlaps_cha(os.path.join(self.all_prefix, subregions_filename),
+                                          silences_added_path)
+
+        self.clan_file = silences_added_path
 
 
     def load_clan(self):
@@ -441,6 +564,31 @@ class MainWindow:
             print e.args
             print(exc_type, exc_tb.tb_lineno)
 
+    def export_silences_overlaps_cha(self, path, silences_added_path=None):
+        """
+        Writes the silences_added and subregions files in one pass over
+        the loaded (original) clan file. Expects the silences and lena
+        data to have already been loaded.
+
+        :param path: subregions export file
+        :param silences_added_path: silences_added export file (optional)
+        :return:
+        """
+        try:
+            ClanFileParser(self.clan_file, path,
+                           region_length=self.overlaps.window_length(),
+                           offset_length=self.overlaps.offset_length())\
+                .insert_silences_overlaps_cha(self.silence_parser.silences,
+                                              self.overlaps.ranked_ctc_cvc,
+                                              self.overlaps.ctc_cvc_map,
+                                              silences_added_path=silences_added_path)
+        except Exception, e:
+            exc_type, exc_obj, exc_tb = sys.exc_info()
+            self.clan_loaded_label.grid_remove()
+            self.clan_formatting_error.grid(row=1, column=1)
+            print e.args
+            print(exc_type, exc_tb.tb_lineno)
+
     def clear_clan(self):
 
         self.clan_file = None
@@ -450,10 +598,20 @@ class MainWindow:
 
         self.silences = None
         self.sound_regions_file = None
+        self.sound_track = None
 
         self.silence_list_box.delete(0, END)
+        self.silence_summary_label.configure(text="")
+        self.minimum_sound_scale.configure(to=0)
 
-    def load_lena(self, path=""):
+    def load_lena(self, path="", media=None):
+        """
+        :param path: path to the lena file (asked for if empty)
+        :param media: @Media name of the transcript, to pick its rows
+                      out of an export holding several recordings
+        :return:
+        """
+        overlaps = self.overlaps
         self.clear_lena()
 
         if path == "":
@@ -469,37 +627,121 @@ class MainWindow:
         else:
 
             self.top_n_missing_label.grid_remove()
-            self.overlaps = Overlaps(self.lena_file, int(self.top_n_region_entry.get()))
-
-            for index, x in enumerate(self.overlaps.ranked_meaningful):
-                self.meaningful_region_box.insert(index,
-                                                  str(x) + "   -   " + str(self.overlaps.meaningful_map[x])+ "   -   " +\
-                                                  self.offset_to_hour(x) + "   -   " + \
-                                                  str(self.offset_to_millisecond(x)) + " ms ")
-
-            for index, x in enumerate(self.overlaps.ranked_awc_actual):
-                self.awc_region_box.insert(index,
-                                           str(x) + "   -  " + str(self.overlaps.awc_actual_map[x])+ "   -   " +\
-                                           self.offset_to_hour(x) + "   -   " + \
-                                           str(self.offset_to_millisecond(x)) + " ms ")
-
-            for index, x in enumerate(self.overlaps.ranked_ctc_actual):
-                self.ctc_region_box.insert(index,
-                                           str(x) + "   -   " + str(self.overlaps.ctc_actual_map[x])+ "   -   " +\
-                                           self.offset_to_hour(x) + "   -   " + \
-                                           str(self.offset_to_millisecond(x)) + " ms ")
-
-            for index, x in enumerate(self.overlaps.ranked_cvc_actual):
-                self.cvc_region_box.insert(index,
-                                           str(x) + "   -  " + str(self.overlaps.awc_actual_map[x])+ "   -   " +\
-                                           self.offset_to_hour(x) + "   -   " + \
-                                           str(self.offset_to_millisecond(x)) + " ms ")
-
-            for index, x in enumerate(self.overlaps.ranked_ctc_cvc):
-                self.ctc_cvc_box.insert(index,
-                                        str(x) + "   -  " +str(self.overlaps.ctc_cvc_map[x])+ "   -   " +\
-                                        self.offset_to_hour(x) + "   -   " +\
-                                        str(self.offset_to_millisecond(x)) + " ms ")
+            top_n = int(self.top_n_region_entry.get())
+            window = minutes_to_rows(self.window_entry.get())
+            stride = minutes_to_rows(self.stride_entry.get())
+
+            # an export can hold several recordings, only rank one of them
+            rows = None
+            processing_file = None
+            if not self.lena_file.lower().endswith((".cha", ".cex")):
+                data = LenaData.load(self.lena_file)
+                if media is None and self.clan_file:
+                    # the "Load Lena" button, use the recording
+                    # of the transcript that's already loaded
+                    media = ClanDocument.load(self.clan_file).media()
+                try:
+                    rows = data.recording_rows(media)
+                except Exception, e:
+                    if media is None and self.clan_file:
+                        message = "{} holds {} recordings, and {} has no @Media line to tell " \
+                                  "which one it's a transcript of." \
+                                  .format(os.path.basename(self.lena_file), len(data.recordings()),
+                                          os.path.basename(self.clan_file))
+                    elif media is None:
+                        message = "{} holds {} recordings. Load the CLAN file first, so that " \
+                                  "the recording it's a transcript of can be picked out." \
+                                  .format(os.path.basename(self.lena_file), len(data.recordings()))
+                    else:
+                        message = e.args[0]
+                    self.lena_file = None
+                    tkMessageBox.showerror("Load Lena", message)
+                    return
+                processing_file = data.processing_file(rows[0])
+
+            # loading the same (unchanged) file again only needs a re-rank
+            if overlaps is not None and overlaps.lena_file == self.lena_file and overlaps.is_current() \
+                    and (rows is None or overlaps.processing_file == processing_file):
+                overlaps.rerank(top_n, window, stride)
+                self.overlaps = overlaps
+            else:
+                self.overlaps = Overlaps(self.lena_file, top_n, window=window, stride=stride,
+                                         rows=rows)
+            self.apply_time_range()
+            self.show_regions()
+
+    def rerank_lena(self):
+        """
+        Ranks the loaded lena file again with the current # of regions,
+        subregion length and step. The file isn't reparsed, and the
+        averages computed for an earlier ranking are reused.
+        :return:
+        """
+        if self.overlaps is None:
+            return
+        if not self.top_n_region_entry.get():
+            self.top_n_missing_label.grid(row=7, column=2)
+            return
+        self.top_n_missing_label.grid_remove()
+
+        self.overlaps.rerank(int(self.top_n_region_entry.get()),
+                             minutes_to_rows(self.window_entry.get()),
+                             minutes_to_rows(self.stride_entry.get()))
+        self.apply_time_range()
+        self.show_regions()
+
+    def apply_time_range(self):
+        """
+        Limits the ranking to the subregions between the from/until
+        times, if either is filled in
+        :return:
+        """
+        start_time = self.range_start_entry.get().strip()
+        end_time = self.range_end_entry.get().strip()
+        if start_time or end_time or self.overlaps.start_row is not None \
+                or self.overlaps.end_row is not None:
+            self.overlaps.set_time_range(start_time or None, end_time or None)
+
+    def show_regions(self):
+        """
+        Fills the region boxes with the rankings of self.overlaps
+        :return:
+        """
+        self.meaningful_region_box.delete(0, END)
+        self.awc_region_box.delete(0, END)
+        self.ctc_region_box.delete(0, END)
+        self.cvc_region_box.delete(0, END)
+        self.ctc_cvc_box.delete(0, END)
+
+        for index, x in enumerate(self.overlaps.ranked_meaningful):
+            self.meaningful_region_box.insert(index,
+                                              str(x) + "   -   " + str(self.overlaps.meaningful_map[x])+ "   -   " +\
+                                              self.offset_to_hour_range(x) + "   -   " + \
+                                              str(self.offset_to_millisecond(x)) + " ms ")
+
+        for index, x in enumerate(self.overlaps.ranked_awc_actual):
+            self.awc_region_box.insert(index,
+                                       str(x) + "   -  " + str(self.overlaps.awc_actual_map[x])+ "   -   " +\
+                                       self.offset_to_hour_range(x) + "   -   " + \
+                                       str(self.offset_to_millisecond(x)) + " ms ")
+
+        for index, x in enumerate(self.overlaps.ranked_ctc_actual):
+            self.ctc_region_box.insert(index,
+                                       str(x) + "   -   " + str(self.overlaps.ctc_actual_map[x])+ "   -   " +\
+                                       self.offset_to_hour_range(x) + "   -   " + \
+                                       str(self.offset_to_millisecond(x)) + " ms ")
+
+        for index, x in enumerate(self.overlaps.ranked_cvc_actual):
+            self.cvc_region_box.insert(index,
+                                       str(x) + "   -  " + str(self.overlaps.awc_actual_map[x])+ "   -   " +\
+                                       self.offset_to_hour_range(x) + "   -   " + \
+                                       str(self.offset_to_millisecond(x)) + " ms ")
+
+        for index, x in enumerate(self.overlaps.ranked_ctc_cvc):
+            self.ctc_cvc_box.insert(index,
+                                    str(x) + "   -  " +str(self.overlaps.ctc_cvc_map[x])+ "   -   " +\
+                                    self.offset_to_hour_range(x) + "   -   " +\
+                                    str(self.offset_to_millisecond(x)) + " ms ")
 
     def clear_lena(self):
         self.lena_file = None
@@ -528,7 +770,9 @@ class MainWindow:
         else:
             overlaps_export_file = path
 
-        ClanFileParser(self.clan_file, overlaps_export_file).\
+        ClanFileParser(self.clan_file, overlaps_export_file,
+                       region_length=self.overlaps.window_length(),
+                       offset_length=self.overlaps.offset_length()).\
                         insert_overlaps(self.overlaps.ranked_ctc_cvc,
                                         self.overlaps.ctc_cvc_map, self.silence_parser.silences)
 
@@ -547,10 +791,41 @@ class MainWindow:
         else:
             overlaps_export_file = path
 
-        ClanFileParser(self.clan_file, overlaps_export_file).\
+        ClanFileParser(self.clan_file, overlaps_export_file,
+                       region_length=self.overlaps.window_length(),
+                       offset_length=self.overlaps.offset_length()).\
                         insert_overlaps_cha(self.overlaps.ranked_ctc_cvc,
                                         self.overlaps.ctc_cvc_map, self.silence_parser.silences)
 
+    def export_overlaps_all_cha(self, path=""):
+        """
+        Like export_overlaps_cha(), but writes a subregions file for
+        every metric at once (reading the clan file only once). The
+        ctc_cvc one goes to path, the others next to it with the metric
+        added to the name, e.g. 16_08_subregions_awc_actual.cha
+        :return:
+        """
+        if path == "":
+            path = tkFileDialog.asksaveasfilename()
+        if not path:
+            return
+
+        root, extension = os.path.splitext(path)
+        exports = []
+        for metric in ["ctc_cvc"] + [metric for metric in Overlaps.metrics if metric != "ctc_cvc"]:
+            if metric == "ctc_cvc":
+                metric_path = path
+            else:
+                metric_path = root + "_" + metric + extension
+            exports.append((metric_path,
+                            getattr(self.overlaps, "ranked_" + metric),
+                            getattr(self.overlaps, metric + "_map")))
+
+        ClanFileParser(self.clan_file, path,
+                       region_length=self.overlaps.window_length(),
+                       offset_length=self.overlaps.offset_length()).\
+                        insert_overlaps_multi_cha(exports, self.silence_parser.silences)
+
     def offset_to_hour(self, offset):
 
         hours = offset / 12
@@ -561,6 +836,14 @@ class MainWindow:
         else:
             return "{}:{}".format(hours, minutes)
 
+    def offset_to_hour_range(self, offset):
+        """
+        :param offset: subregion offset
+        :return: start and end of the subregion, e.g. "1:05 - 2:05"
+        """
+        return self.offset_to_hour(offset) + " - " + \
+               self.offset_to_hour(offset + self.overlaps.window)
+
     def offset_to_millisecond(self, offset):
 
         return 5 * offset * 60 * 1000
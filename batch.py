@@ -0,0 +1,232 @@
+"""
+Runs the "Load All (cha)" pipeline over every recording found under
+a data directory, without the GUI.
+
+    python batch.py data/new_input
+    python batch.py data/new_input --processes 4 --minimum-sound 10000 --top-n 5
+    python batch.py data/new_input --window-minutes 90 --stride-minutes 5
+    python batch.py data/new_input --silence-mode normalize --maximum-silence 0.5
+    python batch.py data/new_input --from 9:00 --until 13:00
+    python batch.py data/new_input --all-metrics
+    python batch.py data/new_input --windows-minutes 30,45,90
+    python batch.py data/new_input --row-seconds 10 --stride-minutes 0.5
+    python batch.py data/new_input --row-seconds 10 --utc-offset -4 --from 9:00
+    python batch.py data/new_input --check
+
+A recording is any folder holding a main CLAN file (e.g. 14_11.lena.cha).
+The silences come from its Label_Track.txt. If there's none, one is made
+from the recording (XX_XX_audio.wav), see soundfinder.py, and if there's
+no recording either, the silences come from the *SIL: segments of the
+CLAN file. The densities come from its XX_XX_lena5min.csv, or from the
+CLAN file if there's no csv (see below).
+Outputs are written next to the inputs, named the same way load_all_cha()
+names them:
+
+    14_11_silences.txt
+    14_11_silences_added.cha
+    14_11_subregions.cha
+
+With --all-metrics, the subregions picked by every other metric are
+written in the same pass (14_11_subregions_meaningful.cha,
+14_11_subregions_awc_actual.cha, ...). --windows-minutes also writes
+the subregions picked for each of those other lengths
+(14_11_subregions_30min.cha, 14_11_subregions_45min.cha, ...), all
+ranked off the same pass over the densities.
+
+Without a XX_XX_lena5min.csv, the densities are worked out from the
+utterances of the CLAN file instead (see clandensity.py). With
+--row-seconds they always are, split into rows that many seconds long,
+so subregions can start at any multiple of it rather than every 5 minutes.
+The CLAN file's times are UTC, and are moved to local time like the
+csv's (so --from/--until mean the same either way), by --utc-offset
+hours if it's given, or else the offset between the csv and the CLAN
+file, or else this computer's time zone.
+
+With --check, every lena5min.csv is first checked against its CLAN file
+(see consistency.py), and recordings whose export belongs to another
+recording, or doesn't line up with the transcript, fail without being
+processed.
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+import traceback
+from StringIO import StringIO
+
+from consistency import check_recording, duplicates
+from pipeline import find_recordings, process_recording
+from overlaps import Overlaps, minutes_to_rows, row_minutes
+
+
+def minutes_list(text):
+    """
+    :param text: comma separated lengths in minutes, e.g. "30,45,90"
+    :return: list of floats
+    """
+    try:
+        return [float(minutes) for minutes in text.split(",") if minutes.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a list of minutes: {}".format(text))
+
+
+def run_recording(args):
+    """
+    Pool worker. Everything the pipeline prints is captured so that
+    the output of recordings running side by side doesn't interleave.
+
+    :param args: (recording, minimum_sound, top_n, window, stride, optimal,
+                 silence_mode, maximum_silence, time_range, all_metrics,
+                 row_seconds, utc_offset, windows, check) tuple
+    :return: (recording, ranked regions or None, error or None, output, seconds)
+    """
+    (recording, minimum_sound, top_n, window, stride, optimal,
+     silence_mode, maximum_silence, time_range, all_metrics, row_seconds, utc_offset,
+     windows, check) = args
+
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    start = time.time()
+    try:
+        report = None
+        if check:
+            report = check_recording(recording)
+        if report is not None and not report.ok():
+            regions = None
+            error = "the export doesn't match the transcript:\n{}".format(report)
+        else:
+            regions = process_recording(recording, minimum_sound, top_n, window, stride, optimal,
+                                        silence_mode, maximum_silence, time_range, all_metrics,
+                                        row_seconds, utc_offset, windows)
+            error = None
+    except Exception:
+        regions = None
+        error = traceback.format_exc()
+    finally:
+        output = sys.stdout.getvalue()
+        sys.stdout = stdout
+
+    return recording, regions, error, output, time.time() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Insert silences and subregions into "
+                                                 "every recording under a data directory")
+    parser.add_argument("data_dir", help="directory containing the recording folders")
+    parser.add_argument("--minimum-sound", type=float, default=10000,
+                        help="minimum sound interval, in milliseconds (default: 10000)")
+    parser.add_argument("--top-n", type=int, default=5,
+                        help="number of subregions to find (default: 5)")
+    parser.add_argument("--window-minutes", type=float, default=60,
+                        help="subregion length, in minutes (default: 60)")
+    parser.add_argument("--stride-minutes", type=float, default=5,
+                        help="distance between candidate subregions, in minutes (default: 5)")
+    parser.add_argument("--optimal", action="store_true",
+                        help="pick the subregions with the highest combined density "
+                             "instead of ranking them greedily")
+    parser.add_argument("--silence-mode", choices=Overlaps.silence_modes,
+                        help="rank subregions taking the silences into account: leave out "
+                             "mostly silent ones (exclude), scale their density by the "
+                             "non-silent fraction (weight), or measure density over the "
+                             "non-silent time only (normalize)")
+    parser.add_argument("--maximum-silence", type=float, default=0.5,
+                        help="with --silence-mode, the largest silent fraction of a "
+                             "subregion (default: 0.5)")
+    parser.add_argument("--from", dest="start_time", metavar="HH:MM",
+                        help="only pick subregions starting at or after this time of day")
+    parser.add_argument("--until", dest="end_time", metavar="HH:MM",
+                        help="only pick subregions ending at or before this time of day")
+    parser.add_argument("--all-metrics", action="store_true",
+                        help="also write a subregions file for the meaningful, AWC, CTC "
+                             "and CVC rankings (same pass over the CLAN file)")
+    parser.add_argument("--windows-minutes", type=minutes_list, metavar="MINUTES,...",
+                        help="other subregion lengths to also write a subregions file for, "
+                             "e.g. 30,45,90 (ranked in the same pass)")
+    parser.add_argument("--row-seconds", type=int,
+                        help="rank on rows this many seconds long, worked out from the "
+                             "CLAN file, instead of the 5 minute csv (window and stride "
+                             "then have to be multiples of it)")
+    parser.add_argument("--utc-offset", type=float, metavar="HOURS",
+                        help="hours local time is ahead of UTC (e.g. -4), for rows worked "
+                             "out from a CLAN file, whose times are UTC (default: from the "
+                             "lena5min.csv if there is one, this computer's time zone "
+                             "otherwise)")
+    parser.add_argument("--check", action="store_true",
+                        help="check every lena5min.csv against its CLAN file first, and "
+                             "skip the recordings where they don't match")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(),
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print the pipeline output for every recording")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.row_seconds is None:
+            density_row_minutes = row_minutes
+        elif args.row_seconds <= 0:
+            raise Exception("--row-seconds has to be positive")
+        else:
+            density_row_minutes = args.row_seconds / 60.0
+        window = minutes_to_rows(args.window_minutes, density_row_minutes)
+        stride = minutes_to_rows(args.stride_minutes, density_row_minutes)
+        windows = None
+        if args.windows_minutes:
+            windows = [minutes_to_rows(minutes, density_row_minutes)
+                       for minutes in args.windows_minutes]
+    except Exception, e:
+        parser.error(e.args[0])
+
+    utc_offset = None
+    if args.utc_offset is not None:
+        utc_offset = int(round(args.utc_offset * 3600))
+
+    time_range = None
+    if args.start_time or args.end_time:
+        time_range = (args.start_time, args.end_time)
+
+    recordings = find_recordings(args.data_dir)
+    if not recordings:
+        print "no recordings found in {}".format(args.data_dir)
+        return 1
+
+    jobs = [(recording, args.minimum_sound, args.top_n, window, stride, args.optimal,
+             args.silence_mode, args.maximum_silence, time_range, args.all_metrics,
+             args.row_seconds, utc_offset, windows, args.check)
+            for recording in recordings]
+    processes = max(1, min(args.processes, len(jobs)))
+
+    if args.check:
+        for same in duplicates(recordings):
+            print "same CLAN file in: " + ", ".join(recording.folder for recording in same)
+
+    print "processing {} recordings with {} processes".format(len(jobs), processes)
+
+    if processes == 1:
+        results = map(run_recording, jobs)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = list(pool.imap_unordered(run_recording, jobs))
+        finally:
+            pool.close()
+            pool.join()
+
+    results.sort(key=lambda result: result[0].folder)
+
+    failed = 0
+    for recording, regions, error, output, seconds in results:
+        if args.verbose and output:
+            print output
+        if error is None:
+            print "OK      {}  ({:.2f}s)  regions: {}".format(recording.folder, seconds, regions)
+        else:
+            failed += 1
+            print "FAILED  {}  ({:.2f}s)".format(recording.folder, seconds)
+            print error
+
+    print "{} succeeded, {} failed".format(len(results) - failed, failed)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
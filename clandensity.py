@@ -0,0 +1,271 @@
+import calendar
+import os
+import re
+import time
+
+from clandocument import ClanDocument
+from itsfile import meaningful_speakers
+from lenadata import LenaData, file_digest
+
+
+# LENA writes its adult word count estimates into the transcript as
+# e.g. &=w4_76 (4.76 words)
+word_count_regx = re.compile("&=w(\d+)_(\d+)")
+
+date_regx = re.compile("^@Date:\s*(\d+-[A-Za-z]+-\d+)", re.MULTILINE)
+start_time_regx = re.compile("^@Time Duration:\s*(\d+:\d+(?::\d+)?)", re.MULTILINE)
+
+adult_speakers = set(["FAN", "MAN"])
+child_speaker = "CHN"
+
+# longest pause (in milliseconds) between an adult and a key child
+# utterance that still counts as a conversational turn, same as LENA's
+turn_pause = 5000
+
+
+def parse_clan(path, row_minutes=5, utc_offset=None):
+    """
+    Builds the same columns a LENA 5 minute export has, from the
+    utterances of a LENA CLAN transcript. This is what's used when
+    there's no XX_XX_lena5min.csv next to the transcript, and it can
+    also split the recording into much shorter rows (e.g. 10 seconds,
+    row_minutes=10/60.0), so that subregions can start at any row
+    rather than every 5 minutes.
+
+    Rows are counted from the start of the transcript (its 0 ms), the
+    same way the subregions are placed back into it, and the last row
+    is cut short at the end of the last utterance.
+
+    Per row:
+        Duration    recorded time inside the row
+        Meaningful  time covered by CHN/FAN/MAN/CXN utterances
+        AWC.Actual  the &=wN_M word counts of the FAN/MAN utterances
+        CTC.Actual  adult <-> key child alternations, at most
+                    turn_pause apart
+        CVC.Actual  CHN utterances
+
+    Utterance times are split across the rows they overlap (see
+    speaker_occupancy()), counts go to the row the utterance starts in.
+
+    Timestamps start at the @Date and the first @Time Duration time of
+    the header. LENA writes these in UTC, so they're moved by utc_offset
+    to local time, like the 5 minute export and the .its rows, and
+    --from/--until mean the same time of day whichever the rows come
+    from. Without a utc_offset, the time zone of this computer is used
+    (see export_utc_offset() to take it from the export instead).
+
+    :param path: path to the CLAN file
+    :param row_minutes: length of a row, in minutes
+    :param utc_offset: local time - UTC, in seconds, None for this
+                       computer's time zone
+    :return: LenaData
+    """
+    document = ClanDocument.load(path)
+    row_length = int(round(row_minutes * 60 * 1000))
+
+    utterances = [utterance for utterance in xrange(document.utterance_count())
+                  if document.onsets[utterance] != -1]
+    utterances.sort(key=lambda utterance: document.onsets[utterance])
+
+    # a malformed bullet (onset > offset) can start after every offset,
+    # so the rows run to the latest onset or offset
+    end = max([max(document.onsets[utterance], document.offsets[utterance])
+               for utterance in utterances] or [0])
+    rows = (end + row_length - 1) // row_length
+    if utterances and not rows:
+        # nothing but 0_0 bullets
+        rows = 1
+
+    occupancy = speaker_occupancy(document, utterances, row_length, rows)
+    meaningful = [0] * rows
+    for speaker, times in occupancy.iteritems():
+        if speaker in meaningful_speakers:
+            meaningful = [total + spoken for total, spoken in zip(meaningful, times)]
+
+    awc = [0.0] * rows
+    ctc = [0] * rows
+    cvc = [0] * rows
+
+    text = document.text
+    line_starts = document.line_starts
+    previous_adult = None       # whether the last adult/CHN utterance was an adult's
+    previous_offset = None
+    for utterance in utterances:
+        speaker = document.speaker(utterance)
+        onset = document.onsets[utterance]
+        # an empty utterance right at the end of the last row counts in it
+        row = min(onset // row_length, rows - 1)
+
+        if speaker in adult_speakers:
+            words = text[line_starts[document.first_lines[utterance]]:
+                         line_starts[document.last_lines[utterance] + 1]]
+            for whole, hundredths in word_count_regx.findall(words):
+                awc[row] += float(whole + "." + hundredths)
+            adult = True
+        elif speaker == child_speaker:
+            cvc[row] += 1
+            adult = False
+        else:
+            continue
+
+        if previous_adult is not None and adult != previous_adult \
+                and onset - previous_offset <= turn_pause:
+            ctc[row] += 1
+        previous_adult = adult
+        previous_offset = document.offsets[utterance]
+
+    stat = os.stat(path)
+    data = LenaData(path, stat.st_mtime, stat.st_size, file_digest(path))
+    data.row_minutes = row_minutes
+
+    start = recording_start(text)
+    if utc_offset is None:
+        utc_offset = computer_utc_offset(start)
+    data.utc_offset = utc_offset
+    start += utc_offset
+    for row in xrange(rows):
+        clock = start + row * row_length / 1000.0
+        data.timestamps.append(time.strftime("%Y-%m-%d %H:%M", time.gmtime(clock)))
+        data.minutes.append(int(clock // 60))
+        data.durations.append(min(row_length, end - row * row_length) / 1000.0)
+        data.meaningful.append(meaningful[row] / 1000.0)
+        data.awc_actual.append(int(round(awc[row])))
+        data.ctc_actual.append(ctc[row])
+        data.cvc_actual.append(cvc[row])
+        data.child_keys.append(0)
+        data.processing_files.append(0)
+
+    data.child_key_codes = [""]
+    data.processing_file_codes = [os.path.basename(path)]
+    return data
+
+
+def speaker_occupancy(document, utterances, row_length, rows):
+    """
+    Spreads the time of every utterance over the rows it overlaps.
+
+    Rows an utterance covers completely are added through a difference
+    array (+1 on the first of them, -1 past the last one, summed up at
+    the end), so a long utterance costs the same as a short one. Only
+    the partly covered rows at either end are added directly.
+
+    :param document: ClanDocument
+    :param utterances: numbers of the bulleted utterances to count
+    :param row_length: length of a row, in milliseconds
+    :param rows: number of rows
+    :return: dict of speaker code -> list with the milliseconds that
+             speaker talks in every row
+    """
+    partial = {}    # speaker -> time in partly covered rows
+    covered = {}    # speaker -> difference array of fully covered rows
+
+    for utterance in utterances:
+        speaker = document.speaker(utterance)
+        if speaker not in partial:
+            partial[speaker] = [0] * rows
+            covered[speaker] = [0] * (rows + 1)
+
+        onset = document.onsets[utterance]
+        offset = min(document.offsets[utterance], rows * row_length)
+        if offset <= onset:
+            continue
+
+        first = onset // row_length
+        last = (offset - 1) // row_length
+        if first == last:
+            partial[speaker][first] += offset - onset
+            continue
+
+        partial[speaker][first] += (first + 1) * row_length - onset
+        partial[speaker][last] += offset - last * row_length
+        covered[speaker][first + 1] += 1
+        covered[speaker][last] -= 1
+
+    occupancy = {}
+    for speaker, times in partial.iteritems():
+        depth = 0
+        differences = covered[speaker]
+        for row in xrange(rows):
+            depth += differences[row]
+            times[row] += depth * row_length
+        occupancy[speaker] = times
+    return occupancy
+
+
+def recording_start(text):
+    """
+    :param text: CLAN file contents
+    :return: clock time of the start of the recording, in seconds
+             since 1970, from the @Date and @Time Duration headers
+             (0 if they're missing)
+    """
+    date = date_regx.search(text)
+    start_time = start_time_regx.search(text)
+    if date is None or start_time is None:
+        return 0
+    clock = start_time.group(1)
+    if clock.count(":") == 1:
+        clock += ":00"
+    try:
+        return calendar.timegm(time.strptime(date.group(1) + " " + clock, "%d-%b-%Y %H:%M:%S"))
+    except ValueError:
+        return 0
+
+
+def header_start(path):
+    """
+    :param path: path to the CLAN file
+    :return: recording_start() of the file, reading only its header
+    """
+    lines = []
+    with open(path, "rU") as file:
+        for line in file:
+            if line.startswith("*"):
+                break
+            lines.append(line)
+    return recording_start("".join(lines))
+
+
+def computer_utc_offset(start):
+    """
+    :param start: clock time, in seconds since 1970 (UTC)
+    :return: local time - UTC, in seconds, in this computer's time
+             zone at that time (daylight saving time included)
+    """
+    return calendar.timegm(time.localtime(start)) - start
+
+
+def default_utc_offset(path):
+    """
+    :param path: path to the CLAN file
+    :return: the utc_offset parse_clan() uses if it isn't given one
+    """
+    return computer_utc_offset(header_start(path))
+
+
+def export_utc_offset(path, lena_file):
+    """
+    Works out the local time offset of a transcript from the LENA
+    export of the same recording. The export's first row starts at the
+    local clock time (rounded down to 5 minutes) the transcript starts
+    at in UTC, and time zones are whole quarter hours, so the
+    difference rounded to 15 minutes is the offset.
+
+    :param path: path to the CLAN file
+    :param lena_file: path to the LENA 5 minute csv
+    :return: local time - UTC, in seconds, None if the export doesn't
+             hold the transcript's recording or the transcript has no
+             start time
+    """
+    start = header_start(path)
+    if not start:
+        return None
+    data = LenaData.load(lena_file)
+    try:
+        rows = data.recording_rows(ClanDocument.load(path).media())
+    except Exception:
+        return None
+    if not rows:
+        return None
+    quarter = 15 * 60
+    return int(round((data.minutes[rows[0]] * 60 - start) / float(quarter))) * quarter
@@ -0,0 +1,350 @@
+import os
+import re
+from array import array
+
+
+newline_regx = re.compile("\n")
+
+# a *XYZ: line, followed by any number of tab-indented continuation lines
+utterance_regx = re.compile("^\*([^:\n]*):.*(?:\n\t.*)*", re.MULTILINE)
+
+# the recording the transcript is of, e.g. @Media:	e20150720_104920_003593, audio
+media_regx = re.compile("^@Media:\s*([^,\s]+)", re.MULTILINE)
+
+
+class ClanDocument:
+    """
+    A CLAN file (.cha or .cex) tokenized once into compact arrays.
+
+    Every line keeps its offset in the (newline normalized) text and
+    its bulleted interval, if it has one. Lines are also grouped into logical utterances: a *XYZ:
+    line together with the tab-indented continuation lines that follow
+    it, so the \\025start_end\\025 bullet is found even if it sits on a
+    continuation line.
+
+    Use ClanDocument.load() rather than the constructor, so that a file
+    is only parsed once per session no matter how many exports use it.
+    """
+
+    # path -> ClanDocument, see load()
+    cache = {}
+
+    def __init__(self, path):
+        self.path = path
+
+        stat = os.stat(path)
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+
+        # .cha bullets are wrapped in hidden \025 characters, the
+        # older .cex exports are matched on the bare ABC_XYZ interval
+        if path.endswith(".cha"):
+            self.bullet_regx = re.compile("\025(\d+)_(\d+)")
+        else:
+            self.bullet_regx = re.compile("(\d+)_(\d+)")
+
+        self.text = ""                  # file contents, newlines normalized to "\n"
+
+        # one entry per line (plus a trailing sentinel for the starts)
+        self.line_starts = array("l")   # offset of the line within self.text
+        self.line_onsets = array("l")   # bullet onset, -1 if the line has no bullet
+        self.line_offsets = array("l")  # bullet offset, -1 if the line has no bullet
+
+        # one entry per utterance
+        self.speaker_codes = []         # e.g. ["CHN", "FAN", ...]
+        self.speakers = array("H")      # index into speaker_codes
+        self.onsets = array("l")        # first bullet onset, -1 if not bulleted
+        self.offsets = array("l")       # last bullet offset, -1 if not bulleted
+        self.first_lines = array("l")   # line number of the *XYZ: line
+        self.last_lines = array("l")    # line number of its last continuation line
+
+        self.parse()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns the parsed document for path, reusing the one parsed
+        earlier in this session if the file hasn't changed since.
+
+        :param path: path to the CLAN file
+        :return: ClanDocument
+        """
+        document = cls.cache.get(path)
+        if document is not None:
+            stat = os.stat(path)
+            if stat.st_mtime == document.mtime and stat.st_size == document.size:
+                return document
+
+        document = cls(path)
+        cls.cache[path] = document
+        return document
+
+    def parse(self):
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        # newlines are normalized the same way reading the file
+        # with universal newlines ("rU") would
+        if "\r" in data:
+            text = data.replace("\r\n", "\n").replace("\r", "\n")
+        else:
+            text = data
+        self.text = text
+
+        # offsets of the first character of every line
+        self.line_starts = array("l", [0])
+        self.line_starts.extend([match.end() for match in newline_regx.finditer(text)])
+        if not text or text.endswith("\n"):
+            self.line_starts.pop()
+        line_count = len(self.line_starts)
+        self.line_starts.append(len(text))
+
+        # the first bullet on every line. These are filled in as plain
+        # lists (cheaper to index while parsing) and packed into arrays
+        # once we're done.
+        line_onsets = [-1] * line_count
+        line_offsets = [-1] * line_count
+
+        # line numbers are tracked by counting the newlines between
+        # one match and the next
+        index = 0
+        position = 0
+        for bullet in self.bullet_regx.finditer(text):
+            start = bullet.start()
+            lines_skipped = text.count("\n", position, start)
+            position = start
+            if lines_skipped:
+                index += lines_skipped
+            elif line_onsets[index] != -1:
+                # only the first bullet on a line counts
+                continue
+            line_onsets[index] = int(bullet.group(1))
+            line_offsets[index] = int(bullet.group(2))
+
+        # logical utterances: a *XYZ: line plus its continuation lines.
+        # The utterance interval runs from the first bullet onset to the
+        # last bullet offset found on any of those lines.
+        speaker_numbers = {}
+        speakers = []
+        onsets = []
+        offsets = []
+        first_lines = []
+        last_lines = []
+
+        index = 0
+        position = 0
+        for utterance in utterance_regx.finditer(text):
+            code = utterance.group(1)
+            if code not in speaker_numbers:
+                speaker_numbers[code] = len(self.speaker_codes)
+                self.speaker_codes.append(code)
+
+            start, end = utterance.span()
+            first = index + text.count("\n", position, start)
+            last = first + text.count("\n", start, end)
+            index = first
+            position = start
+
+            onset = line_onsets[first]
+            offset = line_offsets[first]
+            for line in xrange(first + 1, last + 1):
+                if line_onsets[line] != -1:
+                    if onset == -1:
+                        onset = line_onsets[line]
+                    offset = line_offsets[line]
+
+            speakers.append(speaker_numbers[code])
+            onsets.append(onset)
+            offsets.append(offset)
+            first_lines.append(first)
+            last_lines.append(last)
+
+        self.line_onsets = array("l", line_onsets)
+        self.line_offsets = array("l", line_offsets)
+
+        self.speakers = array("H", speakers)
+        self.onsets = array("l", onsets)
+        self.offsets = array("l", offsets)
+        self.first_lines = array("l", first_lines)
+        self.last_lines = array("l", last_lines)
+
+    def line_count(self):
+        return len(self.line_onsets)
+
+    def utterance_count(self):
+        return len(self.onsets)
+
+    def line(self, index):
+        return self.text[self.line_starts[index]:self.line_starts[index + 1]]
+
+    def bullet(self, index):
+        """
+        :param index: line number
+        :return: (onset, offset) tuple, or None if the line has no bullet
+        """
+        if self.line_onsets[index] == -1:
+            return None
+        return (self.line_onsets[index], self.line_offsets[index])
+
+    def lines(self):
+        """
+        Yields (line, bullet) pairs for every line of the file, where
+        bullet is the (onset, offset) tuple of the line's interval, or
+        None. This is the input the ClanFileParser *_lines() generators
+        work on.
+        """
+        text = self.text
+        starts = self.line_starts
+        onsets = self.line_onsets
+        offsets = self.line_offsets
+
+        for index in xrange(len(onsets)):
+            line = text[starts[index]:starts[index + 1]]
+            if onsets[index] == -1:
+                yield line, None
+            else:
+                yield line, (onsets[index], offsets[index])
+
+    def interval_errors(self):
+        """
+        :return: line numbers of all the bullets whose onset is
+                 greater than their offset
+        """
+        onsets = self.line_onsets
+        offsets = self.line_offsets
+        return [index for index in xrange(len(onsets))
+                if onsets[index] > offsets[index]]
+
+    def speaker(self, utterance):
+        return self.speaker_codes[self.speakers[utterance]]
+
+    def media(self):
+        """
+        :return: the @Media name of the transcript (for LENA transcripts,
+                 e followed by the name of the .its file), or None
+        """
+        match = media_regx.search(self.text)
+        if match is None:
+            return None
+        return match.group(1)
+
+
+class SourceLine(str):
+    """
+    A line of a ClanDocument, as handed out by plan_source(), that
+    carries its line number along. Lines the generators copy through
+    unchanged keep it; anything they build (comments, rewritten
+    bullets) is a plain str, and has none.
+    """
+
+    def __new__(cls, text, number):
+        line = str.__new__(cls, text)
+        line.number = number
+        return line
+
+
+class InsertionPlan:
+    """
+    The edits that turn a ClanDocument into an export file, as a list
+    of (start, end, text) tuples: replace document.text[start:end] with
+    text. Offsets are into the newline normalized document text (which,
+    for files with \n line endings, are the byte offsets on disk).
+
+    Inserting comments into a transcript only touches a handful of
+    places, so instead of writing every line of the export one at a
+    time, write() copies the unchanged stretches of the document in
+    large blocks and splices the edits in between them.
+
+    A plan is filled in by running the output of the *_lines_cha()
+    generators through planned(). Every line the generators copied from
+    the document is a SourceLine (see plan_source()), and is placed by
+    its line number; anything else is an insertion, and document lines
+    that never come out are deletions.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.edits = []
+
+        # number of the next document line that hasn't been placed
+        self.next_line = 0
+
+    def insert(self, line_number, text):
+        position = self.document.line_starts[line_number]
+        if self.edits and self.edits[-1][1] == position:
+            start, end, previous = self.edits[-1]
+            self.edits[-1] = (start, end, previous + text)
+        else:
+            self.edits.append((position, position, text))
+
+    def delete(self, line_number):
+        start = self.document.line_starts[line_number]
+        end = self.document.line_starts[line_number + 1]
+        if self.edits and self.edits[-1][1] == start:
+            previous_start, previous_end, text = self.edits[-1]
+            self.edits[-1] = (previous_start, end, text)
+        else:
+            self.edits.append((start, end, ""))
+
+    def place(self, line):
+        """
+        Records the next line of the export
+
+        :param line: output line
+        :return:
+        """
+        number = getattr(line, "number", None)
+        if number is None or number < self.next_line:
+            # a new line (or a document line written out a second time)
+            self.insert(self.next_line, line)
+            return
+
+        # document lines before this one that never came out
+        # were dropped by the generator
+        for skipped in xrange(self.next_line, number):
+            self.delete(skipped)
+        self.next_line = number + 1
+
+    def planned(self, lines):
+        """
+        Records (line, bullet) pairs into the plan as they pass through
+        """
+        for pair in lines:
+            # by far the most common case, the next document
+            # line was copied straight through
+            if getattr(pair[0], "number", None) == self.next_line:
+                self.next_line += 1
+            else:
+                self.place(pair[0])
+            yield pair
+
+    def finish(self):
+        """
+        Anything left over was dropped at the very end
+        """
+        for line_number in xrange(self.next_line, self.document.line_count()):
+            self.delete(line_number)
+        self.next_line = self.document.line_count()
+
+    def write(self, path):
+        """
+        Writes the edited document to path, copying every unchanged
+        range of the document with a single write.
+        """
+        text = self.document.text
+        with open(path, "w") as output:
+            position = 0
+            for start, end, inserted in self.edits:
+                output.write(text[position:start])
+                output.write(inserted)
+                position = end
+            output.write(text[position:])
+
+
+def plan_source(document):
+    """
+    Yields the (line, bullet) pairs of document, with every line
+    a SourceLine that knows its line number (see InsertionPlan)
+    """
+    for line_number, (line, bullet) in enumerate(document.lines()):
+        yield SourceLine(line, line_number), bullet
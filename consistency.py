@@ -0,0 +1,251 @@
+"""
+Checks that a LENA 5 minute export and a CLAN transcript belong to the
+same recording, and line up the way the rest of the pipeline assumes.
+
+    python consistency.py data/new_input
+    python consistency.py 14_11_lena5min.csv 14_11.lena.cha
+
+The transcript's utterances are binned into short rows (see
+clandensity.py), and summed back up into the export's 5 minute rows at
+every offset within maximum_lag of each other. The offset where the
+Meaningful, AWC and CTC columns correlate best is the estimated time
+offset between the two files.
+"""
+import os
+import sys
+from itertools import izip
+
+from clandocument import ClanDocument
+from lenadata import LenaData, file_digest, media_matches
+from overlaps import row_minutes
+
+
+# the columns compared, in both files
+compared_columns = ("meaningful", "awc_actual", "ctc_actual")
+
+
+class ConsistencyReport:
+    """
+    The result of check_pair(). problems lists everything that looks
+    wrong with the pair, in words, and is empty if nothing does.
+    """
+
+    def __init__(self, lena_file, clan_file):
+        self.lena_file = lena_file
+        self.clan_file = clan_file
+
+        self.lena_media = None          # ProcessingFile
+        self.clan_media = None          # @Media
+
+        # seconds between the start of the export's first (clock
+        # aligned) row and the start of the transcript
+        self.expected_lead = None       # from the first row's Duration
+        self.estimated_lead = None      # where the columns line up best
+
+        # column -> correlation, at the estimated lead
+        self.correlations = {}
+        self.correlation = None         # their average
+
+        self.lena_seconds = None        # total Duration of the export
+        self.clan_seconds = None        # end of the last utterance
+
+        self.problems = []
+
+    def ok(self):
+        return not self.problems
+
+    def __str__(self):
+        lines = ["{} / {}".format(self.lena_file, os.path.basename(self.clan_file))]
+        if self.correlation is not None:
+            lines.append("    correlation {:.2f} ({}), lead {}s (expected {}s)".format(
+                self.correlation,
+                ", ".join("{} {:.2f}".format(column, self.correlations[column])
+                          for column in compared_columns),
+                self.estimated_lead, self.expected_lead))
+        for problem in self.problems:
+            lines.append("    " + problem)
+        return "\n".join(lines)
+
+
+def check_pair(lena_file, clan_file, step_seconds=10, maximum_lag=3600,
+               minimum_correlation=0.5, tolerance=60):
+    """
+    Compares a LENA 5 minute export to a CLAN transcript.
+
+    The transcript is binned into step_seconds rows once, and turned
+    into prefix sums, so summing it into 5 minute rows at another
+    offset is a subtraction per row. Offsets (multiples of step_seconds,
+    up to maximum_lag either way) are tried against the export, a
+    Pearson correlation per column: every 5 minutes first, then every
+    step_seconds within 5 minutes of the best of those.
+
+    :param lena_file: path to the 5 minute csv
+    :param clan_file: path to the CLAN transcript
+    :param step_seconds: resolution of the estimated offset, in seconds
+    :param maximum_lag: largest offset tried, in seconds
+    :param minimum_correlation: pairs whose columns correlate less
+                                than this (at the best offset) don't match
+    :param tolerance: largest difference (in seconds) between the
+                      estimated and the expected offset
+    :return: ConsistencyReport
+    """
+    report = ConsistencyReport(lena_file, clan_file)
+    lena = LenaData.load(lena_file)
+    clan = LenaData.load(clan_file, step_seconds / 60.0)
+
+    # only the export's rows of this recording, if it has several
+    report.clan_media = ClanDocument.load(clan_file).media()
+    rows = None
+    for child_key, processing_file, recording_rows in lena.recordings():
+        if rows is None or media_matches(processing_file, report.clan_media):
+            rows = recording_rows
+            report.lena_media = processing_file
+    if not rows:
+        report.problems.append("the export has no rows")
+        return report
+
+    if report.clan_media is not None and not media_matches(report.lena_media, report.clan_media):
+        report.problems.append("the export is of {}, the transcript of {}".format(
+            report.lena_media, report.clan_media))
+
+    row_seconds = int(round(row_minutes * 60))
+    durations = [lena.durations[row] for row in rows]
+    report.expected_lead = int(round(row_seconds - durations[0]))
+    report.lena_seconds = sum(durations)
+    report.clan_seconds = sum(clan.durations)
+    if abs(report.lena_seconds - report.clan_seconds) > row_seconds:
+        report.problems.append("the export is {}s long, the transcript {}s".format(
+            int(report.lena_seconds), int(report.clan_seconds)))
+
+    steps = row_seconds // step_seconds
+    lena_columns = dict((column, [getattr(lena, column)[row] for row in rows])
+                        for column in compared_columns)
+    clan_prefixes = dict((column, prefix_sums(getattr(clan, column)))
+                         for column in compared_columns)
+
+    def best_lag(lags):
+        best = None
+        for lag in lags:
+            correlations = {}
+            for column in compared_columns:
+                correlations[column] = correlation(lena_columns[column],
+                                                   shifted_rows(clan_prefixes[column], lag,
+                                                                steps, len(rows)))
+            average = sum(correlations.values()) / len(correlations)
+            if best is None or average > best[0]:
+                best = (average, lag, correlations)
+        return best
+
+    # whole 5 minute rows first, then every step around the best of them
+    lags = maximum_lag // step_seconds
+    lag = best_lag(xrange(-lags, lags + 1, steps))[1]
+    report.correlation, lag, report.correlations = \
+        best_lag(xrange(max(-lags, lag - steps), min(lags, lag + steps) + 1))
+    report.estimated_lead = lag * step_seconds
+
+    if report.correlation < minimum_correlation:
+        report.problems.append("the columns don't match (correlation {:.2f}), "
+                               "wrong transcript?".format(report.correlation))
+    elif abs(report.estimated_lead - report.expected_lead) > tolerance:
+        report.problems.append("the transcript lines up {}s into the export, "
+                               "not {}s".format(report.estimated_lead, report.expected_lead))
+    return report
+
+
+def shifted_rows(prefix, lag, steps, rows):
+    """
+    Sums short rows into long ones, with the first long row starting
+    lag short rows before the first short one (so the short rows are
+    shifted lag rows into the long ones).
+
+    :param prefix: prefix sums of the short rows (see prefix_sums())
+    :param lag: offset, in short rows
+    :param steps: short rows per long row
+    :param rows: number of long rows
+    :return: list with the sum of every long row
+    """
+    last = len(prefix) - 1
+    bounds = [min(last, max(0, row * steps - lag)) for row in xrange(rows + 1)]
+    return [prefix[end] - prefix[start] for start, end in izip(bounds, bounds[1:])]
+
+
+def prefix_sums(column):
+    prefix = [0.0]
+    total = 0.0
+    for value in column:
+        total += value
+        prefix.append(total)
+    return prefix
+
+
+def correlation(xs, ys):
+    """
+    :return: Pearson correlation of xs and ys, 0 if either is constant
+    """
+    count = float(len(xs))
+    mean_x = sum(xs) / count
+    mean_y = sum(ys) / count
+    covariance = 0.0
+    variance_x = 0.0
+    variance_y = 0.0
+    for x, y in izip(xs, ys):
+        x -= mean_x
+        y -= mean_y
+        covariance += x * y
+        variance_x += x * x
+        variance_y += y * y
+    if variance_x == 0 or variance_y == 0:
+        return 0.0
+    return covariance / (variance_x * variance_y) ** 0.5
+
+
+def check_recording(recording):
+    """
+    :param recording: pipeline.Recording
+    :return: ConsistencyReport for its export and transcript, None if
+             it has no export (the transcript is all there is)
+    """
+    if not os.path.isfile(recording.lena_file):
+        return None
+    return check_pair(recording.lena_file, recording.clan_file)
+
+
+def duplicates(recordings):
+    """
+    :param recordings: list of pipeline.Recordings
+    :return: lists of the recordings whose transcripts are identical
+    """
+    folders = {}
+    for recording in recordings:
+        folders.setdefault(file_digest(recording.clan_file), []).append(recording)
+    return [same for same in folders.values() if len(same) > 1]
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    from pipeline import find_recordings
+
+    if len(argv) == 2:
+        reports = [check_pair(argv[0], argv[1])]
+        copies = []
+    elif len(argv) == 1:
+        recordings = find_recordings(argv[0])
+        reports = [report for report in map(check_recording, recordings) if report is not None]
+        copies = duplicates(recordings)
+    else:
+        print "usage: consistency.py data_dir | consistency.py lena5min.csv transcript.cha"
+        return 2
+
+    for report in reports:
+        print report
+    for same in copies:
+        print "same transcript in: " + ", ".join(recording.folder for recording in same)
+
+    if copies or not all(report.ok() for report in reports):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import calendar
+import os
+import re
+import time
+from xml.etree.cElementTree import iterparse
+
+from lenadata import LenaData, file_digest
+
+
+# ISO 8601 durations as used by LENA, e.g. PT1234.56S
+duration_regx = re.compile("^P(?:T)?(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?$")
+
+# speakers whose segments count as meaningful (near, clear) speech:
+# the key child, female/male adults, and other children nearby
+meaningful_speakers = set(["CHN", "FAN", "MAN", "CXN"])
+
+
+class Bin:
+
+    def __init__(self):
+        self.duration = 0.0     # seconds of recording in the bin
+        self.meaningful = 0.0   # seconds of meaningful speech
+        self.awc = 0.0          # adult word count (LENA estimates are fractional)
+        self.ctc = 0            # conversational turns
+        self.cvc = 0            # child vocalizations
+
+
+def parse_its(path, row_minutes=5):
+    """
+    Builds the same columns a LENA 5 minute export has, straight from
+    the .its file it was exported from.
+
+    The .its file is read with iterparse, and every element is thrown
+    away as soon as it's been added to its bin, so memory use only
+    depends on the number of bins, not the size of the file. Bins are
+    aligned to the clock (like the export's 09:00, 09:05, ... rows) and
+    can be shorter than 5 minutes.
+
+    Per bin:
+        Duration    recorded time inside the bin
+        Meaningful  time covered by CHN/FAN/MAN/CXN segments
+        AWC.Actual  femaleAdultWordCnt + maleAdultWordCnt
+        CTC.Actual  turnTaking of the conversations starting in the bin
+        CVC.Actual  childUttCnt of the key child's (CHN) segments
+
+    Segment times are split across the bins they overlap, counts go to
+    the bin the segment starts in. Pauses between recordings are kept
+    as empty rows, so rows stay evenly spaced in time.
+
+    :param path: path to the .its file
+    :param row_minutes: length of a bin, in minutes
+    :return: LenaData
+    """
+    bin_seconds = row_minutes * 60.0
+    bins = {}
+
+    def bin_at(number):
+        found = bins.get(number)
+        if found is None:
+            found = bins[number] = Bin()
+        return found
+
+    def spread(start, end, attribute):
+        # add the [start, end) clock interval (in seconds since 1970)
+        # to every bin it overlaps
+        number = int(start // bin_seconds)
+        while start < end:
+            bin_end = (number + 1) * bin_seconds
+            piece = min(end, bin_end) - start
+            current = bin_at(number)
+            setattr(current, attribute, getattr(current, attribute) + piece)
+            start = bin_end
+            number += 1
+
+    child_key = ""
+    utc_offset = 0.0            # local time - UTC, in seconds
+    recording_start = None      # clock time of the current <Recording>, UTC seconds
+    recording_offset = 0.0      # its startTime, in seconds since the start of the file
+
+    # the elements that have been opened but not closed yet
+    open_elements = []
+
+    for event, element in iterparse(path, events=("start", "end")):
+        tag = element.tag
+
+        if event == "start":
+            open_elements.append(element)
+            if tag == "Recording":
+                recording_start = parse_clock_time(element.get("startClockTime"))
+                recording_offset = parse_duration(element.get("startTime"))
+                if recording_start is not None:
+                    spread(recording_start + utc_offset,
+                           recording_start + utc_offset +
+                           parse_duration(element.get("endTime")) - recording_offset,
+                           "duration")
+            continue
+
+        open_elements.pop()
+
+        if tag == "TransferTime":
+            local_time = parse_clock_time(element.get("LocalTime"))
+            utc_time = parse_clock_time(element.get("UTCTime"))
+            if local_time is not None and utc_time is not None:
+                utc_offset = local_time - utc_time
+
+        elif tag == "Child" and element.get("ChildKey"):
+            child_key = element.get("ChildKey")
+
+        elif tag == "Conversation" and recording_start is not None:
+            start = clock(element.get("startTime"), recording_start, recording_offset, utc_offset)
+            bin_at(int(start // bin_seconds)).ctc += int(float(element.get("turnTaking", 0)))
+
+        elif tag == "Segment" and recording_start is not None:
+            start = clock(element.get("startTime"), recording_start, recording_offset, utc_offset)
+            end = clock(element.get("endTime"), recording_start, recording_offset, utc_offset)
+            speaker = element.get("spkr")
+
+            if speaker in meaningful_speakers:
+                spread(start, end, "meaningful")
+
+            current = bin_at(int(start // bin_seconds))
+            current.awc += float(element.get("femaleAdultWordCnt", 0)) + \
+                           float(element.get("maleAdultWordCnt", 0))
+            if speaker == "CHN":
+                current.cvc += int(float(element.get("childUttCnt", 0)))
+
+        # nothing is kept once it's been counted
+        element.clear()
+        if open_elements:
+            open_elements[-1].remove(element)
+
+    stat = os.stat(path)
+    data = LenaData(path, stat.st_mtime, stat.st_size, file_digest(path))
+    data.row_minutes = row_minutes
+
+    processing_file = os.path.basename(path)
+
+    # every bin from the first to the last one with recorded time, so
+    # that row i is always bin_seconds * i after the first row. Pauses
+    # in the recording are empty (zero valued) rows rather than left
+    # out, or the rows after them would no longer line up with the
+    # transcript's times.
+    recorded = [number for number in bins if bins[number].duration > 0]
+    if recorded:
+        numbers = xrange(min(recorded), max(recorded) + 1)
+    else:
+        numbers = []
+    for number in numbers:
+        current = bins.get(number) or Bin()
+        minutes = int(number * bin_seconds // 60)
+        data.timestamps.append(time.strftime("%Y-%m-%d %H:%M", time.gmtime(minutes * 60)))
+        data.minutes.append(minutes)
+        data.durations.append(int(round(current.duration)))
+        data.meaningful.append(int(round(current.meaningful)))
+        data.awc_actual.append(int(round(current.awc)))
+        data.ctc_actual.append(current.ctc)
+        data.cvc_actual.append(current.cvc)
+        data.child_keys.append(0)
+        data.processing_files.append(0)
+
+    data.child_key_codes = [child_key]
+    data.processing_file_codes = [processing_file]
+    return data
+
+
+def clock(duration, recording_start, recording_offset, utc_offset):
+    """
+    :param duration: a PT...S time, relative to the start of the .its file
+    :return: local clock time, in seconds since 1970
+    """
+    return recording_start + parse_duration(duration) - recording_offset + utc_offset
+
+
+def parse_duration(text):
+    """
+    :param text: ISO 8601 duration, e.g. PT1234.56S
+    :return: seconds
+    """
+    if not text:
+        return 0.0
+    match = duration_regx.match(text)
+    if match is None:
+        raise Exception("can't read the .its time \"{}\"".format(text))
+    hours, minutes, seconds = [float(value or 0) for value in match.groups()]
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def parse_clock_time(text):
+    """
+    :param text: e.g. 2015-07-15T14:00:00Z
+    :return: seconds since 1970, or None
+    """
+    if not text:
+        return None
+    text = text.rstrip("Z")
+    fraction = 0.0
+    if "." in text:
+        text, digits = text.split(".", 1)
+        fraction = float("0." + digits)
+    return calendar.timegm(time.strptime(text, "%Y-%m-%dT%H:%M:%S")) + fraction
@@ -0,0 +1,393 @@
+import calendar
+import csv
+import hashlib
+import os
+import re
+import struct
+from array import array
+from itertools import izip
+
+
+# both 2015-02-13 09:05 (newer exports) and 02/13/2015 09:05 (older ones)
+timestamp_regx = re.compile("(\d+)[/-](\d+)[/-](\d+)\s+(\d+):(\d+)(?::(\d+))?")
+
+
+class LenaData:
+    """
+    A LENA 5 minute export (e.g. 14_11_lena5min.csv), loaded column
+    by column into typed arrays. The same columns can also be built
+    straight from a LENA .its file (see itsfile.parse_its()), or from
+    the utterances of a LENA CLAN transcript (see clandensity.parse_clan()).
+
+    Columns are found by their header name rather than their position,
+    so exports with extra or reordered columns load the same way. The
+    parsed columns are kept next to the csv in a binary sidecar
+    (e.g. 14_11_lena5min.csv.idx), so opening the same export again
+    doesn't parse the csv at all. The sidecar is rebuilt whenever the
+    csv's size (or, if only the mtime changed, its sha1 hash) no
+    longer matches.
+
+    Use LenaData.load() rather than the constructor.
+    """
+
+    magic = "AWLENAIX"
+    version = 4
+
+    # magic, version, array itemsize, mtime, size, sha1, row count, row length,
+    # utc offset
+    header = struct.Struct("<8sHHdq20sqdd")
+    # number of strings, length of the text they're joined into
+    text_header = struct.Struct("<qq")
+
+    # (path, row_minutes) -> LenaData, see load()
+    cache = {}
+
+    # header name -> attribute, for every column we use
+    columns = [("Timestamp", "timestamps"),
+               ("Duration", "durations"),
+               ("Meaningful", "meaningful"),
+               ("AWC.Actual", "awc_actual"),
+               ("CTC.Actual", "ctc_actual"),
+               ("CVC.Actual", "cvc_actual"),
+               ("ChildKey", "child_keys"),
+               ("ProcessingFile", "processing_files")]
+
+    def __init__(self, path, mtime, size, digest):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+
+        # length of a row, in minutes. The csv exports always have
+        # 5 minute rows, rows built from .its or CLAN files can be
+        # shorter (and a fraction of a minute long).
+        self.row_minutes = 5
+
+        # local time - UTC (in seconds) the timestamps of a CLAN file's
+        # rows were moved by, see clandensity.parse_clan(). Always 0
+        # for csv and .its files, which are in local time already.
+        self.utc_offset = 0
+
+        # one entry per row
+        self.timestamps = []            # as written in the csv, e.g. "2015-07-15 09:05"
+        self.minutes = array("l")       # timestamp, in minutes since 1970
+        self.durations = array("d")     # length of the row, in seconds
+        self.meaningful = array("d")    # meaningful speech, in seconds
+        self.awc_actual = array("l")
+        self.ctc_actual = array("l")
+        self.cvc_actual = array("l")
+
+        # ChildKey and ProcessingFile (the .its file) repeat on every
+        # row, so they're stored once and referenced by number
+        self.child_key_codes = []
+        self.child_keys = array("H")
+        self.processing_file_codes = []
+        self.processing_files = array("H")
+
+    @classmethod
+    def load(cls, path, row_minutes=5, utc_offset=None):
+        """
+        Returns the data in the LENA export (or .its/CLAN file) at path,
+        from its sidecar if it's still valid, or parsing the file (and
+        saving the sidecar) otherwise. Like ClanDocument.load(), data
+        loaded earlier in this session is reused if the file hasn't
+        changed since.
+
+        :param path: path to the LENA 5 minute csv, .its file or CLAN file
+        :param row_minutes: length of a row, in minutes (.its and CLAN files only)
+        :param utc_offset: local time - UTC, in seconds, of a CLAN file's
+                           timestamps (see clandensity.parse_clan()),
+                           None for this computer's time zone
+        :return: LenaData
+        """
+        transcript = path.lower().endswith((".cha", ".cex"))
+        if not transcript:
+            utc_offset = 0
+        elif utc_offset is None:
+            from clandensity import default_utc_offset
+            utc_offset = default_utc_offset(path)
+
+        key = (path, row_minutes, utc_offset)
+        data = cls.cache.get(key)
+        if data is not None:
+            stat = os.stat(path)
+            if stat.st_mtime == data.mtime and stat.st_size == data.size:
+                return data
+
+        data = cls.load_sidecar(path, row_minutes, utc_offset)
+        if data is None:
+            if path.lower().endswith(".its"):
+                from itsfile import parse_its
+                data = parse_its(path, row_minutes)
+            elif transcript:
+                from clandensity import parse_clan
+                data = parse_clan(path, row_minutes, utc_offset)
+            elif row_minutes != 5:
+                raise Exception("{} is a 5 minute export, it can't be split "
+                                "into {} minute rows".format(path, row_minutes))
+            else:
+                data = cls.parse(path)
+            data.save()
+        cls.cache[key] = data
+        return data
+
+    @classmethod
+    def parse(cls, path):
+        stat = os.stat(path)
+        data = cls(path, stat.st_mtime, stat.st_size, file_digest(path))
+
+        with open(path, "rU") as file:
+            reader = csv.reader(file)
+            header = reader.next()
+            rows = [row for row in reader if row]
+
+        # pull every column out whole, by its header name
+        values = {}
+        for name, attribute in cls.columns:
+            if name not in header:
+                raise Exception("{} is missing the {} column".format(path, name))
+            position = header.index(name)
+            values[attribute] = [row[position] for row in rows]
+
+        data.timestamps = values["timestamps"]
+        data.minutes = array("l", map(timestamp_to_minutes, data.timestamps))
+        data.durations = array("d", map(hms_to_seconds, values["durations"]))
+        data.meaningful = array("d", map(hms_to_seconds, values["meaningful"]))
+
+        # empty counts (rows with no speech at all) count as 0
+        data.awc_actual = array("l", [int(value or 0) for value in values["awc_actual"]])
+        data.ctc_actual = array("l", [int(value or 0) for value in values["ctc_actual"]])
+        data.cvc_actual = array("l", [int(value or 0) for value in values["cvc_actual"]])
+
+        data.child_key_codes, data.child_keys = encode(values["child_keys"])
+        data.processing_file_codes, data.processing_files = encode(values["processing_files"])
+        return data
+
+    @classmethod
+    def load_sidecar(cls, path, row_minutes=5, utc_offset=0):
+        """
+        :param path: path to the LENA 5 minute csv, .its file or CLAN file
+        :param row_minutes: length of a row, in minutes
+        :param utc_offset: local time - UTC of the timestamps, in seconds
+        :return: the LenaData stored in the sidecar, or None if
+                 there isn't one, it's out of date or it has
+                 rows of a different length or time zone
+        """
+        try:
+            file = open(sidecar_path(path), "rb")
+        except IOError:
+            return None
+
+        with file:
+            try:
+                magic, version, itemsize, mtime, size, digest, count, minutes, offset = \
+                    cls.header.unpack(file.read(cls.header.size))
+            except struct.error:
+                return None
+
+            if magic != cls.magic or version != cls.version \
+                    or itemsize != array("l").itemsize or minutes != row_minutes \
+                    or offset != utc_offset:
+                return None
+
+            stat = os.stat(path)
+            if stat.st_size != size:
+                return None
+            if stat.st_mtime != mtime and file_digest(path) != digest:
+                return None
+
+            data = cls(path, mtime, size, digest)
+            data.row_minutes = row_minutes
+            data.utc_offset = utc_offset
+            try:
+                for numbers in data.arrays():
+                    numbers.fromfile(file, count)
+                data.timestamps = read_text(file)
+                data.child_key_codes = read_text(file)
+                data.processing_file_codes = read_text(file)
+            except (EOFError, struct.error):
+                return None
+
+        if stat.st_mtime != mtime:
+            # same contents, new mtime. Save it so the next
+            # load doesn't have to hash the file again.
+            data.mtime = stat.st_mtime
+            data.save()
+        return data
+
+    def save(self):
+        """
+        Writes the columns to the sidecar file. Failing to write it
+        isn't an error, the csv will just be parsed again next time.
+        """
+        sidecar = sidecar_path(self.path)
+        temp = sidecar + ".tmp"
+        try:
+            with open(temp, "wb") as file:
+                file.write(self.header.pack(self.magic,
+                                            self.version,
+                                            self.minutes.itemsize,
+                                            self.mtime,
+                                            self.size,
+                                            self.digest,
+                                            len(self),
+                                            self.row_minutes,
+                                            self.utc_offset))
+                for numbers in self.arrays():
+                    numbers.tofile(file)
+                write_text(file, self.timestamps)
+                write_text(file, self.child_key_codes)
+                write_text(file, self.processing_file_codes)
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+            os.rename(temp, sidecar)
+        except (IOError, OSError):
+            pass
+
+    def arrays(self):
+        """
+        :return: the numeric columns, in the order they're saved in
+        """
+        return [self.minutes, self.durations, self.meaningful,
+                self.awc_actual, self.ctc_actual, self.cvc_actual,
+                self.child_keys, self.processing_files]
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def recordings(self):
+        """
+        Splits the rows up by recording (ChildKey and ProcessingFile),
+        in a single pass over the rows.
+
+        :return: list of (child key, processing file, array of row
+                 numbers) tuples, in the order the recordings first appear
+        """
+        groups = {}
+        order = []
+        for row, key in enumerate(izip(self.child_keys, self.processing_files)):
+            rows = groups.get(key)
+            if rows is None:
+                rows = groups[key] = array("l")
+                order.append(key)
+            rows.append(row)
+
+        return [(self.child_key_codes[child_key],
+                 self.processing_file_codes[processing_file],
+                 groups[(child_key, processing_file)])
+                for child_key, processing_file in order]
+
+    def recording_rows(self, media=None):
+        """
+        Picks out the rows of the recording a transcript is of, so
+        that windows never straddle two recordings of the same export.
+
+        :param media: the transcript's @Media name (see ClanDocument.media()),
+                      or None if it isn't known
+        :return: array of row numbers. An export holding a single
+                 recording is returned whole.
+        """
+        recordings = self.recordings()
+        if len(recordings) == 1:
+            return recordings[0][2]
+
+        matches = [rows for child_key, processing_file, rows in recordings
+                   if media is not None and media_matches(processing_file, media)]
+        if len(matches) == 1:
+            return matches[0]
+        if not matches:
+            raise Exception("{} holds {} recordings, and none of them is {}".format(
+                self.path, len(recordings), media))
+        raise Exception("{} holds {} recordings of {}, can't tell which to use".format(
+            self.path, len(matches), media))
+
+    def child_key(self, row):
+        return self.child_key_codes[self.child_keys[row]]
+
+    def processing_file(self, row):
+        return self.processing_file_codes[self.processing_files[row]]
+
+
+def sidecar_path(path):
+    return path + ".idx"
+
+
+def file_digest(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), ""):
+            sha1.update(block)
+    return sha1.digest()
+
+
+def media_matches(processing_file, media):
+    """
+    :param processing_file: a ProcessingFile, e.g. 20150720_104920_003593.its
+    :param media: a transcript's @Media name, e.g. e20150720_104920_003593
+    :return: True if they're the same recording
+    """
+    stem = re.sub("\.its$", "", processing_file.strip('"'))
+    return media in (stem, "e" + stem)
+
+
+def hms_to_seconds(text):
+    """
+    :param text: "HH:MM:SS"
+    :return: number of seconds
+    """
+    hours, minutes, seconds = text.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def timestamp_to_minutes(text):
+    """
+    :param text: "2015-02-13 09:05" or "02/13/2015 09:05"
+    :return: minutes since 1970
+    """
+    match = timestamp_regx.match(text.strip())
+    if match is None:
+        raise Exception("can't read the timestamp \"{}\"".format(text))
+    first, second, third, hour, minute, second_of_minute = match.groups()
+
+    if len(first) == 4:
+        year, month, day = int(first), int(second), int(third)
+    else:
+        month, day, year = int(first), int(second), int(third)
+        if year < 100:
+            year += 2000
+
+    return calendar.timegm((year, month, day, int(hour), int(minute),
+                            int(second_of_minute or 0), 0, 0, 0)) / 60
+
+
+def encode(values):
+    """
+    :param values: list of strings with many repeats
+    :return: (list of the distinct strings, array of their positions in it)
+    """
+    numbers = {}
+    codes = []
+    encoded = array("H")
+    for value in values:
+        number = numbers.get(value)
+        if number is None:
+            number = numbers[value] = len(codes)
+            codes.append(value)
+        encoded.append(number)
+    return codes, encoded
+
+
+def write_text(file, strings):
+    text = "\n".join(strings)
+    file.write(LenaData.text_header.pack(len(strings), len(text)))
+    file.write(text)
+
+
+def read_text(file):
+    count, length = LenaData.text_header.unpack(file.read(LenaData.text_header.size))
+    text = file.read(length)
+    if len(text) != length:
+        raise EOFError()
+    if count == 0:
+        return []
+    return text.split("\n")
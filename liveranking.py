@@ -0,0 +1,177 @@
+"""
+Ranks the subregions of a LENA 5 minute export while it's still being
+written, e.g. by recorders that upload their 5 minute aggregates
+during the day, so that the subregions are known the moment the
+recording ends.
+
+    python liveranking.py data/new_input/14_11/14_11_lena5min.csv --once
+    python liveranking.py uploads/14_11_lena5min.csv --metric awc_actual --interval 60
+
+The export is read from where the last read stopped, every --interval
+seconds. Every complete row goes into an OnlineWordDensitySet, which
+keeps the top subregions up to date row by row, and the ranking is
+printed whenever it changes. A new ChildKey/ProcessingFile (a new
+recording in the same export) starts a new ranking, windows don't
+straddle two recordings. Stop it with Ctrl-C, or use --once to rank
+what's in the file and stop.
+"""
+import argparse
+import csv
+import sys
+import time
+
+from lenadata import hms_to_seconds, timestamp_to_minutes
+from overlaps import OnlineWordDensitySet, Overlaps, minutes_to_rows, row_minutes
+
+
+class ExportFollower:
+    """
+    Reads the rows appended to a LENA 5 minute export since the last
+    read. Only complete lines are read, a row that's still being
+    written is left for the next read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.position = 0       # where the next read starts
+        self.header = None
+
+    def read(self):
+        """
+        :return: list of the new rows, each a dict of header name -> value
+        """
+        with open(self.path, "rb") as export:
+            export.seek(self.position)
+            text = export.read()
+        complete = text.rfind("\n") + 1
+        self.position += complete
+
+        rows = []
+        for row in csv.reader(text[:complete].splitlines()):
+            if not row:
+                continue
+            if self.header is None:
+                self.header = row
+                continue
+            rows.append(dict(zip(self.header, row)))
+        return rows
+
+
+class LiveRanking:
+    """
+    The ranking of the recording the rows currently coming in are of
+    """
+
+    def __init__(self, metric, top_n, window, stride):
+        self.metric = metric
+        self.top_n = top_n
+        self.window = window
+        self.stride = stride
+
+        self.recording = None       # (ChildKey, ProcessingFile)
+        self.dataset = None         # OnlineWordDensitySet
+        self.start = None           # first row's timestamp, in minutes since 1970
+        self.ranked = []
+
+    def add(self, row):
+        """
+        :param row: dict of header name -> value, as read by ExportFollower
+        :return:
+        """
+        recording = recording_key(row)
+        if recording != self.recording:
+            date, clock = row["Timestamp"].split()
+            self.recording = recording
+            self.start = timestamp_to_minutes(row["Timestamp"])
+            self.dataset = OnlineWordDensitySet(tuple(date.replace("/", "-").split("-")) +
+                                                tuple(clock.split(":")),
+                                                self.top_n, self.window, self.stride)
+            self.ranked = []
+
+        # empty counts (rows with no speech at all) count as 0
+        self.dataset.append_lena_row(hms_to_seconds(row["Duration"]),
+                                     hms_to_seconds(row["Meaningful"]),
+                                     int(row["AWC.Actual"] or 0),
+                                     int(row["CTC.Actual"] or 0),
+                                     int(row["CVC.Actual"] or 0))
+
+    def update(self):
+        """
+        :return: True if the ranking changed since the last update
+        """
+        ranked = self.dataset.ranked(self.metric)
+        changed = ranked != self.ranked
+        self.ranked = ranked
+        return changed
+
+    def clock(self, offset):
+        """
+        :param offset: row number
+        :return: "HH:MM" the row starts at
+        """
+        return time.strftime("%H:%M", time.gmtime((self.start + offset * row_minutes) * 60))
+
+    def __str__(self):
+        averages = self.dataset.averages[self.metric]
+        lines = ["{} rows of {}, top {} by {}:".format(len(self.dataset.meaningful),
+                                                      self.recording[1].strip('"'),
+                                                      self.top_n, self.metric)]
+        for rank, offset in enumerate(self.ranked):
+            lines.append("{:4}  {}-{}  {:.2f}".format(rank + 1, self.clock(offset),
+                                                      self.clock(offset + self.window),
+                                                      averages[offset]))
+        return "\n".join(lines)
+
+
+def recording_key(row):
+    return row["ChildKey"], row["ProcessingFile"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank the subregions of a LENA 5 minute "
+                                                 "export while it's being written")
+    parser.add_argument("lena_file", help="LENA 5 minute export (e.g. 14_11_lena5min.csv)")
+    parser.add_argument("--metric", choices=Overlaps.metrics, default="ctc_cvc",
+                        help="what to rank the subregions by (default: ctc_cvc)")
+    parser.add_argument("--top-n", type=int, default=5,
+                        help="number of subregions to find (default: 5)")
+    parser.add_argument("--window-minutes", type=float, default=60,
+                        help="subregion length, in minutes (default: 60)")
+    parser.add_argument("--stride-minutes", type=float, default=5,
+                        help="distance between candidate subregions, in minutes (default: 5)")
+    parser.add_argument("--interval", type=float, default=60,
+                        help="seconds between reads of the export (default: 60)")
+    parser.add_argument("--once", action="store_true",
+                        help="rank the rows that are in the export now, and stop")
+    args = parser.parse_args(argv)
+
+    try:
+        window = minutes_to_rows(args.window_minutes)
+        stride = minutes_to_rows(args.stride_minutes)
+    except Exception, e:
+        parser.error(e.args[0])
+
+    follower = ExportFollower(args.lena_file)
+    ranking = LiveRanking(args.metric, args.top_n, window, stride)
+    try:
+        while True:
+            changed = False
+            for row in follower.read():
+                if changed and ranking.recording != recording_key(row):
+                    # the final ranking of the recording that just ended
+                    print ranking
+                    changed = False
+                ranking.add(row)
+                changed = ranking.update() or changed
+            if changed:
+                print ranking
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
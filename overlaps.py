@@ -1,12 +1,80 @@
-import csv
+import math
+import os
+import re
+from array import array
+from bisect import bisect
+from heapq import heappop, heappush
+from itertools import izip
+
+from lenadata import LenaData
+
+
+# every row of a LENA 5 minute export covers 5 minutes
+row_minutes = 5
 
-import audiowords
 
 class Overlaps:
 
-    def __init__(self, lena_file, top_n):
+    # the ranking metrics, named after their WordDensitySet columns
+    metrics = ["meaningful", "awc_actual", "ctc_actual", "cvc_actual", "ctc_cvc"]
+
+    # ways of taking silences into account, see use_silences()
+    silence_modes = ["exclude", "weight", "normalize"]
+
+    def __init__(self, lena_file, top_n, window=12, stride=1, rows=None, row_minutes=row_minutes,
+                 silences=None, silence_mode="normalize", maximum_silence=0.5, utc_offset=None):
+        """
+        :param lena_file: LENA 5 minute export (csv), LENA .its file, or
+                          LENA CLAN transcript (see clandensity.parse_clan())
+        :param top_n: how many subregions to find
+        :param window: length of a subregion, in rows (12 = 1 hour)
+        :param stride: distance between candidate subregions, in rows
+        :param rows: only use these rows of the export (e.g. the rows of
+                     one recording, see load_recordings()), all by default
+        :param row_minutes: length of a row in minutes. Always 5 for csv
+                            exports, .its and CLAN files can be split up
+                            finer (e.g. 10/60.0 for 10 second rows).
+        :param silences: SilenceSet of the recording, to rank with (see use_silences())
+        :param silence_mode: how the silences are taken into account
+        :param maximum_silence: windows more silent than this are left out
+        :param utc_offset: local time - UTC, in seconds, for the timestamps
+                           of a CLAN file (see clandensity.parse_clan()),
+                           None for this computer's time zone
+        """
+        self.lena_file = lena_file
+        self.data = None        # the LenaData the dataset was loaded from
         self.dataset = None
         self.top_n = top_n
+        self.window = window
+        self.stride = stride
+        self.row_minutes = row_minutes
+        self.utc_offset = utc_offset
+
+        # Everything that doesn't depend on top_n is cached, so that
+        # re-ranking (see rerank()) doesn't have to redo it:
+        #
+        #   scores: (metric, window)         -> averages for every offset
+        #   orders: (metric, window, stride) -> (region map, offsets in rank order)
+        #   tables: (metric, window, stride) -> RangeMaximum over the region map
+        self.scores = {}
+        self.orders = {}
+        self.tables = {}
+
+        # only rank subregions that lie within these rows (see set_range()),
+        # None for no limit
+        self.start_row = None
+        self.end_row = None
+
+        # fraction of every row that's silent (see use_silences()),
+        # None to rank without silences
+        self.silences = silences
+        self.silence_coverage = None
+        self.silence_mode = silence_mode
+        self.maximum_silence = maximum_silence
+
+        # the recording the rows came from
+        self.child_key = None
+        self.processing_file = None
 
         self.meaningful_regions = None
         self.awc_actual_regions = None
@@ -26,9 +94,17 @@ class Overlaps:
         self.ranked_cvc_actual = None
         self.ranked_ctc_cvc = None
 
-        self.load_data(lena_file)
+        # the non-overlapping regions with the highest combined
+        # average (see optimal_filter()), as opposed to the greedy
+        # ranked_* choice above. The search behind them is far slower
+        # than the greedy one, so optimal_meaningful, optimal_awc_actual,
+        # etc. are only worked out when they're asked for (see
+        # __getattr__()), and kept here until the next ranking.
+        self.optimal_regions = {}
 
-    def load_data(self, file):
+        self.load_data(lena_file, rows)
+
+    def load_data(self, file, rows=None):
         """
         Parses out all the values from the lena file and fills
         the member variables for class Overlaps with all the
@@ -37,103 +113,70 @@ class Overlaps:
         that was just pulled from the file
 
         :param file: lena file.
+        :param rows: row numbers to load, all of them if None
         :return:
         """
+        data = LenaData.load(file, self.row_minutes, self.utc_offset)
+        self.data = data
+        self.scores = {}
+        self.orders = {}
+        self.tables = {}
+        if rows is None:
+            rows = xrange(len(data))
+            if len(data.recordings()) > 1:
+                print "Your file contains more than one recording (see load_recordings())"
+
         visit_date = None
-        with open(file, "rU") as file:
-            reader = csv.reader(file)
-            reader.next() # skip past the header row
-            for line in reader:
-                timestamp_split = line[10].split()
-                date = timestamp_split[0].split("/")
-                time = timestamp_split[1].split(":")
-
-                if visit_date is None:
-                    visit_date = (date[0], date[1], date[2])
-                elif visit_date != (date[0], date[1], date[2]):
-                    print "The timestamps within your file span more than a single day"
+        for row in rows:
+            timestamp_split = data.timestamps[row].split()
+            # older exports write dates as 02/13/2015, newer
+            # ones as 2015-02-13
+            date = re.split("[/-]", timestamp_split[0])
+            time = timestamp_split[1].split(":")
+
+            if visit_date is None:
+                visit_date = (date[0], date[1], date[2])
+                self.child_key = data.child_key(row)
+                self.processing_file = data.processing_file(row)
 
                 # we represent date/time as a 5d tuple
                 # i.e. 02-13-2015 3:35 = (2, 13, 2015, 3, 35)
-
-                # first line of iteration, dataset not instantiated yet
-                if self.dataset is None:
-                    # instantiate
-                    self.dataset = WordDensitySet((date[0],
-                                                   date[1],
-                                                   date[2],
-                                                   time[0],
-                                                   time[1]))
-
-                    # add first region magnitude value.
-                    # meaningful is represented in seconds.
-                    duration_split = line[11].split(":")
-                    meaningful_split = line[12].split(":")
-
-                    duration = int(duration_split[0]) * 3600 +\
-                               int(duration_split[1]) * 60 +\
-                               int(duration_split[2])
-
-                    if duration == 0:
-                        duration = 1
-
-                    # meaningful is redefined as ratio between "meaningful" and duration
-                    meaningful = float((int(meaningful_split[0]) * 3600 +
-                                 int(meaningful_split[1]) * 60 +
-                                 int(meaningful_split[2]))) / duration
-
-                    awc_actual = int(line[18])
-                    ctc_actual = int(line[21])
-                    cvc_actual = int(line[24])
-
-                    self.dataset.data.append((meaningful, awc_actual, ctc_actual, cvc_actual))
-
-                else:
-                    # just add to the end of the current dataset
-
-                    duration_split = line[11].split(":")
-                    meaningful_split = line[12].split(":")
-
-                    duration = int(duration_split[0]) * 3600 +\
-                               int(duration_split[1]) * 60 +\
-                               int(duration_split[2])
-
-                    if duration == 0:
-                        duration = 1
-
-                    meaningful = float((int(meaningful_split[0]) * 3600 +
-                                 int(meaningful_split[1]) * 60 +
-                                 int(meaningful_split[2]))) / duration
-
-                    awc_actual = int(line[18])
-                    ctc_actual = int(line[21])
-                    cvc_actual = int(line[24])
-
-                    # print "meaningful: " + str(meaningful) + " awc: " + str(awc_actual) +  " cvc: " + str(ctc_actual) + "    cvc: " + str(cvc_actual)
-
-                    self.dataset.data.append((meaningful, awc_actual, ctc_actual, cvc_actual))
-
-                    #self.dataset.hours()
-
-            #     print
-            #     print "timestamp: " + line[10]
-            #
-            # print
-            # print
-            # print self.dataset
-            # #self.dataset.hours()
-            # print "size of dataset:  " + str(len(self.dataset.data))
-
-            self.find_dense_regions()
+                self.dataset = WordDensitySet((date[0],
+                                               date[1],
+                                               date[2],
+                                               time[0],
+                                               time[1]))
+            elif visit_date != (date[0], date[1], date[2]):
+                # said once, finely split files have thousands of rows
+                print "The timestamps within your file span more than a single day"
+                visit_date = (date[0], date[1], date[2])
+
+            duration = data.durations[row]
+            if duration == 0:
+                duration = 1
+
+            # meaningful is redefined as ratio between "meaningful" and duration
+            meaningful = float(data.meaningful[row]) / duration
+
+            self.dataset.append(meaningful,
+                                data.awc_actual[row],
+                                data.ctc_actual[row],
+                                data.cvc_actual[row])
+
+        if self.silences is not None:
+            self.silence_coverage = self.row_silence(self.silences)
+        self.find_dense_regions()
 
     def find_dense_regions(self):
         """
         Here we go through the process of adding up all the
-        hour long chunks at offsets of 5 minutes from each other.
-        After all the hour chunks have been tallied up and placed
-        in their respective member variables, rank_list() is called
-        on all of them. rank_list() returns the ranked offsets as well
-        as their associated hashmaps.
+        hour long chunks (or self.window rows long) at offsets
+        of 5 minutes (self.stride rows) from each other.
+        region_scores() works out the average of every chunk, and
+        rank() picks the top_n of them that don't overlap, returning
+        the ranked offsets as well as their associated hashmaps.
+        Both are filled into the *_regions, *_map and ranked_*
+        member variables of every metric.
 
         :return:
         """
@@ -143,198 +186,543 @@ class Overlaps:
         #           t-begin -> t0 + n*5min
         #
         #           t-end   -> t-begin + 60min (12 x 5)
-
-        regions = [] # each region has an associated tuple (avg-meaningful,
-        #                                                   avg-AWC-actual,
-        #                                                   avg-CTC-actual,
-        #                                                   avg-CVC-actual)
-
-        rank = [] # each rank corresponds to an region (ranked by hour_region average)
-        results = []
-
-        x = 0
-        y = 12
-        hour_buffer = self.dataset.data[x:y]
-
-        while y <= len(self.dataset.data):
-            meaningful_sum = 0
-            awc_actual_sum = 0
-            ctc_actual_sum = 0
-            cvc_actual_sum = 0
-            ctc_cvc_sum = 0
-
-            for count in hour_buffer:
-                meaningful_sum += count[0]
-                awc_actual_sum += count[1]
-                ctc_actual_sum += count[2]
-                cvc_actual_sum += count[3]
-                ctc_cvc_sum += float((count[2] + count[3]))/2  # the average between ctc and cvc
-
-            meaningful_ratio = float(meaningful_sum)/12
-            awc_actual_ratio = float(awc_actual_sum)/12
-            ctc_actual_ratio = float(ctc_actual_sum)/12
-            cvc_actual_ratio = float(cvc_actual_sum)/12
-            ctc_cvc_ratio = float(ctc_cvc_sum)/12
-
-            # print
-            # print
-            # print "--------------------------------------------------------------------------"
-            # print "region: " + str(len(regions))
-            # print "\n   meaningful: " + str(meaningful_ratio)
-            # print "   awc: " + str(awc_actual_ratio)
-            # print "   ctc: " + str(ctc_actual_ratio)
-            # print "   cvc: " + str(cvc_actual_ratio)
-            # print "   ctc_cvc: " + str(ctc_cvc_ratio)
-
-            regions.append((meaningful_ratio,
-                            awc_actual_ratio,
-                            ctc_actual_ratio,
-                            cvc_actual_ratio,
-                            ctc_cvc_ratio))
-
-            # push the buffer slice over to the right by one element
-            # and re-slice
-            # e.g.:
-            #
-            #       1 5 4 2 7 5 3 8 0 6 4 3 7 1 6 4 2 9 5 7
-            #             \     \
-            #              -----
-            #               \     \-->
-            #                -----
-
-            x += 1  # bump
-            y += 1  # bump
-            hour_buffer = self.dataset.data[x:y]  # re-slice
-
-        # pull out the N'th index of each element in "regions",
-        # which is a list of tuples, with list comprehensions.
-        # Each tuple has the average value for the hour chunk
-        # at that offset for each ranking metric:
         #
-        #   (meaningful, awc, ctc, ctc_cvc)
+        # Rather than re-summing the 12 rows under every hour, each
+        # column is summed once into a running (prefix) total, and the
+        # sum over any hour is the difference between two of those totals:
+        #
+        #       sum(data[x:x+12]) = prefix[x+12] - prefix[x]
         #
-        self.meaningful_regions = [average[0] for average in regions]
-        # print "meaningful regions: " + str(self.meaningful_regions)
-        # print
-        self.awc_actual_regions = [average[1] for average in regions]
-        # print "awc regions: " + str(self.awc_actual_regions)
-        # print
-        self.ctc_actual_regions = [average[2] for average in regions]
-        # print "ctc regions: " + str(self.ctc_actual_regions)
-        # print
-        self.cvc_actual_regions = [average[3] for average in regions]
-        # print "cvc regions: " + str(self.cvc_actual_regions)
-        # print
-        self.ctc_cvc_regions = [average[4] for average in regions]
-        # print "ctc/cvc regions: " + str(self.ctc_cvc_regions)
-        # print
-
-        self.meaningful_map, self.ranked_meaningful = self.rank_list(self.meaningful_regions, self.top_n)
-        self.awc_actual_map, self.ranked_awc_actual = self.rank_list(self.awc_actual_regions, self.top_n)
-        self.ctc_actual_map, self.ranked_ctc_actual = self.rank_list(self.ctc_actual_regions, self.top_n)
-        self.cvc_actual_map, self.ranked_cvc_actual = self.rank_list(self.cvc_actual_regions, self.top_n)
-        self.ctc_cvc_map, self.ranked_ctc_cvc = self.rank_list(self.ctc_cvc_regions, self.top_n)
-
-        # print "ranked_meaningful: " + str(self.ranked_meaningful)
-        # print
-        # print "ranked awc: " + str(self.ranked_awc_actual)
-        # print
-        # print "ranked ctc: " + str(self.ranked_ctc_actual)
-        # print
-        # print "ranked cvc: " + str(self.ranked_cvc_actual)
-        # print
-        # print "ranked ctc_cvc: " + str(self.ranked_ctc_cvc)
+        # so all the hours are computed in O(n), whatever the window length.
         #
-        # print
-        # print
-        # print
+        # Offsets are always counted in 5 minute rows, the stride only
+        # decides which of them are candidates for ranking.
+        #
+        # The averages (and the order they rank in) are cached, see
+        # region_scores() and region_order().
+        self.meaningful_regions = self.region_scores("meaningful", self.window)
+        self.awc_actual_regions = self.region_scores("awc_actual", self.window)
+        self.ctc_actual_regions = self.region_scores("ctc_actual", self.window)
+        self.cvc_actual_regions = self.region_scores("cvc_actual", self.window)
+        self.ctc_cvc_regions = self.region_scores("ctc_cvc", self.window)
+
+        self.meaningful_map, self.ranked_meaningful = self.rank("meaningful")
+        self.awc_actual_map, self.ranked_awc_actual = self.rank("awc_actual")
+        self.ctc_actual_map, self.ranked_ctc_actual = self.rank("ctc_actual")
+        self.cvc_actual_map, self.ranked_cvc_actual = self.rank("cvc_actual")
+        self.ctc_cvc_map, self.ranked_ctc_cvc = self.rank("ctc_cvc")
+
+        self.optimal_regions = {}
+
+    def __getattr__(self, name):
+        """
+        Works out optimal_meaningful, optimal_awc_actual, etc. the first
+        time they're asked for after a ranking.
+        """
+        if name.startswith("optimal_") and name[len("optimal_"):] in Overlaps.metrics:
+            metric = name[len("optimal_"):]
+            if metric not in self.optimal_regions:
+                self.optimal_regions[metric] = self.rank(metric, optimal=True)[1]
+            return self.optimal_regions[metric]
+        raise AttributeError(name)
+
+    def rerank(self, top_n=None, window=None, stride=None):
+        """
+        Ranks the already loaded dataset again, with a different
+        number of regions, window length or stride. Only the parts that
+        depend on what changed are recomputed: changing top_n just runs
+        the selection again over the cached rank order.
+
+        :param top_n: how many subregions to find (unchanged if None)
+        :param window: subregion length in rows (unchanged if None)
+        :param stride: distance between candidates in rows (unchanged if None)
+        :return:
+        """
+        if top_n is not None:
+            self.top_n = top_n
+        if window is not None:
+            self.window = window
+        if stride is not None:
+            self.stride = stride
+        self.find_dense_regions()
+
+    def use_silences(self, silences, mode="normalize", maximum_silence=0.5):
+        """
+        Ranks the windows again, taking the silences of the recording
+        into account. Windows that are more than maximum_silence silent
+        aren't candidates at all, and the rest are scored depending on
+        mode:
+
+            exclude     as before
+            weight      average * non-silent fraction of the window
+            normalize   average per non-silent row, i.e. the density
+                        of the time someone could actually be talking
+
+        The silent fraction of every row is worked out once, and a
+        window's is a prefix sum average over it, like the averages
+        themselves.
+
+        :param silences: SilenceSet (see SilenceParser.silence_set()),
+                         None to rank without silences again
+        :param mode: one of Overlaps.silence_modes
+        :param maximum_silence: fraction of a window (0-1) that can be
+                                silent, None for no limit
+        :return:
+        """
+        if mode not in self.silence_modes:
+            raise Exception("unknown silence mode: {}".format(mode))
+        self.silences = silences
+        self.silence_mode = mode
+        self.maximum_silence = maximum_silence
+        if silences is None:
+            self.silence_coverage = None
+        else:
+            self.silence_coverage = self.row_silence(silences)
+        self.scores = {}
+        self.orders = {}
+        self.tables = {}
+        self.find_dense_regions()
+
+    def use_transcribed_words(self, words, speakers=None):
+        """
+        Adds the words transcribed in an annotated CLAN file to the
+        dataset, as the transcribed_words column. It's then ranked like
+        any of the metrics, with rank("transcribed_words").
 
-    def rank_list(self, list, top_n):
+        :param words: TranscribedWords, in rows as long as this dataset's
+        :param speakers: only count the words of these speakers, all
+                         of them if None
+        :return:
+        """
+        if words.row_minutes != self.row_minutes:
+            raise Exception("{} is counted in {:g} minute rows, not {:g}".format(
+                words.path, words.row_minutes, self.row_minutes))
+        self.dataset.transcribed_words = array("d", words.column(len(self.dataset.meaningful),
+                                                                speakers))
+        # anything computed from an earlier column is out of date
+        for cache in (self.scores, self.orders, self.tables):
+            for key in cache.keys():
+                if key[0] == "transcribed_words":
+                    del cache[key]
+
+    def set_range(self, start_row=None, end_row=None):
         """
-        This builds the regions map, resets decimal precision so
-        that equality can be checked, and passes the sorted_list,
-        region_map, and top_n to the filter_overlaps() method, which
-        should run through and check that there are no regions that
-        overlap with each other. filter_overlaps will return a
-        filtered_list. This filtered list will be returned with the
-        region_map (so that we can lookup those regions later.
+        Ranks the windows again, only looking at the subregions
+        that lie entirely between start_row and end_row, e.g. "the
+        densest hour between 9am and 1pm" (see clock_to_row()) or
+        "the top 3 outside the first two hours" (start_row=24).
 
-        :param list: The offset list
-        :param top_n: how many subregions to find
-        :return: region map and filtered list
+        :param start_row: first row a subregion can start at, None for the beginning
+        :param end_row: row the subregions have to end by, None for the end
+        :return:
+        """
+        self.start_row = start_row
+        self.end_row = end_row
+        self.find_dense_regions()
+
+    def set_time_range(self, start_time=None, end_time=None):
+        """
+        set_range() with clock times instead of rows
+
+        :param start_time: e.g. "9:00", None for the beginning
+        :param end_time: e.g. "13:00", None for the end
+        :return:
+        """
+        start_row = None
+        end_row = None
+        if start_time:
+            start_row = int(math.ceil(self.clock_to_row(start_time)))
+        if end_time:
+            end_row = int(math.floor(self.clock_to_row(end_time)))
+
+        # a range no subregion fits in would just rank nothing
+        first = start_row if start_row is not None else 0
+        last = end_row if end_row is not None else len(self.dataset.meaningful)
+        if last - first < self.window:
+            raise Exception("there's no room for a {:g} minute subregion between {} and {} "
+                            "(the recording runs from {} for {:g} minutes)".format(
+                                self.window * self.row_minutes,
+                                start_time or "the start", end_time or "the end",
+                                self.start_clock(),
+                                len(self.dataset.meaningful) * self.row_minutes))
+        self.set_range(start_row, end_row)
+
+    def clock_to_row(self, text):
+        """
+        :param text: clock time, "HH:MM"
+        :return: the (fractional) row that time falls in. Times before
+                 the start of the recording are on the next day (the
+                 recording went on past midnight). Times outside the
+                 recording are moved to whichever of its start and end
+                 is closer, so the row is always between 0 and the
+                 number of rows.
+        """
+        try:
+            hour, minute = [int(value) for value in text.split(":")]
+        except ValueError:
+            raise Exception("can't read the time \"{}\", expected HH:MM".format(text))
+        start = int(self.dataset.time[3]) * 60 + int(self.dataset.time[4])
+        minutes = hour * 60 + minute - start
+        if minutes < 0:
+            minutes += 24 * 60
+
+        rows = len(self.dataset.meaningful)
+        length = rows * self.row_minutes
+        if minutes > length:
+            # e.g. 9:00 for a recording from 9:01 to 17:00 is just
+            # before the start, not 16 hours after the end
+            if 24 * 60 - minutes < minutes - length:
+                return 0.0
+            return rows
+        return minutes / float(self.row_minutes)
+
+    def start_clock(self):
+        """
+        :return: clock time of the first row, "HH:MM"
         """
+        return "{:02}:{:02}".format(int(self.dataset.time[3]), int(self.dataset.time[4]))
+
+    def row_silence(self, silences):
+        """
+        :param silences: SilenceSet
+        :return: array with the silent fraction of every row
+        """
+        length = self.offset_length()
+        return array("d", [min(1.0, silences.silent_time(row * length, (row + 1) * length) / length)
+                           for row in xrange(len(self.dataset.meaningful))])
+
+    def window_silence(self, window):
+        """
+        :param window: subregion length in rows
+        :return: the silent fraction of the window at every offset
+        """
+        key = ("silence", window)
+        silence = self.scores.get(key)
+        if silence is None:
+            silence = self.scores[key] = window_averages(self.silence_coverage, window)
+        return silence
+
+    def rank(self, metric, top_n=None, window=None, optimal=False):
+        """
+        :param metric: one of Overlaps.metrics, or transcribed_words
+                       (see use_transcribed_words())
+        :param top_n: how many subregions to find (defaults to self.top_n)
+        :param window: subregion length in rows (defaults to self.window)
+        :param optimal: use optimal_filter() rather than filter_overlaps()
+        :return: region map and ranked list
+        """
+        if top_n is None:
+            top_n = self.top_n
+        if window is None:
+            window = self.window
+
+        region_map, order = self.region_order(metric, window, self.stride)
+        if self.start_row is not None or self.end_row is not None:
+            first, last = self.candidate_range(metric, window)
+            if optimal:
+                in_range = dict((offset, average) for offset, average in region_map.iteritems()
+                                if first <= offset <= last)
+                return region_map, self.optimal_filter(in_range, top_n, window=window)
+            return region_map, self.top_in_range(metric, first, last, top_n, window=window)
+
+        if optimal:
+            return region_map, self.optimal_filter(region_map, top_n, window=window)
+        return region_map, self.filter_overlaps(region_map, top_n, window=window, order=order)
+
+    def candidate_range(self, metric, window):
+        """
+        :return: (first, last) offsets a subregion of window rows
+                 can start at, given start_row and end_row
+        """
+        first = 0
+        last = len(self.region_scores(metric, window)) - 1
+        if self.start_row is not None:
+            first = max(first, self.start_row)
+        if self.end_row is not None:
+            last = min(last, self.end_row - window)
+        return first, last
+
+    def top_in_range(self, metric, first, last, top_n=None, window=None):
+        """
+        The same greedy choice filter_overlaps() makes, limited to the
+        subregions starting between first and last. Taking a region
+        splits the range it came from into the parts left and right of
+        it that don't overlap it, and the best of every part is found
+        with a range maximum query (see RangeMaximum), so each region
+        taken costs O(log n).
+
+        :param metric: one of Overlaps.metrics
+        :param first: first offset a subregion can start at
+        :param last: last offset a subregion can start at
+        :param top_n: how many subregions to find (defaults to self.top_n)
+        :param window: subregion length in rows (defaults to self.window)
+        :return: a list of offsets (with no overlaps), highest average first
+        """
+        if top_n is None:
+            top_n = self.top_n
+        if window is None:
+            window = self.window
+
+        table = self.range_table(metric, window, self.stride)
+        values = table.values
+        parts = []
+
+        def add_part(first, last):
+            position = table.maximum(first, last)
+            if position is not None:
+                heappush(parts, (-values[position], position, first, last))
+
+        add_part(max(0, first), min(last, len(values) - 1))
+
+        results = []
+        while parts and len(results) < top_n:
+            value, position, part_first, part_last = heappop(parts)
+            results.append(position)
+            add_part(part_first, position - window)
+            add_part(position + window, part_last)
+        return results
+
+    def range_table(self, metric, window, stride):
+        """
+        :return: RangeMaximum over the region map of metric, computed
+                 once per metric, window length and stride
+        """
+        key = (metric, window, stride)
+        table = self.tables.get(key)
+        if table is None:
+            region_map = self.region_order(metric, window, stride)[0]
+            values = [None] * len(self.region_scores(metric, window))
+            for offset, average in region_map.iteritems():
+                values[offset] = average
+            table = self.tables[key] = RangeMaximum(values)
+        return table
+
+    def region_scores(self, metric, window):
+        """
+        :param metric: one of Overlaps.metrics
+        :param window: subregion length in rows
+        :return: the average of metric over the window at every offset,
+                 computed once per metric and window length
+        """
+        key = (metric, window)
+        scores = self.scores.get(key)
+        if scores is None:
+            scores = self.silence_scores(window_averages(getattr(self.dataset, metric), window), window)
+            scores = self.scores[key] = self.set_precision(scores, 7)
+        return scores
+
+    def silence_scores(self, averages, window):
+        """
+        :param averages: window averages of a metric
+        :param window: subregion length in rows
+        :return: the averages, weighted or normalized by the non-silent
+                 part of each window (see use_silences())
+        """
+        if self.silence_coverage is None or self.silence_mode == "exclude":
+            return averages
+        silence = self.window_silence(window)
+        if self.silence_mode == "weight":
+            return [average * (1 - silent) for average, silent in izip(averages, silence)]
+        return [average / (1 - silent) if silent < 1 else 0.0
+                for average, silent in izip(averages, silence)]
+
+    def region_order(self, metric, window, stride):
+        """
+        :param metric: one of Overlaps.metrics
+        :param window: subregion length in rows
+        :param stride: distance between candidates in rows
+        :return: (region map, offsets in rank order), computed once
+                 per metric, window length and stride
+        """
+        key = (metric, window, stride)
+        found = self.orders.get(key)
+        if found is None:
+            region_map = self.region_map(self.region_scores(metric, window), stride)
+            if self.silence_coverage is not None and self.maximum_silence is not None:
+                # windows that are mostly silence aren't candidates
+                silence = self.window_silence(window)
+                for offset in region_map.keys():
+                    if silence[offset] > self.maximum_silence:
+                        del region_map[offset]
+            found = self.orders[key] = (region_map, rank_order(region_map))
+        return found
+
+    def region_map(self, list, stride=None):
+        """
+        :param list: average for every offset
+        :param stride: distance between candidates in rows (defaults to self.stride)
+        :return: offset -> average, for the offsets on the stride
+        """
+        if stride is None:
+            stride = self.stride
         region_map = {}
-        ranked_list = []
+        for index in xrange(0, len(list), stride):
+            region_map[index] = list[index]
+        return region_map
 
-        list = self.set_precision(list, 7)
+    def rank_windows(self, windows, top_n=None, optimal=False):
+        """
+        Ranks the dataset for several window lengths at once. Each
+        column is only summed once, and every window length is then
+        read off the same running totals.
+
+        :param windows: list of window lengths, in rows
+        :param top_n: how many subregions to find (defaults to self.top_n)
+        :param optimal: use optimal_filter() rather than filter_overlaps()
+        :return: {window: {metric: (region map, ranked list)}}
+        """
+        if top_n is None:
+            top_n = self.top_n
+
+        results = dict((window, {}) for window in windows)
+        for metric in self.metrics:
+            missing = [window for window in windows if (metric, window) not in self.scores]
+            if missing:
+                averages = multi_window_averages(getattr(self.dataset, metric), missing)
+                for window in missing:
+                    self.scores[(metric, window)] = \
+                        self.set_precision(self.silence_scores(averages[window], window), 7)
+            for window in windows:
+                results[window][metric] = self.rank(metric, top_n, window, optimal)
+        return results
 
-        # build the map
-        for index, region_average in enumerate(list):
-            region_map[index] = region_average
-        # print "size of region map: " + str(len(region_map))
-        # print "region map: " + str(region_map)
-        # print "top_n : " + str(top_n)
-        #while len(ranked_list) < top_n:
-        max = 0
-        sorted_list = sorted(list, reverse=True)
+    def window_length(self):
+        """
+        :return: length of a subregion, in milliseconds
+        """
+        return self.window * self.offset_length()
 
-        #print "entire list ranked: " + str(sorted(list))
-        filtered_list = self.filter_overlaps(sorted_list, region_map, top_n)
-        return (region_map, filtered_list)
+    def offset_length(self):
+        """
+        :return: time between one offset and the next (one row), in milliseconds
+        """
+        return int(round(self.row_minutes * 60 * 1000))
 
-    def filter_overlaps(self, list, map, top_n):
+    def filter_overlaps(self, map, top_n, window=None, order=None):
         """
-        This passes through the ranked offset list and uses the region
-        map to check that the top_n regions do not overlap with each other.
+        Picks the top_n highest ranked offsets that don't overlap
+        with each other.
+
+        Offsets are sorted once by average (highest first), ties going
+        to the earliest offset. Going down that list, an offset is taken
+        unless a region that was already taken covers it, which is
+        checked against a bitmap of blocked offsets: taking offset x
+        blocks every start within a window of it, (x - window, x + window).
 
-        :param list: offset list
-        :param map: region map
+        :param map: region map (offset -> average)
         :param top_n: # of subregions
+        :param window: subregion length in rows (defaults to self.window)
+        :param order: the offsets of map in rank order, if already known
         :return: a list of offsets (with no overlaps)
         """
-        # this is a list of lists, containing interval offsets
-        # each inner list corresponds to all offsets containing
-        # a certain magnitude
-        offset_lists = []
+        if window is None:
+            window = self.window
 
-        last_interval = None
+        ranked = order
+        if ranked is None:
+            ranked = rank_order(map)
 
-        for index, x in enumerate(list):
-            # this is the temporary list that will be pushed into the
-            # offset lists once its filled
-            temp_offsets = []
-            for key, value in map.iteritems():
-                if value == x:
-                    temp_offsets.append(key)
-                    last_interval = key
-            offset_lists.append(temp_offsets)
-
-        # print "offset list: " + str(offset_lists)
         results = []
+        if not ranked:
+            return results
 
-        for index, offset_group in enumerate(offset_lists):
-            for index, offset in enumerate(offset_group):
-                if len(results) >= top_n:
-                    break
-                if self.overlapping(results, offset):
-                    continue
-                else:
-                    results.append(offset)
-                    #last_result = results[len(results)-1]
+        size = max(ranked) + 1
+        blocked = bytearray(size)
+
+        for offset in ranked:
+            if len(results) >= top_n:
+                break
+            if blocked[offset]:
+                continue
+            results.append(offset)
+
+            start = max(0, offset - window + 1)
+            end = min(size, offset + window)
+            blocked[start:end] = "\x01" * (end - start)
 
         # print "results: " + str(results)
         return results
 
-    def overlapping(self, previous_regions, this_start):
+    def optimal_filter(self, map, top_n, window=None, weights=None):
         """
-        :param previous_regions: all the offsets which have already been added to "results"
-        :param this_start: the millisecond starting point of the offset being tested
-        :return: True if overlapping, False if not
+        Picks the top_n non-overlapping offsets with the highest
+        combined average (or weighted average, if weights are given).
+
+        filter_overlaps() is greedy, so it can take one very dense
+        region that blocks two slightly less dense neighbours which
+        together are worth more. This finds the best set with dynamic
+        programming over the offsets:
+
+            best[k][i] = the highest total of k regions starting before i
+
+            best[k][i + 1] = max(best[k][i],                         # skip i
+                                 best[k - 1][i - window + 1] + map[i]) # take i
+
+        which is O(n * top_n). If the recording is too short to fit
+        top_n regions, as many as fit are returned.
+
+        :param map: region map (offset -> average)
+        :param top_n: # of subregions
+        :param window: subregion length in rows (defaults to self.window)
+        :param weights: optional map of offset -> weight
+        :return: a list of offsets (with no overlaps), highest average first
         """
-        for x in previous_regions:
-            if (x > (this_start-12)) and (x < (this_start+12)):
-                return True
-        return False
+        if window is None:
+            window = self.window
+        if not map or top_n <= 0:
+            return []
+
+        size = max(map) + 1
+        values = [None] * size
+        for offset, average in map.iteritems():
+            if weights is not None:
+                average *= weights.get(offset, 1)
+            values[offset] = average
+
+        impossible = float("-inf")
+
+        # best[i] for k - 1 and k regions, and for every k, which
+        # offsets were taken to get there
+        previous = [0.0] * (size + 1)
+        taken = []
+
+        for k in xrange(1, top_n + 1):
+            best = [impossible] * (size + 1)
+            took = bytearray(size)
+            for i in xrange(size):
+                best[i + 1] = best[i]
+                if values[i] is None:
+                    continue
+                before = previous[max(0, i - window + 1)]
+                if before != impossible and before + values[i] > best[i + 1]:
+                    best[i + 1] = before + values[i]
+                    took[i] = 1
+            if best[size] == impossible:
+                break
+            taken.append(took)
+            previous = best
+
+        # walk back through the choices, from the last region to the first
+        results = []
+        i = size
+        for took in reversed(taken):
+            while not took[i - 1]:
+                i -= 1
+            results.append(i - 1)
+            i = max(0, i - window)
+
+        results.sort(key=lambda offset: (-map[offset], offset))
+        return results
+
+    def is_current(self):
+        """
+        :return: False if the lena file has changed since it was loaded
+        """
+        try:
+            stat = os.stat(self.lena_file)
+        except OSError:
+            return False
+        return stat.st_size == self.data.size and stat.st_mtime == self.data.mtime
 
     def set_precision(self, list, digits):
         """
@@ -367,6 +755,62 @@ class Overlaps:
             interval_rank.append(region_map[x])
 
 
+class RangeMaximum:
+    """
+    Sparse table over a list of scores: after O(n log n) setup,
+    maximum() finds the highest score within any range of positions in
+    O(1), from the two (overlapping) power of two long blocks that
+    cover the range.
+
+    Ties go to the earliest position, the same way rank_order() breaks
+    them, and positions holding None are never picked.
+    """
+
+    def __init__(self, values):
+        """
+        :param values: list of scores (None where there's no candidate)
+        """
+        self.values = values
+
+        # levels[k][i] = position of the best value in values[i:i + 2**k]
+        level = array("l", xrange(len(values)))
+        self.levels = [level]
+        length = 1
+        while length * 2 <= len(values):
+            level = array("l", [self.better(level[i], level[i + length])
+                                for i in xrange(len(values) - 2 * length + 1)])
+            self.levels.append(level)
+            length *= 2
+
+    def better(self, first, second):
+        """
+        :return: whichever of the two positions has the better value
+        """
+        first_value = self.values[first]
+        second_value = self.values[second]
+        if second_value is None:
+            return first
+        if first_value is None or second_value > first_value or \
+                (second_value == first_value and second < first):
+            return second
+        return first
+
+    def maximum(self, first, last):
+        """
+        :param first: first position of the range
+        :param last: last position of the range (inclusive)
+        :return: position of the highest value in the range, or None
+                 if the range is empty or has no values
+        """
+        if first > last:
+            return None
+        k = (last - first + 1).bit_length() - 1
+        position = self.better(self.levels[k][first], self.levels[k][last - (1 << k) + 1])
+        if self.values[position] is None:
+            return None
+        return position
+
+
 class WordDensitySet:
 
     def __init__(self, time):
@@ -379,9 +823,25 @@ class WordDensitySet:
         # We're going to store tuples of (meaningful, awc.Actual, ctc.Actual, cvc.Actual)
         self.data = []
 
+        # the same values stored column by column, one entry per 5 minute row
+        self.meaningful = array("d")
+        self.awc_actual = array("l")
+        self.ctc_actual = array("l")
+        self.cvc_actual = array("l")
+        self.ctc_cvc = array("d")      # the average between ctc and cvc
+
     def __str__(self):
         return str(self.time) + str(self.data)
 
+    def append(self, meaningful, awc_actual, ctc_actual, cvc_actual):
+        self.data.append((meaningful, awc_actual, ctc_actual, cvc_actual))
+
+        self.meaningful.append(meaningful)
+        self.awc_actual.append(awc_actual)
+        self.ctc_actual.append(ctc_actual)
+        self.cvc_actual.append(cvc_actual)
+        self.ctc_cvc.append(float((ctc_actual + cvc_actual))/2)
+
     def get(self, time):
         # TODO: fix this. return Unix time conversion
         """
@@ -391,3 +851,291 @@ class WordDensitySet:
         """
 
         return self.data[time]
+
+
+class OnlineWordDensitySet(WordDensitySet):
+    """
+    A WordDensitySet for rows that arrive one at a time, e.g. 5 minute
+    aggregates uploaded while the recording is still going (see
+    liveranking.py), that keeps the non-overlapping top_n subregions
+    up to date as they come in.
+
+    Every appended row completes one more window. Its average comes
+    from running totals (one addition and one subtraction, whatever
+    the window length), with the same rounding and precision as
+    Overlaps. The top_n subregions (the same greedy choice as
+    Overlaps.filter_overlaps()) are kept per metric, and updated with
+    every new window:
+
+        - a window that overlaps a better subregion, or is worse than
+          all top_n of them, changes nothing
+        - one that doesn't overlap any of them goes in at its rank,
+          pushing the last one out if there are already top_n
+        - only one that beats a subregion it overlaps (the latest
+          ones, as the new window is always the last) changes which
+          of the rest are chosen, and the choice is then made again
+          off the heap of all the windows (see select())
+
+    So the subregions are ready as soon as the last row is in, without
+    loading the whole export again, and ranked() doesn't look at any
+    windows at all.
+    """
+
+    def __init__(self, time, top_n=5, window=12, stride=1):
+        """
+        :param time: start time, as in WordDensitySet
+        :param top_n: how many subregions to keep track of
+        :param window: length of a subregion, in rows (12 = 1 hour)
+        :param stride: distance between candidate subregions, in rows
+        """
+        WordDensitySet.__init__(self, time)
+        self.top_n = top_n
+        self.window = window
+        self.stride = stride
+
+        # per metric: running totals (prefix[i] = sum of the first i
+        # rows), the average of every complete window, a heap of
+        # (-average, offset) for the windows on the stride, and the
+        # (-average, offset) of the top_n subregions, best first
+        self.prefixes = dict((metric, [0]) for metric in Overlaps.metrics)
+        self.averages = dict((metric, []) for metric in Overlaps.metrics)
+        self.heaps = dict((metric, []) for metric in Overlaps.metrics)
+        self.top = dict((metric, []) for metric in Overlaps.metrics)
+
+    def append(self, meaningful, awc_actual, ctc_actual, cvc_actual):
+        WordDensitySet.append(self, meaningful, awc_actual, ctc_actual, cvc_actual)
+
+        offset = len(self.meaningful) - self.window
+        length = float(self.window)
+        factor = 10**7
+        for metric in Overlaps.metrics:
+            prefix = self.prefixes[metric]
+            prefix.append(prefix[-1] + getattr(self, metric)[-1])
+            if offset < 0:
+                continue
+
+            # the window that ends with this row, rounded and truncated
+            # like prefix_window_averages() and Overlaps.set_precision()
+            average = round((prefix[-1] - prefix[offset])/length, 10)
+            average = float(int(average * factor))/factor
+            self.averages[metric].append(average)
+            if offset % self.stride == 0:
+                entry = (-average, offset)
+                heappush(self.heaps[metric], entry)
+                self.update_top(metric, entry)
+
+    def update_top(self, metric, entry):
+        """
+        Adds the newest window to the top_n subregions of metric
+
+        :param metric: one of Overlaps.metrics
+        :param entry: (-average, offset) of the window
+        :return:
+        """
+        top = self.top[metric]
+        offset = entry[1]
+        rank = bisect(top, entry)
+
+        # windows only overlap the ones that start less than a window
+        # before them, and there's nothing after the newest one
+        if any(offset - taken < self.window for average, taken in top[:rank]):
+            return
+        if rank == self.top_n:
+            return
+        if any(offset - taken < self.window for average, taken in top[rank:]):
+            self.top[metric] = self.select(metric, self.top_n)
+            return
+        top.insert(rank, entry)
+        del top[self.top_n:]
+
+    def select(self, metric, top_n):
+        """
+        The greedy choice of filter_overlaps(), off the heap of all
+        the windows of metric
+
+        :param metric: one of Overlaps.metrics
+        :param top_n: how many subregions
+        :return: (-average, offset) of the subregions, best first
+        """
+        heap = self.heaps[metric]
+        window = self.window
+
+        # pop windows best first, skipping the ones that overlap one
+        # already taken, then put everything back
+        popped = []
+        results = []
+        while heap and len(results) < top_n:
+            entry = heappop(heap)
+            popped.append(entry)
+            for average, taken in results:
+                if abs(entry[1] - taken) < window:
+                    break
+            else:
+                results.append(entry)
+        for entry in popped:
+            heappush(heap, entry)
+        return results
+
+    def append_lena_row(self, duration, meaningful, awc_actual, ctc_actual, cvc_actual):
+        """
+        Appends a row as it appears in the LENA export, the same way
+        Overlaps.load_data() reads it
+
+        :param duration: length of the row, in seconds
+        :param meaningful: meaningful speech, in seconds
+        :return:
+        """
+        if duration == 0:
+            duration = 1
+        self.append(float(meaningful) / duration, awc_actual, ctc_actual, cvc_actual)
+
+    def region_map(self, metric):
+        """
+        :param metric: one of Overlaps.metrics
+        :return: offset -> average, for the complete windows on the stride
+        """
+        averages = self.averages[metric]
+        return dict((offset, averages[offset]) for offset in xrange(0, len(averages), self.stride))
+
+    def ranked(self, metric, top_n=None):
+        """
+        :param metric: one of Overlaps.metrics
+        :param top_n: how many subregions (defaults to self.top_n, the
+                      only number that's kept up to date; any other
+                      is chosen off the heap again)
+        :return: the top_n non-overlapping offsets so far, highest average first
+        """
+        if top_n is None or top_n == self.top_n:
+            top = self.top[metric]
+        else:
+            top = self.select(metric, top_n)
+        return [offset for average, offset in top]
+
+
+def load_recordings(lena_file, top_n, window=12, stride=1, processes=None, row_minutes=row_minutes):
+    """
+    Ranks every recording in a LENA export separately. Exports can hold
+    several .its recordings (and even several children), and windows
+    shouldn't straddle two of them.
+
+    The rows are split up by ChildKey/ProcessingFile in one pass over
+    the export (LenaData.recordings()), and the recordings are then
+    ranked in a pool of processes.
+
+    :param lena_file: LENA 5 minute export (csv)
+    :param top_n: how many subregions to find
+    :param window: length of a subregion, in rows
+    :param stride: distance between candidate subregions, in rows
+    :param processes: number of worker processes (default: number of cores)
+    :param row_minutes: length of a row in minutes (see Overlaps)
+    :return: list of Overlaps, one per recording, in the order they
+             appear in the export
+    """
+    jobs = [(lena_file, top_n, window, stride, rows, row_minutes)
+            for child_key, processing_file, rows in LenaData.load(lena_file, row_minutes).recordings()]
+
+    # imported here so that importing overlaps stays cheap
+    import multiprocessing
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(jobs))
+
+    if processes <= 1:
+        return map(rank_recording, jobs)
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(rank_recording, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def rank_recording(args):
+    """
+    load_recordings() worker
+
+    :param args: (lena_file, top_n, window, stride, rows, row_minutes) tuple
+    :return: Overlaps
+    """
+    lena_file, top_n, window, stride, rows, row_minutes = args
+    return Overlaps(lena_file, top_n, window=window, stride=stride, rows=rows,
+                    row_minutes=row_minutes)
+
+
+def rank_order(map):
+    """
+    :param map: region map (offset -> average)
+    :return: the offsets sorted by average (highest first), ties
+             going to the earliest offset
+    """
+    return sorted(map, key=lambda offset: (-map[offset], offset))
+
+
+def prefix_sums(column):
+    """
+    :param column: sequence of numbers
+    :return: list where prefix[i] is the sum of column[:i]
+    """
+    prefix = [0]
+    total = 0
+    for value in column:
+        total += value
+        prefix.append(total)
+    return prefix
+
+
+def window_averages(column, window):
+    """
+    Averages of every window of consecutive rows in column
+
+    :param column: sequence of numbers, one per 5 minute row
+    :param window: number of rows in a window (12 = one hour)
+    :return: list with the average of column[x:x+window] for each offset x
+    """
+    return prefix_window_averages(prefix_sums(column), window)
+
+
+def multi_window_averages(column, windows):
+    """
+    window_averages() for several window lengths, sharing one pass
+    over column
+
+    :param column: sequence of numbers, one per 5 minute row
+    :param windows: list of window lengths (in rows)
+    :return: {window: list of averages}
+    """
+    prefix = prefix_sums(column)
+    return dict((window, prefix_window_averages(prefix, window)) for window in windows)
+
+
+def prefix_window_averages(prefix, window):
+    """
+    :param prefix: running totals of a column, from prefix_sums()
+    :param window: number of rows in a window
+    :return: list with the average of every window
+    """
+    length = float(window)
+
+    # subtracting two running totals leaves rounding noise in the last
+    # few bits (0.14 comes out as 0.13999999999999999), which
+    # set_precision() would otherwise truncate down to 0.1399999
+    return [round((end - start)/length, 10)
+            for start, end in izip(prefix, prefix[window:])]
+
+
+def minutes_to_rows(minutes, row_minutes=row_minutes):
+    """
+    Converts a length in minutes to a number of LENA rows
+
+    :param minutes: length in minutes, a multiple of the row length
+    :param row_minutes: length of a row in minutes (5 for csv exports)
+    :return: number of rows
+    """
+    # compared in whole seconds, rows can be a fraction of a minute long
+    seconds = int(round(float(minutes) * 60))
+    row_seconds = int(round(row_minutes * 60))
+    if seconds <= 0 or seconds % row_seconds:
+        raise Exception("{} minutes is not a positive multiple of {:g} minutes".format(minutes, row_minutes))
+    return seconds / row_seconds
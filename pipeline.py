@@ -0,0 +1,213 @@
+"""
+The Tk-free processing pipeline behind "Load All (cha)". Importing
+this (or any of silences, clanfile, overlaps) never touches Tkinter,
+so it can be used from batch workers on machines without a display.
+"""
+import os
+import re
+
+from silences import SilenceParser, clan_sound_track
+from soundfinder import export_label_track
+from clandensity import export_utc_offset
+from clandocument import ClanDocument
+from clanfile import ClanFileParser
+from lenadata import LenaData
+from overlaps import Overlaps, row_minutes
+
+
+labeled_track_filename = "Label_Track.txt"
+
+def metric_suffix(metric):
+    """
+    :param metric: one of Overlaps.metrics
+    :return: suffix of the subregion file for metric, when every metric
+             is exported (ctc_cvc keeps the usual _subregions.cha)
+    """
+    if metric == "ctc_cvc":
+        return "_subregions.cha"
+    return "_subregions_{}.cha".format(metric)
+
+
+def window_suffix(minutes):
+    """
+    :param minutes: subregion length, in minutes
+    :return: suffix of the subregion file for another subregion length
+             (see process_recording()'s windows), e.g. _subregions_45min.cha
+    """
+    return "_subregions_{:g}min.cha".format(minutes)
+
+
+# exports written by earlier runs, not to be mistaken for the main CLAN file
+export_suffixes = ("_silences_added.cha",) + tuple(metric_suffix(metric) for metric in Overlaps.metrics)
+window_suffix_regx = re.compile("_subregions_[\d.]+min\.cha$")
+
+
+class Recording:
+
+    def __init__(self, folder, clan_file):
+        self.folder = folder
+        self.clan_file = clan_file
+
+        # same naming convention as MainWindow.load_all_cha(),
+        # the first 5 characters of the CLAN file name (e.g. 14_11)
+        self.file_prefix = os.path.basename(clan_file)[0:5]
+
+        self.labeled_track_file = os.path.join(folder, labeled_track_filename)
+        self.wav_file = self.path("_audio.wav")
+        self.lena_file = self.path("_lena5min.csv")
+        self.silences_file = self.path("_silences.txt")
+        self.silences_added_file = self.path("_silences_added.cha")
+        self.subregions_file = self.path("_subregions.cha")
+
+    def path(self, suffix):
+        return os.path.join(self.folder, self.file_prefix + suffix)
+
+    def density_file(self, row_seconds=None):
+        """
+        :param row_seconds: length of a row, in seconds, to rank on rows
+                            built from the transcript, or None for the
+                            5 minute export
+        :return: (file the subregions are ranked from, row length in minutes)
+        """
+        if row_seconds is not None:
+            return self.clan_file, row_seconds / 60.0
+        if os.path.isfile(self.lena_file):
+            return self.lena_file, row_minutes
+        # no export, the same 5 minute rows built from the transcript
+        return self.clan_file, row_minutes
+
+
+def find_recordings(data_dir):
+    """
+    Walks data_dir looking for recording folders
+
+    :param data_dir: top level data directory
+    :return: list of Recordings, sorted by folder
+    """
+    recordings = []
+    for folder, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        clan_files = sorted(name for name in files
+                            if name.endswith(".cha") and not name.endswith(export_suffixes)
+                            and not window_suffix_regx.search(name))
+        if not clan_files:
+            continue
+        if len(clan_files) > 1:
+            print "{}: more than one CLAN file, using {}".format(folder, clan_files[0])
+
+        # the CLAN file is the only input a recording can't do without:
+        # the silences and the densities can both come from it
+        recording = Recording(folder, os.path.join(folder, clan_files[0]))
+        recordings.append(recording)
+        if not os.path.isfile(recording.lena_file):
+            print "{}: no {}, ranking from the transcript".format(folder,
+                                                                 os.path.basename(recording.lena_file))
+    return recordings
+
+
+def process_recording(recording, minimum_sound, top_n, window=12, stride=1, optimal=False,
+                      silence_mode=None, maximum_silence=0.5, time_range=None, all_metrics=False,
+                      row_seconds=None, utc_offset=None, windows=None):
+    """
+    Tk-free equivalent of MainWindow.load_all_cha()
+
+    :param recording: Recording
+    :param minimum_sound: minimum sound interval (in milliseconds)
+    :param top_n: number of subregions to find
+    :param window: subregion length, in rows (12 = 1 hour of 5 minute rows)
+    :param stride: distance between candidate subregions, in rows
+    :param optimal: use the regions with the highest combined ctc_cvc
+                    average (Overlaps.optimal_ctc_cvc) rather than the
+                    greedy ranking
+    :param silence_mode: rank taking the silences into account (one
+                         of Overlaps.silence_modes), or None to ignore them
+    :param maximum_silence: with a silence_mode, windows more silent
+                            than this fraction are left out
+    :param time_range: (start, end) clock times ("HH:MM", either can be
+                       None) the subregions have to lie between
+    :param all_metrics: also write a subregion file for every other
+                        metric (see metric_suffix()), in the same pass
+    :param row_seconds: rank on rows this many seconds long, built
+                        from the transcript (see clandensity.py), rather
+                        than the 5 minute export. Without an export the
+                        transcript is used either way, in 5 minute rows.
+    :param utc_offset: local time - UTC, in seconds, for rows built
+                       from the transcript (whose times are UTC). None
+                       takes it from the export if there is one, and
+                       from this computer's time zone otherwise.
+    :param windows: other subregion lengths, in rows, to also write a
+                    ctc_cvc subregions file for (see window_suffix()).
+                    They're all ranked off the same running totals
+                    (see Overlaps.rank_windows()).
+    :return: the ranked ctc_cvc regions
+    """
+    if not os.path.isfile(recording.labeled_track_file) and os.path.isfile(recording.wav_file):
+        export_label_track(recording.wav_file, recording.labeled_track_file)
+
+    if os.path.isfile(recording.labeled_track_file):
+        silence_parser = SilenceParser(recording.labeled_track_file, minimum_sound)
+    else:
+        # no label track and no recording, use the transcript's *SIL: segments
+        silence_parser = SilenceParser(recording.clan_file, minimum_sound,
+                                       clan_sound_track(recording.clan_file))
+    silence_parser.export_sounds(recording.silences_file)
+
+    density_file, density_row_minutes = recording.density_file(row_seconds)
+    rows = None
+    if density_file != recording.clan_file:
+        # an export can hold several recordings, only rank this one's rows
+        rows = LenaData.load(density_file).recording_rows(
+            ClanDocument.load(recording.clan_file).media())
+    elif utc_offset is None and os.path.isfile(recording.lena_file):
+        # same local times as the export, for --from/--until
+        utc_offset = export_utc_offset(recording.clan_file, recording.lena_file)
+    if silence_mode is None:
+        overlaps = Overlaps(density_file, top_n, window=window, stride=stride, rows=rows,
+                            row_minutes=density_row_minutes, utc_offset=utc_offset)
+    else:
+        overlaps = Overlaps(density_file, top_n, window=window, stride=stride, rows=rows,
+                            row_minutes=density_row_minutes, utc_offset=utc_offset,
+                            silences=silence_parser.silence_set(),
+                            silence_mode=silence_mode,
+                            maximum_silence=maximum_silence)
+    if time_range is not None:
+        overlaps.set_time_range(*time_range)
+    if optimal:
+        prefix = "optimal_"
+    else:
+        prefix = "ranked_"
+    regions = getattr(overlaps, prefix + "ctc_cvc")
+    if not regions:
+        raise Exception("no subregions fit in {}".format(density_file))
+
+    # ctc_cvc first, it's the one the interval check runs on
+    metrics = ["ctc_cvc"]
+    if all_metrics:
+        metrics += [metric for metric in Overlaps.metrics if metric != "ctc_cvc"]
+    exports = [(recording.path(metric_suffix(metric)),
+                getattr(overlaps, prefix + metric),
+                getattr(overlaps, metric + "_map"))
+               for metric in metrics]
+
+    ClanFileParser(recording.clan_file, recording.subregions_file,
+                   region_length=overlaps.window_length(),
+                   offset_length=overlaps.offset_length())\
+        .insert_overlaps_multi_cha(exports,
+                                   silence_parser.silences,
+                                   insert_silences=True,
+                                   silences_added_path=recording.silences_added_file)
+
+    if windows:
+        for window, ranked in sorted(overlaps.rank_windows(windows, optimal=optimal).iteritems()):
+            region_map, window_regions = ranked["ctc_cvc"]
+            if not window_regions:
+                raise Exception("no {:g} minute subregions fit in {}".format(
+                    window * density_row_minutes, density_file))
+            path = recording.path(window_suffix(window * density_row_minutes))
+            ClanFileParser(recording.clan_file, path,
+                           region_length=window * overlaps.offset_length(),
+                           offset_length=overlaps.offset_length())\
+                .insert_overlaps_multi_cha([(path, window_regions, region_map)],
+                                           silence_parser.silences,
+                                           insert_silences=True)
+    return regions
@@ -1,11 +1,36 @@
 
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+# LENA speaker codes that count as silence when the sounds come from a
+# transcript (see clan_sound_track()). The far/faint codes (NOF, OLF,
+# TVF, ...) can be added to treat low activity as silence too.
+clan_silent_speakers = ("SIL",)
+
+
 class SilenceParser:
 
-    def __init__(self, path_to_file, minimum_sound):
+    def __init__(self, path_to_file, minimum_sound, track=None):
+        """
+        :param path_to_file: path to the Label_Track.txt
+        :param minimum_sound: sounds this long or shorter are ignored (milliseconds)
+        :param track: the SoundTrack already parsed from path_to_file, if
+                      there is one, so the file isn't read again
+        """
         self.min_sound_length = minimum_sound
-        self.sounds = self.parse_sounds(path_to_file)
+        if track is None:
+            self.sounds = self.parse_sounds(path_to_file)
+        else:
+            self.sounds = track.sounds(minimum_sound)
         self.silences = self.parse_silences2(self.sounds)
 
+    def silence_set(self):
+        """
+        :return: the silences as a SilenceSet
+        """
+        return SilenceSet(self.silences)
+
     def parse_sounds(self, path_to_file):
 
         sounds = []
@@ -104,9 +129,327 @@ class SilenceParser:
             prev_sound = curr_sound
         return silences
 
+    def export_sounds(self, path):
+        """
+        Writes the sound regions back out in the Audacity label
+        track format (seconds), with the [End] marker kept as is.
+
+        :param path: path to the exported regions file
+        :return:
+        """
+        with open(path, "w") as export_file:
+
+            for index, entry in enumerate(self.sounds):
+
+                # handle the [End] region as a special case
+                if (index + 1) == len(self.sounds)\
+                    and entry[0] == entry[1]:
+
+                    export_file.write("{0:.6f}\t{1:.6f}\t[End]\n".format(entry[0]/1000,
+                                                                         entry[1]/1000))
+                else:
+                    export_file.write("{0:.6f}\t{1:.6f}\t{2}\n".format(entry[0]/1000,
+                                                                       entry[1]/1000,
+                                                                       index + 1))
+
+
+class SoundTrack:
+    """
+    Every sound region of a Label_Track.txt, parsed once into arrays,
+    no matter the minimum sound length.
+
+    SilenceParser drops the short sounds while it reads the file, so a
+    different minimum sound length means reading it again. But the
+    silences only change when the minimum crosses the length of one
+    of the sounds, so all the possible silence sets can be worked out
+    up front: sweep() drops the sounds shortest first, merging the
+    silences on either side of each one, and records the number of
+    silences and the total silent time after every distinct length.
+    summary() is then a bisect.
+
+    The sound regions can also be handed in directly, e.g. when they
+    come from the transcript rather than a Label_Track.txt (see
+    clan_sound_track()).
+    """
+
+    # silences this short (in milliseconds) are dropped, see parse_silences2()
+    minimum_silence = 15
+
+    def __init__(self, path_to_file, regions=None):
+        """
+        :param path_to_file: path to the Label_Track.txt
+        :param regions: list of (start, end, is [End] marker) sound regions
+                        (milliseconds), if they don't come from path_to_file
+        """
+        self.path = path_to_file
+
+        # one entry per line of the file, in milliseconds
+        self.starts = array("d")
+        self.ends = array("d")
+        self.end_markers = bytearray()  # 1 for the [End] marker, which is never dropped
+
+        # the distinct sound lengths, ascending, and the silences
+        # left once every sound up to that length is dropped. Entry 0
+        # of counts/totals is for a minimum below every sound length.
+        self.thresholds = array("d")
+        self.counts = array("l")
+        self.totals = array("d")
+
+        if regions is None:
+            self.parse()
+        else:
+            for start, end, end_marker in regions:
+                self.starts.append(start)
+                self.ends.append(end)
+                self.end_markers.append(end_marker)
+        self.sweep()
+
+    def parse(self):
+        with open(self.path, "rU") as file:
+            for line in file:
+                entries = line.split()
+                self.starts.append(float(entries[0])*1000)
+                self.ends.append(float(entries[1])*1000)
+                self.end_markers.append(entries[2] == "[End]")
+
+    def __len__(self):
+        return len(self.starts)
+
+    def sounds(self, minimum_sound):
+        """
+        :param minimum_sound: sounds this long or shorter are dropped (milliseconds)
+        :return: the sounds SilenceParser.parse_sounds() would read
+                 from the file with this minimum sound length
+        """
+        starts = self.starts
+        ends = self.ends
+        markers = self.end_markers
+        return [[starts[index], ends[index]] for index in xrange(len(starts))
+                if ends[index] - starts[index] > minimum_sound or markers[index]]
+
+    def sweep(self):
+        """
+        Fills in thresholds, counts and totals
+        :return:
+        """
+        # node 0 is the 1000 ms start marker parse_silences2() starts
+        # from, the sounds follow in file order as a linked list
+        starts = array("d", [1000.0]) + self.starts
+        ends = array("d", [1000.0]) + self.ends
+        count = len(starts)
+        previous = array("l", xrange(-1, count - 1))
+        following = array("l", xrange(1, count + 1))
+        following[-1] = -1
+
+        def silence(before, after):
+            # the same arithmetic Silence does, so the lengths match exactly
+            length = (starts[after]/1000)*1000 - (ends[before]/1000)*1000
+            if length > self.minimum_silence:
+                return length
+            return None
+
+        silence_count = 0
+        total = 0.0
+        for node in xrange(1, count):
+            length = silence(node - 1, node)
+            if length is not None:
+                silence_count += 1
+                total += length
+
+        self.thresholds = array("d")
+        self.counts = array("l", [silence_count])
+        self.totals = array("d", [total])
+
+        droppable = [node for node in xrange(1, count) if not self.end_markers[node - 1]]
+        droppable.sort(key=lambda node: ends[node] - starts[node])
+
+        for position, node in enumerate(droppable):
+            before = previous[node]
+            after = following[node]
+
+            # the silences on either side of the sound merge into one
+            length = silence(before, node)
+            if length is not None:
+                silence_count -= 1
+                total -= length
+            if after != -1:
+                length = silence(node, after)
+                if length is not None:
+                    silence_count -= 1
+                    total -= length
+                length = silence(before, after)
+                if length is not None:
+                    silence_count += 1
+                    total += length
+                previous[after] = before
+            following[before] = after
+
+            # only record once every sound of this length is gone
+            sound_length = ends[node] - starts[node]
+            if position + 1 == len(droppable) or \
+                    ends[droppable[position + 1]] - starts[droppable[position + 1]] != sound_length:
+                self.thresholds.append(sound_length)
+                self.counts.append(silence_count)
+                self.totals.append(total)
+
+    def summary(self, minimum_sound):
+        """
+        :param minimum_sound: minimum sound length (milliseconds)
+        :return: (number of silences, total silent time in milliseconds)
+        """
+        position = bisect_right(self.thresholds, minimum_sound)
+        return self.counts[position], self.totals[position]
+
+
+def clan_sound_track(clan_path, silent_speakers=clan_silent_speakers):
+    """
+    Builds the sound regions from a LENA transcript instead of a
+    Label_Track.txt: every bulleted utterance that isn't silent_speakers
+    is a sound, and sounds that touch or overlap are merged into one
+    region. The gaps between them (the *SIL: segments, and anything
+    not transcribed) are the silences, and minimum_sound works on the
+    merged regions the same way it works on Sound Finder's.
+
+    The transcript is the ClanDocument the exports use, so reading it
+    here doesn't cost another parse.
+
+    :param clan_path: path to the CLAN file
+    :param silent_speakers: speaker codes that count as silence
+    :return: SoundTrack
+    """
+    from clandocument import ClanDocument
+    document = ClanDocument.load(clan_path)
+
+    silent = set(index for index, code in enumerate(document.speaker_codes)
+                 if code in silent_speakers)
+    onsets = document.onsets
+    offsets = document.offsets
+    speakers = document.speakers
+
+    bulleted = [utterance for utterance in xrange(len(onsets)) if onsets[utterance] != -1]
+    sounds = [utterance for utterance in bulleted if speakers[utterance] not in silent]
+    sounds.sort(key=lambda utterance: onsets[utterance])
+
+    regions = []
+    start = end = None
+    for utterance in sounds:
+        onset = onsets[utterance]
+        if end is not None and onset <= end:
+            end = max(end, offsets[utterance])
+            continue
+        if end is not None:
+            regions.append((float(start), float(end), False))
+        start = onset
+        end = offsets[utterance]
+    if end is not None:
+        regions.append((float(start), float(end), False))
+
+    # the [End] marker goes at the end of the last segment, silent or not
+    if bulleted:
+        last = float(max(offsets[utterance] for utterance in bulleted))
+        regions.append((last, last, True))
+
+    return SoundTrack(clan_path, regions)
+
+
+class SilenceSet:
+    """
+    A list of silences stored as arrays of onsets and offsets (in
+    milliseconds), sorted by onset and not overlapping each other, the
+    way SilenceParser finds them.
+
+    Questions about a window of time (which silences fall in it, how
+    much of it is silent) or a single point in time are answered with
+    a bisect over the arrays, rather than a walk over Silence objects.
+    """
+
+    def __init__(self, silences=()):
+        """
+        :param silences: Silence objects, in time order
+        """
+        self.starts = array("d", [silence.start for silence in silences])
+        self.ends = array("d", [silence.end for silence in silences])
+        self.numbers = array("l", [silence.number for silence in silences])
+
+        # silent time before each silence, plus the total at the end
+        self.prefix = array("d", [0.0])
+        total = 0.0
+        for start, end in zip(self.starts, self.ends):
+            total += end - start
+            self.prefix.append(total)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, position):
+        if position < 0 or position >= len(self.starts):
+            raise IndexError(position)
+        return Silence.from_milliseconds(self.starts[position], self.ends[position],
+                                         self.numbers[position])
+
+    def intersecting(self, start, end):
+        """
+        :param start: window onset (milliseconds)
+        :param end: window offset (milliseconds)
+        :return: positions of the silences that overlap the window
+        """
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end)
+        return xrange(first, max(first, last))
+
+    def silent_time(self, start, end):
+        """
+        :param start: window onset (milliseconds)
+        :param end: window offset (milliseconds)
+        :return: milliseconds of the window that are silent
+        """
+        positions = self.intersecting(start, end)
+        if not positions:
+            return 0.0
+        first = positions[0]
+        last = positions[-1]
+        total = self.prefix[last + 1] - self.prefix[first]
+
+        # the silences at either edge might stick out of the window
+        total -= max(0.0, start - self.starts[first])
+        total -= max(0.0, self.ends[last] - end)
+        return total
+
+    def covering(self, time):
+        """
+        :param time: time in milliseconds
+        :return: position of the silence time falls in, or None
+        """
+        position = bisect_right(self.starts, time) - 1
+        if position < 0 or time >= self.ends[position]:
+            return None
+        return position
+
+    def in_silence(self, time):
+        return self.covering(time) is not None
+
+    def overlaps(self, position, start, end):
+        """
+        How the window (e.g. a subregion) lies relative to a single
+        silence, the three checks the subregion comments are based on.
+
+        :param position: position of the silence
+        :param start: window onset (milliseconds)
+        :param end: window offset (milliseconds)
+        :return: (window starts inside the silence, window ends inside
+                 the silence, window contains the whole silence)
+        """
+        silence_start = self.starts[position]
+        silence_end = self.ends[position]
+        return (silence_start < start < silence_end,
+                silence_start < end < silence_end,
+                start < silence_start and end > silence_end)
+
 
 class Silence(object):
 
+    __slots__ = ("start", "end", "number")
+
     def __init__(self, start, end, number):
         self.start = start * 1000   # silence onset (converted to milliseconds)
         self.end = end * 1000       # silence offset (converted to milliseconds)
@@ -121,3 +464,11 @@ class Silence(object):
     def length(self):
         return self.end - self.start
 
+    @classmethod
+    def from_milliseconds(cls, start, end, number):
+        silence = cls.__new__(cls)
+        silence.start = start
+        silence.end = end
+        silence.number = number
+        return silence
+
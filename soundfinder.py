@@ -0,0 +1,138 @@
+"""
+Finds the sound regions of a recording straight from its .wav file,
+in place of running Audacity's Sound Finder by hand. The result is
+written out as a Label_Track.txt in the same format Audacity exports,
+so SilenceParser (and everything after it) works on it unchanged.
+
+    export_label_track("01_06_audio.wav", "Label_Track.txt")
+"""
+import audioop
+import wave
+
+
+class SoundFinder:
+    """
+    Same settings (and defaults) as Audacity's Sound Finder:
+
+        silence_level      treat audio below this level as silence (-dB)
+        minimum_silence    minimum duration of silence between sounds (seconds)
+        label_start        label starting point (seconds before sound starts)
+        label_end          label ending point (seconds after sound ends)
+
+    The level is measured as the RMS energy of every frame_length
+    second frame, relative to full scale. The .wav is read a chunk
+    (chunk_frames frames) at a time and the frames are measured as
+    they go by, so memory use doesn't depend on the length of the
+    recording.
+    """
+
+    def __init__(self, silence_level=26.0, minimum_silence=1.0,
+                 label_start=0.1, label_end=0.1,
+                 frame_length=0.01, chunk_frames=6000):
+        self.silence_level = silence_level
+        self.minimum_silence = minimum_silence
+        self.label_start = label_start
+        self.label_end = label_end
+        self.frame_length = frame_length
+        self.chunk_frames = chunk_frames
+
+        self.length = 0.0   # length of the last recording read (seconds)
+
+    def threshold(self):
+        """
+        :return: the silence level as a 16 bit RMS value
+        """
+        return 32768 * 10 ** (-self.silence_level / 20.0)
+
+    def frame_levels(self, path):
+        """
+        Yields the RMS energy of every frame of the .wav file at path,
+        and sets self.length to its length.
+
+        :param path: path to a 16 bit .wav file (mono or stereo)
+        """
+        wav = wave.open(path, "rb")
+        try:
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            rate = wav.getframerate()
+            if width != 2:
+                raise Exception("{} isn't a 16 bit recording".format(path))
+            if channels > 2:
+                raise Exception("{} has more than 2 channels".format(path))
+
+            self.length = float(wav.getnframes()) / rate
+
+            frame_samples = max(1, int(round(rate * self.frame_length)))
+            frame_bytes = frame_samples * width
+            while True:
+                # chunks are a whole number of frames, so frames
+                # never straddle two chunks
+                data = wav.readframes(frame_samples * self.chunk_frames)
+                if not data:
+                    break
+                if channels == 2:
+                    data = audioop.tomono(data, width, 0.5, 0.5)
+                for start in xrange(0, len(data), frame_bytes):
+                    yield audioop.rms(data[start:start + frame_bytes], width)
+        finally:
+            wav.close()
+
+    def find_sounds(self, path):
+        """
+        :param path: path to the .wav file
+        :return: list of (start, end) sound regions, in seconds
+        """
+        threshold = self.threshold()
+        frame_length = self.frame_length
+        silence_frames = int(round(self.minimum_silence / frame_length))
+
+        sounds = []
+        sound_start = None      # first loud frame of the current sound
+        last_loud = None        # last loud frame seen so far
+
+        for frame, level in enumerate(self.frame_levels(path)):
+            if level <= threshold:
+                continue
+            if sound_start is None:
+                sound_start = frame
+            elif frame - last_loud - 1 >= silence_frames:
+                # a long enough silence ended the previous sound
+                sounds.append(self.label(sound_start, last_loud + 1))
+                sound_start = frame
+            last_loud = frame
+
+        if sound_start is not None:
+            sounds.append(self.label(sound_start, last_loud + 1))
+        return sounds
+
+    def label(self, first_frame, end_frame):
+        """
+        :return: the label for the sound from first_frame up to (but
+                 not including) end_frame, in seconds
+        """
+        start = max(0.0, first_frame * self.frame_length - self.label_start)
+        end = min(self.length, end_frame * self.frame_length + self.label_end)
+        return start, end
+
+
+def export_label_track(wav_path, label_track_path, sound_finder=None):
+    """
+    Writes the sound regions of the recording at wav_path to
+    label_track_path, in Audacity's label track format, ending with
+    the [End] marker at the end of the recording.
+
+    :param wav_path: path to the .wav file
+    :param label_track_path: path to the Label_Track.txt to write
+    :param sound_finder: SoundFinder with the settings to use (defaults if None)
+    :return: the sound regions, in seconds
+    """
+    if sound_finder is None:
+        sound_finder = SoundFinder()
+    sounds = sound_finder.find_sounds(wav_path)
+
+    with open(label_track_path, "w") as label_track:
+        for index, (start, end) in enumerate(sounds):
+            label_track.write("{0:.6f}\t{1:.6f}\t{2}\n".format(start, end, index + 1))
+        label_track.write("{0:.6f}\t{0:.6f}\t[End]\n".format(sound_finder.length))
+    return sounds
@@ -0,0 +1,42 @@
+"""
+Writes small LENA 5 minute exports for the tests.
+"""
+import calendar
+import csv
+import time
+
+
+# the columns of a real LENA 5 minute export, in the same order
+header = ["Type", "ChildKey", "Id", "Lastname", "Firstname", "Birthdate", "Age", "Sex", "DLP",
+          "ProcessingFile", "Timestamp", "Duration", "Meaningful", "Distant", "TV", "TV.Pct",
+          "Noise", "Silence", "AWC.Actual", "AWC.Proj", "AWC.Pct", "CTC.Actual", "CTC.Proj",
+          "CTC.Pct", "CVC.Actual", "CVC.Proj", "CVC.Pct", "AVA_StdScore", "AVA_StdScore_Pct",
+          "AVA_AvgScore", "AVA_AvgScore_Pct"]
+
+
+def clock(seconds):
+    return "{:02}:{:02}:{:02}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def write_export(path, recordings):
+    """
+    :param path: path of the csv to write
+    :param recordings: list of (processing file, first timestamp e.g.
+                       "2015-07-15 22:00", list of rows) tuples. Every
+                       row is a (duration, meaningful, awc, ctc, cvc)
+                       tuple, with the times in seconds.
+    """
+    with open(path, "wb") as export:
+        writer = csv.writer(export)
+        writer.writerow(header)
+        for processing_file, start, rows in recordings:
+            minutes = calendar.timegm(time.strptime(start, "%Y-%m-%d %H:%M")) // 60
+            for row, (duration, meaningful, awc, ctc, cvc) in enumerate(rows):
+                timestamp = time.strftime("%Y-%m-%d %H:%M",
+                                          time.gmtime((minutes + 5 * row) * 60))
+                values = dict(zip(header, [""] * len(header)))
+                values.update({"Type": "5 Minute", "ChildKey": "ABC",
+                               "ProcessingFile": processing_file, "Timestamp": timestamp,
+                               "Duration": clock(duration), "Meaningful": clock(meaningful),
+                               "AWC.Actual": awc, "CTC.Actual": ctc, "CVC.Actual": cvc})
+                writer.writerow([values[name] for name in header])
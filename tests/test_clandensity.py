@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from clandensity import export_utc_offset, parse_clan
+from exports import write_export
+from lenadata import LenaData
+from transcripts import write_transcript
+
+
+utterances = [("FAN", "look at the &=w2_40 dog .", 1000, 4000),
+              ("CHN", "0 .", 6000, 7000),
+              ("MAN", "yes &=w1_00 .", 65000, 70000),
+              ("SIL", "0 .", 70000, 130000),
+              ("CHN", "0 .", 130000, 131500)]
+
+
+class ParseClanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "01_01.lena.cha")
+        write_transcript(self.path, utterances)
+
+    def tearDown(self):
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def test_columns(self):
+        data = parse_clan(self.path, row_minutes=1, utc_offset=0)
+        self.assertEqual(len(data), 3)
+        self.assertEqual(list(data.durations), [60.0, 60.0, 11.5])
+        self.assertEqual(list(data.meaningful), [4.0, 5.0, 1.5])
+        self.assertEqual(list(data.awc_actual), [2, 1, 0])
+        # FAN -> CHN 2 seconds apart is a turn, MAN -> CHN a minute later isn't
+        self.assertEqual(list(data.ctc_actual), [1, 0, 0])
+        self.assertEqual(list(data.cvc_actual), [1, 0, 1])
+
+    def test_utterances_at_the_end(self):
+        # an empty utterance right where the last row ends
+        write_transcript(self.path, utterances[:3] + [("CHN", "0 .", 120000, 120000)])
+        data = parse_clan(self.path, row_minutes=1, utc_offset=0)
+        self.assertEqual(list(data.durations), [60.0, 60.0])
+        self.assertEqual(list(data.cvc_actual), [1, 1])
+
+        # a malformed bullet that starts after every offset
+        write_transcript(self.path, utterances[:3] + [("CHN", "0 .", 200000, 150000)])
+        data = parse_clan(self.path, row_minutes=1, utc_offset=0)
+        self.assertEqual(list(data.durations), [60.0, 60.0, 60.0, 20.0])
+        self.assertEqual(list(data.meaningful), [4.0, 5.0, 0.0, 0.0])
+        self.assertEqual(list(data.cvc_actual), [1, 0, 0, 1])
+
+        write_transcript(self.path, [("CHN", "0 .", 0, 0)])
+        data = parse_clan(self.path, row_minutes=1, utc_offset=0)
+        self.assertEqual(list(data.cvc_actual), [1])
+
+    def test_local_time(self):
+        data = parse_clan(self.path, utc_offset=0)
+        self.assertEqual(data.timestamps[0], "2015-07-15 13:01")
+        data = parse_clan(self.path, utc_offset=-4 * 3600)
+        self.assertEqual(data.timestamps[0], "2015-07-15 09:01")
+        self.assertEqual(data.utc_offset, -4 * 3600)
+
+    def test_offset_from_export(self):
+        export = os.path.join(self.folder, "01_01_lena5min.csv")
+        write_export(export, [("20150720_104920_000001.its", "2015-07-15 09:00",
+                               [(236, 10, 3, 1, 2)])])
+        self.assertEqual(export_utc_offset(self.path, export), -4 * 3600)
+
+        # an export of another recording says nothing about this one
+        write_export(export, [("20150720_104920_000001.its", "2015-07-15 09:00", [(300, 0, 0, 0, 0)]),
+                              ("20150721_090000_000002.its", "2015-07-16 09:00", [(300, 0, 0, 0, 0)])])
+        write_transcript(self.path, utterances, media="e20150722_090000_000003")
+        self.assertEqual(export_utc_offset(self.path, export), None)
+
+    def test_sidecar_keeps_the_offset(self):
+        local = LenaData.load(self.path, utc_offset=-4 * 3600)
+        LenaData.cache.clear()
+        self.assertEqual(LenaData.load(self.path, utc_offset=-4 * 3600).timestamps, local.timestamps)
+        LenaData.cache.clear()
+        self.assertEqual(LenaData.load(self.path, utc_offset=3600).timestamps[0], "2015-07-15 14:01")
+
+
+if __name__ == "__main__":
+    unittest.main()
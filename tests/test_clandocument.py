@@ -0,0 +1,205 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from clandocument import ClanDocument, InsertionPlan, SourceLine, plan_source
+
+
+lines = ["@UTF8",
+         "@Begin",
+         "@Participants:\tCHN Target_Child, FAN Female_Adult_Near, MAN Male_Adult_Near",
+         "@Media:\te20150720_104920_000001, audio",
+         "*FAN:\thello there . \x151000_2000\x15",
+         "%xdb:\taverage_dB=\"-40.00\"",
+         "*CHN:\ta long one",
+         "\tthat goes on \x153000_4000\x15",
+         "\tand on . \x154000_5500\x15",
+         "*FAN:\tno bullet here .",
+         "*CHN:\t0 . \x156000_7000\x15 \x157000_8000\x15",
+         "*MAN:\t0 . \x159000_8500\x15",
+         "@End"]
+
+
+def write_cha(path, lines, newline="\r\n"):
+    with open(path, "wb") as file:
+        file.write(newline.join(lines) + newline)
+
+
+class ClanDocumentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "01_01.cha")
+        write_cha(self.path, lines)
+        self.document = ClanDocument.load(self.path)
+
+    def tearDown(self):
+        ClanDocument.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def test_lines(self):
+        # \r\n is normalized, every line keeps its \n
+        self.assertEqual(self.document.line_count(), len(lines))
+        self.assertEqual([line for line, bullet in self.document.lines()],
+                         [line + "\n" for line in lines])
+        self.assertEqual(self.document.text, "\n".join(lines) + "\n")
+        self.assertEqual(self.document.line(6), "*CHN:\ta long one\n")
+
+    def test_bullets(self):
+        self.assertEqual([(index, bullet) for index, (line, bullet)
+                          in enumerate(self.document.lines()) if bullet is not None],
+                         [(4, (1000, 2000)), (7, (3000, 4000)), (8, (4000, 5500)),
+                          (10, (6000, 7000)), (11, (9000, 8500))])
+        # only the first bullet on a line counts
+        self.assertEqual(self.document.bullet(10), (6000, 7000))
+        self.assertEqual(self.document.bullet(5), None)
+        self.assertEqual(self.document.interval_errors(), [11])
+
+    def test_utterances(self):
+        document = self.document
+        self.assertEqual(document.utterance_count(), 5)
+        self.assertEqual([document.speaker(utterance) for utterance in xrange(5)],
+                         ["FAN", "CHN", "FAN", "CHN", "MAN"])
+        self.assertEqual(document.speaker_codes, ["FAN", "CHN", "MAN"])
+        self.assertEqual(list(document.first_lines), [4, 6, 9, 10, 11])
+        self.assertEqual(list(document.last_lines), [4, 8, 9, 10, 11])
+        # the multi-line utterance runs from the first bullet on its
+        # continuation lines to the last one
+        self.assertEqual(list(document.onsets), [1000, 3000, -1, 6000, 9000])
+        self.assertEqual(list(document.offsets), [2000, 5500, -1, 7000, 8500])
+
+    def test_media(self):
+        self.assertEqual(self.document.media(), "e20150720_104920_000001")
+        write_cha(self.path, lines[:3] + lines[4:])
+        ClanDocument.cache.clear()
+        self.assertEqual(ClanDocument.load(self.path).media(), None)
+
+    def test_unix_newlines(self):
+        write_cha(self.path, lines, newline="\n")
+        ClanDocument.cache.clear()
+        document = ClanDocument.load(self.path)
+        self.assertEqual(document.text, self.document.text)
+        self.assertEqual(list(document.line_starts), list(self.document.line_starts))
+
+    def test_cache(self):
+        self.assertTrue(ClanDocument.load(self.path) is self.document)
+
+        # touched: same contents, but the mtime says it may have changed
+        os.utime(self.path, (1000000000, 1000000000))
+        touched = ClanDocument.load(self.path)
+        self.assertFalse(touched is self.document)
+        self.assertTrue(ClanDocument.load(self.path) is touched)
+
+        # a new size is reparsed too, even with the same mtime
+        write_cha(self.path, lines[:-1] + ["*CHN:\t0 . \x1510000_11000\x15", "@End"])
+        os.utime(self.path, (1000000000, 1000000000))
+        edited = ClanDocument.load(self.path)
+        self.assertFalse(edited is touched)
+        self.assertEqual(edited.utterance_count(), 6)
+
+
+class InsertionPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "01_01.cha")
+        # the same %xdb: line twice, so lines can't be told apart by their text
+        write_cha(self.path, lines[:6] + lines[5:])
+        self.document = ClanDocument.load(self.path)
+        self.starts = self.document.line_starts
+
+    def tearDown(self):
+        ClanDocument.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def export(self, generator):
+        """
+        Runs the document through generator and an InsertionPlan
+
+        :param generator: takes the (line, bullet) pairs of plan_source()
+                          and yields the export's
+        :return: (plan, the lines the generator yielded, the written file)
+        """
+        plan = InsertionPlan(self.document)
+        written = [line for line, bullet in plan.planned(generator(plan_source(self.document)))]
+        plan.finish()
+        output = os.path.join(self.folder, "export.cha")
+        plan.write(output)
+        with open(output, "rb") as file:
+            return plan, written, file.read()
+
+    def test_source_line(self):
+        line = SourceLine("*CHN:\t0 .\n", 7)
+        self.assertEqual(line, "*CHN:\t0 .\n")
+        self.assertEqual(line.number, 7)
+        # anything built from it is a plain str, without a number
+        self.assertFalse(hasattr(line + "", "number"))
+        self.assertEqual([line.number for line, bullet in plan_source(self.document)],
+                         range(self.document.line_count()))
+
+    def test_unchanged(self):
+        plan, written, output = self.export(lambda lines: lines)
+        self.assertEqual(plan.edits, [])
+        self.assertEqual(output, self.document.text)
+
+    def test_insert_delete_replace(self):
+        def generator(lines):
+            for line, bullet in lines:
+                if line.number == 4:
+                    yield line, bullet
+                    yield "%xcom:\tafter the first FAN\n", None
+                elif line.number == 5:
+                    continue
+                elif line.number == 11:
+                    yield "*CHN:\t0 . \x156000_6500\x15\n", (6000, 6500)
+                else:
+                    yield line, bullet
+
+        plan, written, output = self.export(generator)
+        # an insertion followed by a deletion at the same place is
+        # a single replacement, and so is a rewritten line
+        self.assertEqual(plan.edits,
+                         [(self.starts[5], self.starts[6], "%xcom:\tafter the first FAN\n"),
+                          (self.starts[11], self.starts[12], "*CHN:\t0 . \x156000_6500\x15\n")])
+        self.assertEqual(output, "".join(written))
+
+    def test_placed_by_line_number(self):
+        def generator(lines):
+            for line, bullet in lines:
+                if line.number == 5:
+                    # dropped, although line 6 has the same text
+                    continue
+                if line.number == 8:
+                    # a copy of the line, rather than the line itself
+                    yield line + "", bullet
+                    continue
+                yield line, bullet
+                if line.number == 9:
+                    # a document line written out a second time
+                    yield line, bullet
+
+        plan, written, output = self.export(generator)
+        self.assertEqual(plan.edits,
+                         [(self.starts[5], self.starts[6], ""),
+                          (self.starts[8], self.starts[9], self.document.line(8)),
+                          (self.starts[10], self.starts[10], self.document.line(9))])
+        self.assertEqual(output, "".join(written))
+
+    def test_dropped_at_the_end(self):
+        def generator(lines):
+            for line, bullet in lines:
+                if line.startswith("@End"):
+                    break
+                yield line, bullet
+            yield "@Comment:\tno @End\n", None
+
+        plan, written, output = self.export(generator)
+        end = self.document.line_count() - 1
+        self.assertEqual(plan.edits,
+                         [(self.starts[end], self.starts[end + 1], "@Comment:\tno @End\n")])
+        self.assertEqual(output, "".join(written))
+
+
+if __name__ == "__main__":
+    unittest.main()
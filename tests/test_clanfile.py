@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from clandocument import ClanDocument, InsertionPlan
+from clanfile import ClanFileParser
+from silences import Silence
+from transcripts import write_transcript
+
+
+# 1 minute rows and 3 minute subregions, so a 12 minute transcript
+# has room for two of them
+lengths = dict(region_length=3 * 60 * 1000, offset_length=60 * 1000)
+
+ranked = [2, 7]
+region_map = {2: 5.0, 7: 4.0}
+
+# the first silence is inside subregion 1, the second starts
+# right after subregion 2 ends
+silences = [(250.0, 330.0), (600.5, 610.0)]
+
+
+def utterances():
+    """
+    :return: an utterance every 7 seconds for 12 minutes, except
+             for a long *SIL: from 250s to 330s
+    """
+    speakers = ["FAN", "CHN", "MAN", "CXN"]
+    found = [("SIL", "0 .", 250000, 330000)]
+    onset = 1000
+    while onset < 720000:
+        if 250000 <= onset < 330000:
+            onset = 330000
+        found.append((speakers[len(found) % 4], "0 .", onset, onset + 3000))
+        onset += 7000
+    found.sort(key=lambda utterance: utterance[2])
+    return found
+
+
+def silence_list():
+    return [Silence(start, end, number + 1) for number, (start, end) in enumerate(silences)]
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class FusedExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.clan_file = self.path("01_01.lena.cha")
+        write_transcript(self.clan_file, utterances())
+
+    def tearDown(self):
+        ClanDocument.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def two_passes(self):
+        """
+        :return: the silences_added and subregions files written the old
+                 way, the second pass reading the first one's output
+        """
+        ClanFileParser(self.clan_file, self.path("two_silences_added.cha"), **lengths) \
+            .insert_silences_cha(silence_list())
+        ClanFileParser(self.path("two_silences_added.cha"), self.path("two_subregions.cha"),
+                       **lengths) \
+            .insert_overlaps_cha(ranked, region_map, silence_list())
+        return read(self.path("two_silences_added.cha")), read(self.path("two_subregions.cha"))
+
+    def test_same_as_two_passes(self):
+        silences_added, subregions = self.two_passes()
+
+        ClanFileParser(self.clan_file, self.path("subregions.cha"), **lengths) \
+            .insert_silences_overlaps_cha(silence_list(), ranked, region_map,
+                                          silences_added_path=self.path("silences_added.cha"))
+        self.assertEqual(read(self.path("silences_added.cha")), silences_added)
+        self.assertEqual(read(self.path("subregions.cha")), subregions)
+
+        # and both passes did insert something
+        comments = [line for line in subregions.splitlines() if line.startswith("%xcom:")]
+        self.assertEqual(len(comments), 8)
+        self.assertTrue(comments[0].startswith("%xcom:\tsubregion 1 of 2 (ranked 1 of 2) "
+                                               "starts at 120000"))
+        self.assertTrue(comments[3].startswith("%xcom:\tsilence 1 of 2 ends at 330000"))
+
+    def test_subregions_only(self):
+        silences_added, subregions = self.two_passes()
+
+        # without silences_added_path only the subregions file is written
+        ClanFileParser(self.clan_file, self.path("subregions.cha"), **lengths) \
+            .insert_silences_overlaps_cha(silence_list(), ranked, region_map)
+        self.assertEqual(read(self.path("subregions.cha")), subregions)
+        self.assertFalse(os.path.exists(self.path("silences_added.cha")))
+
+
+class MultiExportTest(unittest.TestCase):
+
+    # one ranking per subregion file, as if for three metrics
+    rankings = [([2, 7], {2: 5.0, 7: 4.0}),
+                ([0, 5], {0: 3.0, 5: 2.5}),
+                ([8], {8: 1.0})]
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.clan_file = os.path.join(self.folder, "01_01.lena.cha")
+        write_transcript(self.clan_file, utterances())
+
+        # the paths every InsertionPlan writes to
+        self.written = []
+        write = InsertionPlan.__dict__["write"]
+
+        def recorded_write(plan, path):
+            self.written.append(path)
+            write(plan, path)
+        InsertionPlan.write = recorded_write
+        self.addCleanup(setattr, InsertionPlan, "write", write)
+
+    def tearDown(self):
+        ClanDocument.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def test_one_file_per_ranking(self):
+        exports = [(self.path("export_{}.cha".format(index)), ranked, region_map)
+                   for index, (ranked, region_map) in enumerate(self.rankings)]
+        ClanFileParser(self.clan_file, exports[0][0], **lengths) \
+            .insert_overlaps_multi_cha(exports, silence_list(), insert_silences=True,
+                                       silences_added_path=self.path("silences_added.cha"))
+        # the silences_added file is written once, not once per export
+        self.assertEqual(sorted(self.written),
+                         sorted([path for path, ranked, region_map in exports] +
+                                [self.path("silences_added.cha")]))
+
+        # and every file is the one a pass of its own would write
+        for index, (path, ranked, region_map) in enumerate(exports):
+            single = self.path("single_{}.cha".format(index))
+            single_silences = self.path("single_silences_added_{}.cha".format(index))
+            ClanFileParser(self.clan_file, single, **lengths) \
+                .insert_silences_overlaps_cha(silence_list(), ranked, region_map,
+                                              silences_added_path=single_silences)
+            self.assertEqual(read(path), read(single))
+            self.assertEqual(read(self.path("silences_added.cha")), read(single_silences))
+        self.assertNotEqual(read(exports[0][0]), read(exports[1][0]))
+
+    def test_without_silences(self):
+        exports = [(self.path("export_{}.cha".format(index)), ranked, region_map)
+                   for index, (ranked, region_map) in enumerate(self.rankings[:2])]
+        ClanFileParser(self.clan_file, exports[0][0], **lengths) \
+            .insert_overlaps_multi_cha(exports, silence_list())
+        self.assertEqual(sorted(self.written), sorted(path for path, ranked, region_map in exports))
+
+        for index, (path, ranked, region_map) in enumerate(exports):
+            single = self.path("single_{}.cha".format(index))
+            ClanFileParser(self.clan_file, single, **lengths) \
+                .insert_overlaps_cha(ranked, region_map, silence_list())
+            self.assertEqual(read(path), read(single))
+
+
+if __name__ == "__main__":
+    unittest.main()
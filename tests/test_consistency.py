@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from clandensity import parse_clan
+from consistency import check_pair
+from exports import write_export
+from lenadata import LenaData
+from transcripts import write_transcript
+
+
+# utterances per 5 minute row
+pattern = [1, 5, 2, 8, 3, 0, 6, 1, 7, 2, 4, 9]
+
+
+def utterances():
+    """
+    :return: alternating FAN/CHN utterances, as many per row as pattern says
+    """
+    found = []
+    for row, count in enumerate(pattern):
+        for number in xrange(count):
+            onset = row * 300000 + number * 20000 + 1000
+            found.append(("FAN", "hi &=w{}_00 .".format(count), onset, onset + 4000))
+            found.append(("CHN", "0 .", onset + 5000, onset + 7000))
+    # the recording goes on to the end of the last row
+    found.append(("SIL", "0 .", 3540000, 3600000))
+    return found
+
+
+class CheckPairTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.clan_file = os.path.join(self.folder, "01_01.lena.cha")
+        self.lena_file = os.path.join(self.folder, "01_01_lena5min.csv")
+        write_transcript(self.clan_file, utterances())
+
+        # the transcript's own columns, as the export would have them
+        data = parse_clan(self.clan_file, utc_offset=-4 * 3600)
+        self.rows = [(int(data.durations[row]), int(data.meaningful[row]), data.awc_actual[row],
+                      data.ctc_actual[row], data.cvc_actual[row]) for row in xrange(len(data))]
+
+    def tearDown(self):
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def check(self, recordings):
+        write_export(self.lena_file, recordings)
+        LenaData.cache.clear()
+        return check_pair(self.lena_file, self.clan_file)
+
+    def test_matching_pair(self):
+        report = self.check([("20150720_104920_000001.its", "2015-07-15 09:01", self.rows)])
+        self.assertEqual(report.problems, [])
+        self.assertEqual(report.estimated_lead, 0)
+        self.assertTrue(report.correlation > 0.99)
+
+    def test_other_recording(self):
+        report = self.check([("20150720_104920_000002.its", "2015-07-15 09:01", self.rows)])
+        self.assertEqual(report.problems, ["the export is of 20150720_104920_000002.its, the "
+                                           "transcript of e20150720_104920_000001"])
+
+    def test_shifted_transcript(self):
+        # the export has 10 more minutes before the transcript starts
+        empty = [(300, 0, 0, 0, 0)] * 2
+        report = self.check([("20150720_104920_000001.its", "2015-07-15 08:51",
+                              empty + self.rows[:-2])])
+        self.assertEqual(report.estimated_lead, 600)
+        self.assertEqual(report.problems[-1], "the transcript lines up 600s into the export, "
+                                              "not 0s")
+
+    def test_picks_its_recording(self):
+        empty = [(300, 0, 0, 0, 0)] * len(self.rows)
+        report = self.check([("20150719_080000_000009.its", "2015-07-14 09:00", empty),
+                             ("20150720_104920_000001.its", "2015-07-15 09:01", self.rows)])
+        self.assertEqual(report.lena_media, "20150720_104920_000001.its")
+        self.assertEqual(report.problems, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
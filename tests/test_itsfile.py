@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from itsfile import parse_its
+
+
+# two recordings, 08:00-08:12 and 08:30-08:40 local time (UTC-5), with
+# a few segments in each
+its_text = """<?xml version="1.0" encoding="UTF-8"?>
+<ITS fileName="e20150715_130000_000001">
+<ProcessingUnit>
+<UPL_Header><TransferTime LocalTime="2015-07-20T10:00:00" UTCTime="2015-07-20T15:00:00"/></UPL_Header>
+<Child ChildKey="ABC"/>
+<Recording num="1" startClockTime="2015-07-15T13:00:00Z" startTime="PT0.00S" endTime="PT720.00S">
+<Conversation num="1" startTime="PT10.00S" endTime="PT30.00S" turnTaking="2">
+<Segment spkr="FAN" startTime="PT10.00S" endTime="PT20.00S" femaleAdultWordCnt="4.25"/>
+<Segment spkr="CHN" startTime="PT20.00S" endTime="PT30.00S" childUttCnt="1"/>
+</Conversation>
+<Conversation num="2" startTime="PT295.00S" endTime="PT310.00S" turnTaking="1">
+<Segment spkr="MAN" startTime="PT295.00S" endTime="PT305.00S" maleAdultWordCnt="3.00"/>
+<Segment spkr="TVN" startTime="PT305.00S" endTime="PT310.00S"/>
+</Conversation>
+</Recording>
+<Recording num="2" startClockTime="2015-07-15T13:30:00Z" startTime="PT720.00S" endTime="PT1320.00S">
+<Conversation num="3" startTime="PT730.00S" endTime="PT740.00S" turnTaking="0">
+<Segment spkr="CHN" startTime="PT730.00S" endTime="PT740.00S" childUttCnt="2"/>
+</Conversation>
+</Recording>
+</ProcessingUnit>
+</ITS>
+"""
+
+
+class ParseItsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "test.its")
+        with open(self.path, "w") as its_file:
+            its_file.write(its_text)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_columns(self):
+        data = parse_its(self.path)
+        self.assertEqual(data.timestamps[0], "2015-07-15 08:00")
+        self.assertEqual(list(data.durations[:3]), [300, 300, 120])
+        self.assertEqual(list(data.meaningful[:2]), [25, 5])
+        self.assertEqual(list(data.awc_actual[:2]), [7, 0])
+        self.assertEqual(list(data.ctc_actual[:2]), [3, 0])
+        self.assertEqual(list(data.cvc_actual[:2]), [1, 0])
+
+    def test_pause_keeps_rows_contiguous(self):
+        data = parse_its(self.path)
+        self.assertEqual(len(data), 8)
+        self.assertEqual(list(data.minutes), [data.minutes[0] + 5 * row for row in xrange(8)])
+        self.assertEqual(list(data.durations), [300, 300, 120, 0, 0, 0, 300, 300])
+        self.assertEqual(data.timestamps[6], "2015-07-15 08:30")
+        self.assertEqual(data.cvc_actual[6], 2)
+        for row in (3, 4, 5):
+            self.assertEqual((data.meaningful[row], data.awc_actual[row],
+                              data.ctc_actual[row], data.cvc_actual[row]), (0, 0, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from exports import write_export
+from lenadata import LenaData, sidecar_path
+from overlaps import Overlaps
+
+
+first = ("20150715_090000_000001.its", "2015-07-15 09:00",
+         [(300, 60, 10, 1, 2), (300, 120, 20, 2, 3), (300, 30, 5, 0, 1)])
+second = ("20150716_100000_000002.its", "2015-07-16 10:00",
+          [(300, 90, 30, 4, 5), (300, 0, 0, 0, 0)])
+
+
+class SidecarTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "lena5min.csv")
+        write_export(self.path, [first])
+        os.utime(self.path, (1000000000, 1000000000))
+
+    def tearDown(self):
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def load(self):
+        LenaData.cache.clear()
+        return LenaData.load(self.path)
+
+    def sidecar_mtime(self):
+        with open(sidecar_path(self.path), "rb") as sidecar:
+            return LenaData.header.unpack(sidecar.read(LenaData.header.size))[3]
+
+    def test_sidecar_is_written_and_read(self):
+        data = self.load()
+        self.assertTrue(os.path.isfile(sidecar_path(self.path)))
+        again = self.load()
+        self.assertEqual(again.timestamps, data.timestamps)
+        self.assertEqual(again.arrays(), data.arrays())
+        self.assertEqual(list(again.awc_actual), [10, 20, 5])
+
+    def test_changed_size(self):
+        self.load()
+        write_export(self.path, [first, second])
+        os.utime(self.path, (1000000000, 1000000000))
+        self.assertEqual(list(self.load().awc_actual), [10, 20, 5, 30, 0])
+
+    def test_changed_contents(self):
+        self.load()
+        # same size, different numbers, new mtime: the hash tells them apart
+        write_export(self.path, [(first[0], first[1], [(300, 60, 90, 1, 2)] + first[2][1:])])
+        os.utime(self.path, (1000000100, 1000000100))
+        self.assertEqual(list(self.load().awc_actual), [90, 20, 5])
+
+    def test_touched(self):
+        self.load()
+        os.utime(self.path, (1000000100, 1000000100))
+        self.assertEqual(list(self.load().awc_actual), [10, 20, 5])
+        # the new mtime is saved, so the next load doesn't hash the file
+        self.assertEqual(self.sidecar_mtime(), 1000000100)
+
+    def test_broken_sidecar(self):
+        self.load()
+        with open(sidecar_path(self.path), "wb") as sidecar:
+            sidecar.write("not a sidecar")
+        self.assertEqual(list(self.load().awc_actual), [10, 20, 5])
+
+
+class RecordingsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "lena5min.csv")
+        write_export(self.path, [first, second])
+
+    def tearDown(self):
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def test_recording_rows(self):
+        data = LenaData.load(self.path)
+        self.assertEqual([list(rows) for child_key, processing_file, rows in data.recordings()],
+                         [[0, 1, 2], [3, 4]])
+        self.assertEqual(list(data.recording_rows("e20150716_100000_000002")), [3, 4])
+        self.assertEqual(list(data.recording_rows("20150715_090000_000001")), [0, 1, 2])
+        self.assertRaises(Exception, data.recording_rows, "e20150717_090000_000003")
+        self.assertRaises(Exception, data.recording_rows, None)
+
+    def test_single_recording(self):
+        write_export(self.path, [second])
+        LenaData.cache.clear()
+        self.assertEqual(list(LenaData.load(self.path).recording_rows("e20150101_000000_000009")),
+                         [0, 1])
+
+    def test_windows_stay_in_their_recording(self):
+        rows = LenaData.load(self.path).recording_rows("e20150716_100000_000002")
+        overlaps = Overlaps(self.path, 2, window=2, rows=rows)
+        self.assertEqual(overlaps.processing_file, second[0])
+        self.assertEqual(overlaps.dataset.time, ("2015", "07", "16", "10", "00"))
+        self.assertEqual(list(overlaps.dataset.awc_actual), [30, 0])
+        self.assertEqual(overlaps.ranked_awc_actual, [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
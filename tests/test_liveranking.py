@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from exports import write_export
+from liveranking import ExportFollower, LiveRanking
+
+
+class LiveRankingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "lena5min.csv")
+        rows = [(300, 60, 10 * count, count, count) for count in (1, 2, 3, 2, 1, 0, 4, 5)]
+        write_export(self.path, [("e20150715_090000_000001.its", "2015-07-15 09:00", rows[:5]),
+                                 ("e20150716_090000_000002.its", "2015-07-16 09:00", rows[5:])])
+        with open(self.path, "rb") as export:
+            self.text = export.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, text):
+        with open(self.path, "wb") as export:
+            export.write(text)
+
+    def test_follower_reads_complete_rows_once(self):
+        lines = self.text.splitlines(True)
+        # the header, two rows and half of the third
+        self.write("".join(lines[:3]) + lines[3][:10])
+        follower = ExportFollower(self.path)
+        self.assertEqual([row["Timestamp"] for row in follower.read()],
+                         ["2015-07-15 09:00", "2015-07-15 09:05"])
+        self.assertEqual(follower.read(), [])
+        self.write(self.text)
+        self.assertEqual(len(follower.read()), 6)
+
+    def test_new_recording_starts_a_new_ranking(self):
+        ranking = LiveRanking("ctc_actual", 1, 2, 1)
+        rows = ExportFollower(self.path).read()
+        for row in rows[:5]:
+            ranking.add(row)
+        self.assertTrue(ranking.update())
+        self.assertEqual(ranking.ranked, [1])
+        self.assertEqual((ranking.clock(1), ranking.clock(3)), ("09:05", "09:15"))
+
+        ranking.add(rows[5])
+        self.assertEqual(ranking.ranked, [])
+        self.assertEqual(len(ranking.dataset.meaningful), 1)
+        for row in rows[6:]:
+            ranking.add(row)
+        ranking.update()
+        self.assertEqual(ranking.ranked, [1])
+        self.assertEqual(ranking.clock(1), "09:05")
+
+
+if __name__ == "__main__":
+    unittest.main()
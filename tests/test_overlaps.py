@@ -0,0 +1,268 @@
+import os
+import shutil
+import tempfile
+import unittest
+from itertools import combinations
+
+from exports import write_export
+from lenadata import LenaData
+from overlaps import OnlineWordDensitySet, Overlaps, RangeMaximum
+from silences import Silence, SilenceSet
+
+
+def ctc_rows(counts):
+    return [(300, 0, 0, count, 0) for count in counts]
+
+
+class TimeRangeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "late_lena5min.csv")
+        # 22:00 to 01:00, busiest from 00:00 to 00:30
+        counts = [1] * 36
+        counts[24:30] = [5] * 6
+        write_export(self.path, [("e20150715_220000_000001.its", "2015-07-15 22:00",
+                                  ctc_rows(counts))])
+        self.overlaps = Overlaps(self.path, 1, window=6)
+
+    def tearDown(self):
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def test_clock_to_row(self):
+        self.assertEqual(self.overlaps.clock_to_row("22:00"), 0)
+        self.assertEqual(self.overlaps.clock_to_row("23:30"), 18)
+        self.assertEqual(self.overlaps.clock_to_row("0:45"), 33)
+        # outside the recording, closer to its end or its start
+        self.assertEqual(self.overlaps.clock_to_row("3:00"), 36)
+        self.assertEqual(self.overlaps.clock_to_row("21:00"), 0)
+
+    def test_range_across_midnight(self):
+        self.overlaps.set_time_range("23:30", "0:45")
+        self.assertEqual((self.overlaps.start_row, self.overlaps.end_row), (18, 33))
+        self.assertEqual(self.overlaps.ranked_ctc_actual, [24])
+        self.overlaps.set_time_range("23:00", "23:55")
+        self.assertEqual(self.overlaps.ranked_ctc_actual, [12])
+
+    def test_range_past_the_end(self):
+        self.overlaps.set_time_range("0:30", "3:00")
+        self.assertEqual((self.overlaps.start_row, self.overlaps.end_row), (30, 36))
+        self.assertEqual(self.overlaps.ranked_ctc_actual, [30])
+
+    def test_range_from_before_the_start(self):
+        self.overlaps.set_time_range("21:30", "22:30")
+        self.assertEqual((self.overlaps.start_row, self.overlaps.end_row), (0, 6))
+        self.assertEqual(self.overlaps.ranked_ctc_actual, [0])
+
+    def test_range_too_short(self):
+        self.assertRaises(Exception, self.overlaps.set_time_range, "0:45", None)
+        self.assertRaises(Exception, self.overlaps.set_time_range, "3:00", "4:00")
+        self.assertRaises(Exception, self.overlaps.set_time_range, "23:00", "22:30")
+
+
+class RankingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        path = os.path.join(self.folder, "lena5min.csv")
+        write_export(path, [("e20150715_090000_000001.its", "2015-07-15 09:00",
+                             ctc_rows([(row * 37) % 11 for row in xrange(30)]))])
+        self.overlaps = Overlaps(path, 3, window=4)
+
+    def tearDown(self):
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def test_optimal_filter_beats_greedy(self):
+        # one dense window between two almost as dense ones
+        region_map = {0: 5.0, 1: 9.0, 2: 5.0}
+        self.assertEqual(self.overlaps.filter_overlaps(region_map, 2, window=2), [1])
+        self.assertEqual(self.overlaps.optimal_filter(region_map, 2, window=2), [0, 2])
+        self.assertEqual(self.overlaps.optimal_filter(region_map, 1, window=2), [1])
+        self.assertEqual(self.overlaps.optimal_filter({}, 2, window=2), [])
+
+    def test_optimal_filter_is_optimal(self):
+        region_map = dict((offset, float((offset * 7) % 5)) for offset in xrange(12))
+        for top_n in (1, 2, 3):
+            for window in (1, 3, 4):
+                chosen = self.overlaps.optimal_filter(region_map, top_n, window=window)
+                best = max(sum(region_map[offset] for offset in offsets)
+                           for offsets in combinations(sorted(region_map), top_n)
+                           if all(second - first >= window
+                                  for first, second in zip(offsets, offsets[1:])))
+                self.assertEqual(len(chosen), top_n)
+                self.assertEqual(sum(region_map[offset] for offset in chosen), best)
+                for first, second in combinations(sorted(chosen), 2):
+                    self.assertTrue(second - first >= window)
+
+    def test_optimal_on_demand(self):
+        self.assertEqual(self.overlaps.optimal_regions, {})
+        optimal = self.overlaps.optimal_ctc_actual
+        self.assertEqual(optimal, self.overlaps.optimal_filter(self.overlaps.ctc_actual_map, 3,
+                                                               window=4))
+        self.assertEqual(self.overlaps.optimal_regions.keys(), ["ctc_actual"])
+        self.assertTrue(self.overlaps.optimal_ctc_actual is optimal)
+
+        # a new ranking starts over
+        self.overlaps.rerank(top_n=2)
+        self.assertEqual(self.overlaps.optimal_regions, {})
+        self.assertEqual(len(self.overlaps.optimal_ctc_actual), 2)
+        self.assertRaises(AttributeError, getattr, self.overlaps, "optimal_words")
+
+    def test_range_maximum(self):
+        values = [3, None, 5, 5, 1, None, 7, 2]
+        table = RangeMaximum(values)
+        self.assertEqual(table.maximum(0, 7), 6)
+        self.assertEqual(table.maximum(0, 5), 2)
+        self.assertEqual(table.maximum(1, 1), None)
+        self.assertEqual(table.maximum(3, 2), None)
+        for first in xrange(len(values)):
+            for last in xrange(first, len(values)):
+                candidates = [position for position in xrange(first, last + 1)
+                              if values[position] is not None]
+                expected = None
+                if candidates:
+                    expected = min(candidates, key=lambda position: (-values[position], position))
+                self.assertEqual(table.maximum(first, last), expected)
+
+    def test_top_in_range(self):
+        region_map = self.overlaps.ctc_actual_map
+        for first, last in [(0, 26), (3, 17), (10, 12), (20, 26), (5, 5)]:
+            for top_n in (1, 3, 6):
+                in_range = dict((offset, average) for offset, average in region_map.iteritems()
+                                if first <= offset <= last)
+                self.assertEqual(self.overlaps.top_in_range("ctc_actual", first, last, top_n),
+                                 self.overlaps.filter_overlaps(in_range, top_n))
+
+
+class RankWindowsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "lena5min.csv")
+        rows = [(300, (row * 37) % 120, (row * 53) % 90, (row * 7) % 11, (row * 5) % 13)
+                for row in xrange(48)]
+        write_export(self.path, [("e20150715_090000_000001.its", "2015-07-15 09:00", rows)])
+
+    def tearDown(self):
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def test_same_as_one_window_at_a_time(self):
+        windows = [6, 9, 12, 18]
+        for optimal in (False, True):
+            results = Overlaps(self.path, 3).rank_windows(windows, optimal=optimal)
+            self.assertEqual(sorted(results), windows)
+            for window in windows:
+                overlaps = Overlaps(self.path, 3, window=window)
+                prefix = "optimal_" if optimal else "ranked_"
+                for metric in Overlaps.metrics:
+                    self.assertEqual(results[window][metric],
+                                     (getattr(overlaps, metric + "_map"),
+                                      getattr(overlaps, prefix + metric)))
+
+    def test_time_range(self):
+        overlaps = Overlaps(self.path, 2)
+        overlaps.set_time_range("10:00", "13:00")
+        results = overlaps.rank_windows([6, 9])
+        for window in (6, 9):
+            single = Overlaps(self.path, 2, window=window)
+            single.set_time_range("10:00", "13:00")
+            self.assertEqual(results[window]["ctc_cvc"][1], single.ranked_ctc_cvc)
+
+
+class SilenceModeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "lena5min.csv")
+        # three hours, 4, 5 and 6 conversational turns per row
+        write_export(self.path, [("e20150715_090000_000001.its", "2015-07-15 09:00",
+                                  ctc_rows([4] * 12 + [5] * 12 + [6] * 12))])
+        # the second hour is half silent, the third a quarter
+        self.silences = SilenceSet([Silence(3600, 5400, 1), Silence(7200, 8100, 2)])
+        self.overlaps = Overlaps(self.path, 3, window=12, stride=12)
+
+    def tearDown(self):
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def ranked(self, mode, maximum_silence=None):
+        self.overlaps.use_silences(self.silences, mode, maximum_silence)
+        region_map, ranked = self.overlaps.rank("ctc_actual")
+        return [(offset, region_map[offset]) for offset in ranked]
+
+    def test_row_silence(self):
+        self.overlaps.use_silences(self.silences)
+        self.assertEqual(list(self.overlaps.silence_coverage),
+                         [0.0] * 12 + [1.0] * 6 + [0.0] * 6 + [1.0] * 3 + [0.0] * 9)
+        self.assertEqual(self.overlaps.window_silence(12)[::12], [0.0, 0.5, 0.25])
+
+    def test_modes(self):
+        self.assertEqual(self.overlaps.ranked_ctc_actual, [24, 12, 0])
+        # the averages as they are
+        self.assertEqual(self.ranked("exclude"), [(24, 6.0), (12, 5.0), (0, 4.0)])
+        # the silent hour is down-weighted below the first one
+        self.assertEqual(self.ranked("weight"), [(24, 4.5), (0, 4.0), (12, 2.5)])
+        # 5 turns a row in half an hour of talking is the densest
+        self.assertEqual(self.ranked("normalize"), [(12, 10.0), (24, 8.0), (0, 4.0)])
+
+    def test_maximum_silence(self):
+        # the half silent hour is dropped in every mode
+        self.assertEqual(self.ranked("exclude", 0.4), [(24, 6.0), (0, 4.0)])
+        self.assertEqual(self.ranked("weight", 0.4), [(24, 4.5), (0, 4.0)])
+        self.assertEqual(self.ranked("normalize", 0.4), [(24, 8.0), (0, 4.0)])
+        self.assertEqual(self.ranked("normalize", 0.2), [(0, 4.0)])
+        # but a window right at the limit is still a candidate
+        self.assertEqual(self.ranked("normalize", 0.5), [(12, 10.0), (24, 8.0), (0, 4.0)])
+
+    def test_without_silences(self):
+        self.ranked("normalize", 0.4)
+        self.overlaps.use_silences(None)
+        self.assertEqual(self.overlaps.ranked_ctc_actual, [24, 12, 0])
+        self.assertRaises(Exception, self.overlaps.use_silences, self.silences, "ignore")
+
+    def test_silences_when_loading(self):
+        overlaps = Overlaps(self.path, 3, window=12, stride=12, silences=self.silences,
+                            silence_mode="weight", maximum_silence=None)
+        self.assertEqual(overlaps.ranked_ctc_actual, [24, 0, 12])
+
+
+class OnlineWordDensitySetTest(unittest.TestCase):
+
+    def test_same_ranking_as_overlaps(self):
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, "lena5min.csv")
+            rows = [(300, (row * 37) % 120, (row * 53) % 90, (row * 7) % 11, (row * 5) % 13)
+                    for row in xrange(60)]
+            for count in (6, 20, 60):
+                write_export(path, [("e20150715_090000_000001.its", "2015-07-15 09:00",
+                                     rows[:count])])
+                LenaData.cache.clear()
+                for top_n, window, stride in [(3, 4, 1), (2, 6, 2), (5, 3, 3)]:
+                    overlaps = Overlaps(path, top_n, window=window, stride=stride)
+                    live = OnlineWordDensitySet(overlaps.dataset.time, top_n, window, stride)
+                    for duration, meaningful, awc, ctc, cvc in rows[:count]:
+                        live.append_lena_row(duration, meaningful, awc, ctc, cvc)
+                    for metric in Overlaps.metrics:
+                        self.assertEqual(live.ranked(metric), getattr(overlaps, "ranked_" + metric))
+                        self.assertEqual(live.region_map(metric), getattr(overlaps, metric + "_map"))
+        finally:
+            LenaData.cache.clear()
+            shutil.rmtree(folder)
+
+    def test_new_window_replaces_the_ones_it_overlaps(self):
+        live = OnlineWordDensitySet(None, top_n=2, window=2)
+        for ctc in (4, 4, 0, 0, 2, 2):
+            live.append(0, 0, ctc, 0)
+        self.assertEqual(live.ranked("ctc_actual"), [0, 4])
+        # the new window at 5 beats the one at 4 it overlaps
+        live.append(0, 0, 9, 0)
+        self.assertEqual(live.ranked("ctc_actual"), [5, 0])
+        self.assertEqual(live.ranked("ctc_actual", top_n=3), [5, 0, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from clandocument import ClanDocument
+from clanfile import ClanFileParser
+from lenadata import LenaData
+from overlaps import Overlaps
+from pipeline import export_suffixes, find_recordings, metric_suffix, process_recording
+from silences import SilenceParser, clan_sound_track
+from test_clanfile import utterances
+from transcripts import write_transcript
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+class AllMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.data_dir, "01_01")
+        os.mkdir(self.folder)
+        self.clan_file = os.path.join(self.folder, "01_01.lena.cha")
+        write_transcript(self.clan_file, utterances())
+
+    def tearDown(self):
+        ClanDocument.cache.clear()
+        LenaData.cache.clear()
+        shutil.rmtree(self.data_dir)
+
+    def process(self):
+        # 3 minute subregions of the transcript's 1 minute rows
+        recording = find_recordings(self.data_dir)[0]
+        return process_recording(recording, 0, 2, window=3, all_metrics=True,
+                                 row_seconds=60, utc_offset=0)
+
+    def test_metric_suffix(self):
+        self.assertEqual(metric_suffix("ctc_cvc"), "_subregions.cha")
+        self.assertEqual(metric_suffix("awc_actual"), "_subregions_awc_actual.cha")
+        self.assertEqual(len(set(export_suffixes)), len(Overlaps.metrics) + 1)
+
+    def test_one_file_per_metric(self):
+        self.process()
+        self.assertEqual(sorted(name for name in os.listdir(self.folder) if name.endswith(".cha")),
+                         sorted(["01_01.lena.cha"] + ["01_01" + suffix for suffix in export_suffixes]))
+
+        # every file is what ranking and exporting that metric on its own writes
+        overlaps = Overlaps(self.clan_file, 2, window=3, row_minutes=1.0, utc_offset=0)
+        silences = SilenceParser(self.clan_file, 0, clan_sound_track(self.clan_file)).silences
+        for metric in Overlaps.metrics:
+            single = os.path.join(self.data_dir, metric + ".cha")
+            single_silences = os.path.join(self.data_dir, metric + "_silences_added.cha")
+            ClanFileParser(self.clan_file, single, region_length=overlaps.window_length(),
+                           offset_length=overlaps.offset_length())\
+                .insert_silences_overlaps_cha(silences, getattr(overlaps, "ranked_" + metric),
+                                              getattr(overlaps, metric + "_map"),
+                                              silences_added_path=single_silences)
+            self.assertEqual(read(os.path.join(self.folder, "01_01" + metric_suffix(metric))),
+                             read(single))
+            self.assertEqual(read(os.path.join(self.folder, "01_01_silences_added.cha")),
+                             read(single_silences))
+
+    def test_exports_are_not_recordings(self):
+        self.process()
+        # a second run finds the transcript again, not one of the exports
+        self.assertEqual([recording.clan_file for recording in find_recordings(self.data_dir)],
+                         [self.clan_file])
+        self.process()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from clandocument import ClanDocument
+from silences import Silence, SilenceParser, SilenceSet, SoundTrack, clan_sound_track
+from transcripts import write_transcript
+
+
+# sounds at 2-3s, 3.5-3.6s, 5-9s and 9.05-9.1s, and the [End] marker at 12s
+label_track = """2.000000\t3.000000\t1
+3.500000\t3.600000\t2
+5.000000\t9.000000\t3
+9.050000\t9.100000\t4
+12.000000\t12.000000\t[End]
+"""
+
+
+class SoundTrackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "Label_Track.txt")
+        with open(self.path, "w") as file:
+            file.write(label_track)
+        self.track = SoundTrack(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_sweep(self):
+        self.assertEqual(list(self.track.thresholds), [50, 100, 1000, 4000])
+        # every silence, then the ones either side of each dropped sound merged
+        self.assertEqual(self.track.summary(0), (5, 5850))
+        self.assertEqual(self.track.summary(50), (4, 5900))
+        self.assertEqual(self.track.summary(99), (4, 5900))
+        self.assertEqual(self.track.summary(100), (3, 6000))
+        self.assertEqual(self.track.summary(1000), (2, 7000))
+        self.assertEqual(self.track.summary(10000), (1, 11000))
+
+    def test_same_as_silence_parser(self):
+        for minimum_sound in (0, 50, 75, 100, 999, 1000, 3999, 4000, 10000):
+            for track in (None, self.track):
+                silences = SilenceParser(self.path, minimum_sound, track).silences
+                self.assertEqual(self.track.summary(minimum_sound),
+                                 (len(silences), sum(silence.length() for silence in silences)))
+
+
+class ClanSoundTrackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "01_01.cha")
+        # an overlapping and a touching utterance, a *SIL: segment, a
+        # short sound, an untranscribed gap and a *SIL: segment at the end
+        write_transcript(self.path, [("FAN", "0 .", 2000, 3000),
+                                     ("CHN", "0 .", 2500, 4000),
+                                     ("MAN", "0 .", 4000, 4500),
+                                     ("SIL", "0 .", 4500, 9000),
+                                     ("CHN", "0 .", 9000, 9100),
+                                     ("FAN", "0 .", 10000, 12000),
+                                     ("SIL", "0 .", 12000, 15000)])
+
+    def tearDown(self):
+        ClanDocument.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def silences(self, track, minimum_sound):
+        return [(silence.start, silence.end) for silence
+                in SilenceParser(self.path, minimum_sound, track).silences]
+
+    def test_regions(self):
+        track = clan_sound_track(self.path)
+        # overlapping and touching sounds are one region, and the
+        # [End] marker is at the end of the last *SIL:
+        self.assertEqual(zip(track.starts, track.ends, track.end_markers),
+                         [(2000, 4500, 0), (9000, 9100, 0), (10000, 12000, 0),
+                          (15000, 15000, 1)])
+
+        self.assertEqual(self.silences(track, 0),
+                         [(1000, 2000), (4500, 9000), (9100, 10000), (12000, 15000)])
+        # minimum_sound drops the short sound, merging the silences around it
+        self.assertEqual(self.silences(track, 100),
+                         [(1000, 2000), (4500, 10000), (12000, 15000)])
+        self.assertEqual(track.summary(100), (3, 9500))
+
+    def test_silent_speakers(self):
+        track = clan_sound_track(self.path, silent_speakers=("SIL", "MAN"))
+        self.assertEqual(zip(track.starts, track.ends),
+                         [(2000, 4000), (9000, 9100), (10000, 12000), (15000, 15000)])
+
+
+class SilenceSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.silences = SilenceSet([Silence(1, 2, 1), Silence(4, 6, 2), Silence(8, 9, 3)])
+
+    def test_items(self):
+        self.assertEqual(len(self.silences), 3)
+        self.assertEqual((self.silences[1].start, self.silences[1].end,
+                          self.silences[1].number), (4000, 6000, 2))
+        self.assertRaises(IndexError, self.silences.__getitem__, 3)
+        self.assertEqual([silence.number for silence in self.silences], [1, 2, 3])
+
+    def test_intersecting(self):
+        # a window that only touches a silence doesn't intersect it
+        self.assertEqual(list(self.silences.intersecting(2000, 4000)), [])
+        self.assertEqual(list(self.silences.intersecting(6000, 8000)), [])
+        self.assertEqual(list(self.silences.intersecting(1999, 4001)), [0, 1])
+        self.assertEqual(list(self.silences.intersecting(4500, 5500)), [1])
+        self.assertEqual(list(self.silences.intersecting(0, 10000)), [0, 1, 2])
+        self.assertEqual(list(self.silences.intersecting(9000, 10000)), [])
+
+    def test_silent_time(self):
+        self.assertEqual(self.silences.silent_time(2000, 4000), 0)
+        # only the parts inside the window count
+        self.assertEqual(self.silences.silent_time(1500, 4500), 1000)
+        self.assertEqual(self.silences.silent_time(4500, 5500), 1000)
+        self.assertEqual(self.silences.silent_time(4000, 8500), 2500)
+        self.assertEqual(self.silences.silent_time(0, 10000), 4000)
+
+    def test_covering(self):
+        # a silence covers its start but not its end
+        self.assertEqual(self.silences.covering(999), None)
+        self.assertEqual(self.silences.covering(1000), 0)
+        self.assertEqual(self.silences.covering(2000), None)
+        self.assertEqual(self.silences.covering(5999), 1)
+        self.assertEqual(self.silences.covering(9500), None)
+        self.assertTrue(self.silences.in_silence(8000))
+        self.assertFalse(self.silences.in_silence(7000))
+
+    def test_overlaps(self):
+        overlaps = self.silences.overlaps
+        self.assertEqual(overlaps(1, 5000, 7000), (True, False, False))
+        self.assertEqual(overlaps(1, 3000, 5000), (False, True, False))
+        self.assertEqual(overlaps(1, 4500, 5500), (True, True, False))
+        self.assertEqual(overlaps(1, 3000, 7000), (False, False, True))
+        # windows that start or end right on the silence's edges
+        self.assertEqual(overlaps(1, 4000, 6000), (False, False, False))
+        self.assertEqual(overlaps(1, 4000, 7000), (False, False, False))
+        self.assertEqual(overlaps(1, 6000, 7000), (False, False, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import math
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import wave
+
+from silences import SilenceParser
+from soundfinder import SoundFinder, export_label_track
+
+
+rate = 8000
+
+# (seconds, tone or not): a sound with a short pause in it, a long
+# silence, and a second, shorter sound
+segments = [(2.0, False), (1.5, True), (0.5, False), (1.0, True),
+            (3.0, False), (0.5, True), (2.0, False)]
+
+
+def write_wav(path, segments, channels=1, width=2):
+    samples = []
+    for seconds, tone in segments:
+        for sample in xrange(int(seconds * rate)):
+            if tone:
+                samples.append(int(10000 * math.sin(2 * math.pi * 440 * sample / rate)))
+            else:
+                samples.append(0)
+
+    wav = wave.open(path, "wb")
+    try:
+        wav.setnchannels(channels)
+        wav.setsampwidth(width)
+        wav.setframerate(rate)
+        if width == 2:
+            frames = "".join(struct.pack("<" + "h" * channels, *([sample] * channels))
+                             for sample in samples)
+        else:
+            frames = "".join(chr(128 + sample // 256) * channels for sample in samples)
+        wav.writeframes(frames)
+    finally:
+        wav.close()
+
+
+class SoundFinderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.wav_path = os.path.join(self.folder, "01_01_audio.wav")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def assertSounds(self, found, expected):
+        self.assertEqual(len(found), len(expected))
+        for (start, end), (expected_start, expected_end) in zip(found, expected):
+            self.assertAlmostEqual(start, expected_start, places=6)
+            self.assertAlmostEqual(end, expected_end, places=6)
+
+    def test_find_sounds(self):
+        write_wav(self.wav_path, segments)
+        finder = SoundFinder()
+        # the half second pause is shorter than minimum_silence, so the
+        # first two tones are one sound. Labels start and end 0.1s early/late.
+        self.assertSounds(finder.find_sounds(self.wav_path), [(1.9, 5.1), (7.9, 8.6)])
+        self.assertAlmostEqual(finder.length, 10.5)
+
+        finder = SoundFinder(minimum_silence=0.5, label_start=0, label_end=0)
+        self.assertSounds(finder.find_sounds(self.wav_path),
+                          [(2.0, 3.5), (4.0, 5.0), (8.0, 8.5)])
+
+    def test_stereo(self):
+        write_wav(self.wav_path, segments, channels=2)
+        self.assertSounds(SoundFinder().find_sounds(self.wav_path), [(1.9, 5.1), (7.9, 8.6)])
+
+    def test_edges(self):
+        # labels are kept inside the recording
+        write_wav(self.wav_path, [(1.0, True), (2.0, False), (1.0, True)])
+        self.assertSounds(SoundFinder().find_sounds(self.wav_path), [(0.0, 1.1), (2.9, 4.0)])
+
+        write_wav(self.wav_path, [(2.0, False)])
+        self.assertEqual(SoundFinder().find_sounds(self.wav_path), [])
+
+    def test_not_16_bit(self):
+        write_wav(self.wav_path, segments, width=1)
+        self.assertRaises(Exception, SoundFinder().find_sounds, self.wav_path)
+
+    def test_export_label_track(self):
+        write_wav(self.wav_path, segments)
+        label_track = os.path.join(self.folder, "Label_Track.txt")
+        export_label_track(self.wav_path, label_track)
+        with open(label_track) as file:
+            self.assertEqual(file.read(), "1.900000\t5.100000\t1\n"
+                                          "7.900000\t8.600000\t2\n"
+                                          "10.500000\t10.500000\t[End]\n")
+
+        # which SilenceParser reads like an Audacity one (the first
+        # silence always starts at 1 second, see parse_silences2())
+        silences = SilenceParser(label_track, 0).silences
+        self.assertEqual([(silence.start, silence.end) for silence in silences],
+                         [(1000.0, 1900.0), (5100.0, 7900.0), (8600.0, 10500.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
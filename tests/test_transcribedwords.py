@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from clandocument import ClanDocument
+from lenadata import LenaData
+from overlaps import Overlaps
+from transcribedwords import TranscribedWords, count_words
+from transcripts import write_transcript
+
+
+# an utterance or two every minute, with the most words in minutes
+# 4 and 5, while LENA's counts are highest at the start
+utterances = [("MOT", "xxx &=laughs [+ bch] .", 1000, 2000),
+              ("CHI", "big ball .", 5000, 6000),
+              ("MOT", "yyy (.) www .", 61000, 62000),
+              ("FAT", "hi .", 65000, 66000),
+              ("FAT", "one two three four .", 121000, 124000),
+              ("FAT", "okay .", 181000, 182000),
+              ("MOT", "look at the big red doggie .", 241000, 244000),
+              ("CHI", "doggie [: dog] !", 250000, 251000),
+              ("MOT", "you want <that one> [/] that one ?", 301000, 304000),
+              ("MOT", "more please ?", 361000, 362000),
+              ("FAT", "bye bye .", 481000, 482000),
+              ("SIL", "0 .", 482000, 600000)]
+
+
+class CountWordsTest(unittest.TestCase):
+
+    def test_words(self):
+        self.assertEqual(count_words("*MOT:\tlook at the doggie !"), 4)
+        # a multi-line utterance
+        self.assertEqual(count_words("*MOT:\tone two\n\tthree . \x151000_2000\x15\n"), 3)
+
+    def test_not_words(self):
+        # &=codes, fillers and fragments
+        self.assertEqual(count_words("*CHI:\t&=laughs &=w4_76 &-um &+fr ."), 0)
+        # omitted words
+        self.assertEqual(count_words("*CHI:\t0 . \x151000_2000\x15"), 0)
+        self.assertEqual(count_words("*CHI:\t0is that a dog ?"), 3)
+        # unintelligible speech, pauses and terminators
+        self.assertEqual(count_words("*MOT:\txxx yyy www (.) XXX +..."), 0)
+        # bracketed codes, but not what they're about
+        self.assertEqual(count_words("*FAT:\t<you want> [/] you want it [: this] [+ bch] ."), 5)
+
+
+class TranscribedWordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "01_01.cha")
+        write_transcript(self.path, utterances)
+        self.words = TranscribedWords(self.path, row_minutes=1.0)
+
+    def tearDown(self):
+        ClanDocument.cache.clear()
+        LenaData.cache.clear()
+        shutil.rmtree(self.folder)
+
+    def test_rows(self):
+        self.assertEqual(list(self.words.words), [2, 1, 4, 1, 7, 6, 2, 0, 2])
+        # utterances with no words in them don't count
+        self.assertEqual(list(self.words.utterances), [1, 1, 1, 1, 2, 1, 1, 0, 1])
+        self.assertEqual(list(self.words.speaker_words["MOT"]), [0, 0, 0, 0, 6, 6, 2, 0, 0])
+        self.assertFalse("SIL" in self.words.speaker_words)
+
+        self.assertEqual(self.words.column(10), [2, 1, 4, 1, 7, 6, 2, 0, 2, 0])
+        self.assertEqual(self.words.column(3, ["FAT", "CHI"]), [2, 1, 4])
+        self.assertEqual(self.words.totals(3, 3),
+                         (14, 4, {"CHI": (1, 1), "FAT": (1, 1), "MOT": (12, 2)}))
+
+    def test_ranking(self):
+        overlaps = Overlaps(self.path, 2, window=3, row_minutes=1.0, utc_offset=0)
+        self.assertEqual(overlaps.ranked_ctc_cvc, [0, 3])
+
+        # the ranking follows the words, not LENA's counts
+        overlaps.use_transcribed_words(self.words)
+        region_map, ranked = overlaps.rank("transcribed_words")
+        self.assertAlmostEqual(region_map[4], 15 / 3.0, places=6)
+        self.assertEqual(ranked, [4, 0])
+
+        overlaps.use_transcribed_words(self.words, ["FAT"])
+        region_map, ranked = overlaps.rank("transcribed_words", top_n=1)
+        self.assertAlmostEqual(region_map[1], 6 / 3.0, places=6)
+        self.assertEqual(ranked, [1])
+
+    def test_row_length(self):
+        overlaps = Overlaps(self.path, 2, window=3, row_minutes=1.0, utc_offset=0)
+        self.assertRaises(Exception, overlaps.use_transcribed_words,
+                          TranscribedWords(self.path, row_minutes=5.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+"""
+Writes small LENA CLAN transcripts for the tests.
+"""
+
+
+header = """@UTF8
+@Begin
+@Languages:\teng
+@Participants:\tMAN Male_Adult_Near Male, FAN Female_Adult_Near Female, CHN Key_Child_Clear Target_Child, SIL Silence LENA
+@Options:\tmulti
+@Media:\t{media}, audio
+@Comment:\tstart of recording 1
+@Date:\t{date}
+@Time Duration:\t{start}-{start}
+"""
+
+
+def write_transcript(path, utterances, media="e20150720_104920_000001",
+                     date="15-JUL-2015", start="13:01:04"):
+    """
+    :param path: path of the .cha file to write
+    :param utterances: list of (speaker, text, onset, offset) tuples,
+                       with the times in milliseconds
+    :param media: @Media name
+    :param date: @Date
+    :param start: clock time of the first @Time Duration
+    """
+    lines = [header.format(media=media, date=date, start=start)]
+    for speaker, text, onset, offset in utterances:
+        lines.append("*{}:\t{} \x15{}_{}\x15\n".format(speaker, text, onset, offset))
+    lines.append("@End\n")
+    with open(path, "wb") as transcript:
+        transcript.write("".join(lines).replace("\n", "\r\n"))
@@ -0,0 +1,184 @@
+"""
+Ranks the subregions of an annotated CLAN file by the words that were
+actually transcribed in it, rather than LENA's estimates, and reports
+the transcribed word totals of every subregion next to LENA's AWC.
+
+    python transcribedwords.py data/new_input/14_11/14_11_subregions.cha
+    python transcribedwords.py 14_11_subregions.cha --lena 14_11_lena5min.csv --speakers MOT FAT
+
+Without --lena, the LENA columns are worked out from the CLAN file
+itself (see clandensity.py).
+"""
+import argparse
+import re
+import sys
+from array import array
+
+from clandocument import ClanDocument
+from overlaps import Overlaps, minutes_to_rows, row_minutes
+
+
+# codes and comments in square brackets ([/], [: word], [+ bch], ...)
+# and \025 bullets, none of which are words
+bracket_regx = re.compile("\[[^\]]*\]|\025[^\025]*\025")
+token_regx = re.compile("[^\s<>]+")
+letter_regx = re.compile("[A-Za-z\x80-\xff]")
+
+# unintelligible/untranscribed speech
+unintelligible_words = set(["xxx", "yyy", "www"])
+
+
+def count_words(text):
+    """
+    Counts the word tokens of a main tier, leaving out everything CHAT
+    marks as not being a word: &=crying, &=w4_76 and other &codes
+    (fillers and fragments too), 0 and 0word (omitted words), xxx/yyy/www,
+    [bracketed] codes, (.) pauses, +... terminators/linkers, bullets and
+    punctuation. A token counts as a word if it has a letter in it.
+
+    :param text: the *XYZ: line of an utterance and its continuation
+                 lines (dependent %tiers aren't part of it)
+    :return: number of words
+    """
+    # drop the *XYZ: speaker code
+    text = text[text.find(":") + 1:]
+    count = 0
+    for token in token_regx.findall(bracket_regx.sub(" ", text)):
+        if token[0] in "&+0":
+            continue
+        if token.lower() in unintelligible_words:
+            continue
+        if letter_regx.search(token) is None:
+            continue
+        count += 1
+    return count
+
+
+class TranscribedWords:
+    """
+    Words and utterances transcribed in a CLAN file, counted per row
+    and per speaker, in the same rows (counted from the start of the
+    file, row_minutes long) that Overlaps ranks on. Every utterance
+    counts in the row it starts in.
+    """
+
+    def __init__(self, path, row_minutes=row_minutes):
+        self.path = path
+        self.row_minutes = row_minutes
+
+        # one entry per row
+        self.words = array("l")         # words, all speakers
+        self.utterances = array("l")    # utterances with at least one word
+
+        # speaker code -> the same counts for that speaker alone
+        self.speaker_words = {}
+        self.speaker_utterances = {}
+
+        self.parse()
+
+    def parse(self):
+        document = ClanDocument.load(self.path)
+        row_length = int(round(self.row_minutes * 60 * 1000))
+        text = document.text
+        line_starts = document.line_starts
+
+        counts = []
+        for utterance in xrange(document.utterance_count()):
+            onset = document.onsets[utterance]
+            if onset == -1:
+                continue
+            words = count_words(text[line_starts[document.first_lines[utterance]]:
+                                     line_starts[document.last_lines[utterance] + 1]])
+            if words:
+                counts.append((onset // row_length, document.speaker(utterance), words))
+
+        rows = max([row for row, speaker, words in counts] or [-1]) + 1
+        self.words = array("l", [0] * rows)
+        self.utterances = array("l", [0] * rows)
+        for row, speaker, words in counts:
+            if speaker not in self.speaker_words:
+                self.speaker_words[speaker] = array("l", [0] * rows)
+                self.speaker_utterances[speaker] = array("l", [0] * rows)
+            self.words[row] += words
+            self.utterances[row] += 1
+            self.speaker_words[speaker][row] += words
+            self.speaker_utterances[speaker][row] += 1
+
+    def __len__(self):
+        return len(self.words)
+
+    def column(self, rows, speakers=None):
+        """
+        :param rows: number of rows to return (padded with 0s, or cut short)
+        :param speakers: only count these speakers, all of them if None
+        :return: list with the words transcribed in every row
+        """
+        if speakers is None:
+            words = self.words
+        else:
+            words = [0] * len(self)
+            for speaker in speakers:
+                for row, count in enumerate(self.speaker_words.get(speaker, ())):
+                    words[row] += count
+        words = list(words[:rows])
+        return words + [0] * (rows - len(words))
+
+    def totals(self, offset, window):
+        """
+        :param offset: first row of a subregion
+        :param window: subregion length in rows
+        :return: (words, utterances, dict of speaker -> (words, utterances))
+                 transcribed in the subregion
+        """
+        end = offset + window
+        speakers = {}
+        for speaker in self.speaker_words:
+            words = sum(self.speaker_words[speaker][offset:end])
+            if words:
+                speakers[speaker] = (words, sum(self.speaker_utterances[speaker][offset:end]))
+        return sum(self.words[offset:end]), sum(self.utterances[offset:end]), speakers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank the subregions of an annotated CLAN file "
+                                                 "by their transcribed words")
+    parser.add_argument("clan_file", help="annotated CLAN file (e.g. 14_11_subregions.cha)")
+    parser.add_argument("--lena", help="LENA 5 minute csv (or .its file) of the recording, to "
+                                       "compare against (default: work it out from the CLAN file)")
+    parser.add_argument("--top-n", type=int, default=5,
+                        help="number of subregions to find (default: 5)")
+    parser.add_argument("--window-minutes", type=float, default=60,
+                        help="subregion length, in minutes (default: 60)")
+    parser.add_argument("--stride-minutes", type=float, default=5,
+                        help="distance between candidate subregions, in minutes (default: 5)")
+    parser.add_argument("--speakers", nargs="+", metavar="CODE",
+                        help="only count the words of these speakers (default: everyone)")
+    parser.add_argument("--optimal", action="store_true",
+                        help="pick the subregions with the most words combined "
+                             "instead of ranking them greedily")
+    args = parser.parse_args(argv)
+
+    try:
+        window = minutes_to_rows(args.window_minutes)
+        stride = minutes_to_rows(args.stride_minutes)
+    except Exception, e:
+        parser.error(e.args[0])
+
+    overlaps = Overlaps(args.lena or args.clan_file, args.top_n, window=window, stride=stride)
+    words = TranscribedWords(args.clan_file)
+    overlaps.use_transcribed_words(words, args.speakers)
+    region_map, ranked = overlaps.rank("transcribed_words", optimal=args.optimal)
+
+    awc = overlaps.dataset.awc_actual
+    print "rank  offset  words/row  words  utterances  LENA AWC  speakers"
+    for rank, offset in enumerate(ranked):
+        total, utterances, speakers = words.totals(offset, window)
+        print "{:4}  {:6}  {:9.2f}  {:5}  {:10}  {:8}  {}".format(
+            rank + 1, offset, region_map[offset], total, utterances,
+            sum(awc[offset:offset + window]),
+            ", ".join("{} {}/{}".format(speaker, *speakers[speaker]) for speaker in sorted(speakers)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())